@@ -1,7 +1,9 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, jsonify, request
 from apis.authentication import authentication_required
+from apis.response import versioned
 from logics.field import get_field_options, get_field, add_field, remove_field
 from logics.event import publish
+from logics.geometry import simplification_tolerance
 
 
 api = Blueprint("field", __name__, url_prefix="/field")
@@ -9,6 +11,7 @@ api = Blueprint("field", __name__, url_prefix="/field")
 
 @api.route("", methods=["GET"])
 @authentication_required
+@versioned
 def retrieve_field_options(user_id, _):
     field_options = get_field_options(user_id)
     if field_options is not None:
@@ -19,10 +22,17 @@ def retrieve_field_options(user_id, _):
 
 @api.route("/<int:field_id>", methods=["GET"])
 @authentication_required
+@versioned
 def retrieve_field(user_id, _, field_id):
-    field = get_field(user_id, field_id)
+    try:
+        tolerance = simplification_tolerance(
+            request.args.get("tolerance", type=float), request.args.get("zoom", type=int)
+        )
+    except ValueError as error:
+        return jsonify({"data": str(error)}), 406
+    field = get_field(user_id, field_id, tolerance)
     if field is not None:
-        return field, 200
+        return Response(field, status=200, mimetype="application/json")
     else:
         return jsonify({"data": "Failed to retrieve field"}), 404
 
@@ -1,8 +1,12 @@
 import os
-from flask import Blueprint, jsonify, send_from_directory, request
+from flask import Blueprint, Response, jsonify, send_from_directory, request
 from apis.authentication import authentication_required
-from logics.measurement import get_sample_image, get_measurements, get_subfields, get_measurement_positions, modify_measurement, upload_measurement_sample, modify_measurement_position
+from apis.response import versioned
+from logics.measurement import get_sample_image, get_measurements, get_subfields, modify_measurement, upload_measurement_sample, modify_measurement_position
 from logics.event import publish
+from logics.job import submit_measurement_positions, get_job
+from logics.geometry import simplification_tolerance
+from libs.algo.subfield_split import CLASSIFICATIONS
 from config import MEASUREMENT
 
 
@@ -21,6 +25,7 @@ def retrieve_sample_image(user_id, _, measurement_id):
 
 @api.route("/<int:field_id>/<season_id>", methods=["GET"])
 @authentication_required
+@versioned
 def retrieve_measurements(user_id, _, field_id, season_id):
     measurements = get_measurements(user_id, field_id, season_id)
     if measurements is not None and len(measurements) > 0:
@@ -31,10 +36,17 @@ def retrieve_measurements(user_id, _, field_id, season_id):
 
 @api.route("/subfield/<int:field_id>/<season_id>", methods=["GET"])
 @authentication_required
+@versioned
 def retrieve_subfields(user_id, _, field_id, season_id):
-    subfields = get_subfields(user_id, field_id, season_id)
-    if subfields is not None and len(subfields) > 0:
-        return subfields, 200
+    try:
+        tolerance = simplification_tolerance(
+            request.args.get("tolerance", type=float), request.args.get("zoom", type=int)
+        )
+    except ValueError as error:
+        return jsonify({"data": str(error)}), 406
+    subfields = get_subfields(user_id, field_id, season_id, tolerance)
+    if subfields is not None and subfields != "[]":
+        return Response(subfields, status=200, mimetype="application/json")
     else:
         return jsonify({"data": "Failed to retrieve all subfields"}), 404
 
@@ -42,21 +54,38 @@ def retrieve_subfields(user_id, _, field_id, season_id):
 @api.route("/position/<int:field_id>/<season_id>", methods=["GET"])
 @authentication_required
 def retrieve_measurement_positions(user_id, _, field_id, season_id):
-    inserted_measurements, inserted_subfields = get_measurement_positions(
-        user_id, field_id, season_id)
-    if inserted_measurements is not None:
-        if publish(
-            user_id, "measurement.create",
-            {"field_id": field_id,
-             "season_id": season_id,
-             "measurements": inserted_measurements,
-             "subfields": inserted_subfields}
-        ):
-            return jsonify({"data": "Successfully determine the measurement positions"}), 201
-        else:
-            return jsonify({"data": "Successfully determine the measurement positions but failed to publish sync event"}), 503
+    classes = request.args.get("classes", 3, type=int)
+    classification = request.args.get("classification", "equal_interval")
+    breaks = request.args.get("breaks")
+    try:
+        breaks = sorted(float(b) for b in breaks.split(",")) if breaks else None
+    except ValueError:
+        return jsonify({"data": "'breaks' must be comma-separated numbers"}), 406
+    if breaks is None and not 2 <= classes <= 10:
+        return jsonify({"data": "'classes' must be between 2 and 10"}), 406
+    if breaks is None and classification not in CLASSIFICATIONS:
+        return jsonify({"data": f"'classification' must be one of {', '.join(CLASSIFICATIONS)}"}), 406
+    if breaks is not None and len(breaks) > 9:
+        return jsonify({"data": "At most 9 'breaks' are allowed"}), 406
+    job_id = submit_measurement_positions(
+        user_id, field_id, season_id, classes, classification, breaks
+    )
+    if job_id is not None:
+        response = jsonify({"data": "Determining the measurement positions", "job_id": job_id})
+        response.headers["Location"] = f"{api.url_prefix}/job/{job_id}"
+        return response, 202
+    else:
+        return jsonify({"data": "Too many pending jobs, please retry later"}), 503
+
+
+@api.route("/job/<job_id>", methods=["GET"])
+@authentication_required
+def retrieve_job(user_id, _, job_id):
+    job = get_job(user_id, job_id)
+    if job is not None:
+        return job, 200
     else:
-        return jsonify({"data": "Failed to determine the measurement positions"}), 500
+        return jsonify({"data": "Failed to retrieve the job"}), 404
 
 
 @api.route("/upgister/<int:measurement_id>", methods=["PUT"])
@@ -1,14 +1,14 @@
-from flask import Blueprint, jsonify
+import json
+import hashlib
+from flask import Blueprint, Response
 from apis.authentication import authentication_required
 from config import METADATA
 
 api = Blueprint("metadata", __name__, url_prefix="/metadata")
 
-
-@api.route("", methods=["GET"])
-@authentication_required
-def retrieve_metadata(_, __):
-    data = {
+# The metadata is static for the lifetime of the server, so its response body is built once
+__metadata = json.dumps({
+    "data": {
         "max_recommended_fertilizer": METADATA.max_recommended_fertilizer,
         "crops": METADATA.crops,
         "soils": METADATA.soils,
@@ -19,4 +19,13 @@ def retrieve_metadata(_, __):
         "soil_tillages": METADATA.soil_tillages,
         "soil_conditions": METADATA.soil_conditions,
     }
-    return jsonify({"data": data}), 200
+}, separators=(",", ":")).encode("utf-8")
+__metadata_etag = hashlib.sha1(__metadata).hexdigest()
+
+
+@api.route("", methods=["GET"])
+@authentication_required
+def retrieve_metadata(_, __):
+    response = Response(__metadata, status=200, mimetype="application/json")
+    response.set_etag(__metadata_etag)
+    return response
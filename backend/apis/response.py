@@ -0,0 +1,93 @@
+import gzip
+import uuid
+import hashlib
+from flask import Flask, Response, request, make_response
+from repos.notify.notifier import get_version
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Distinguishes the responses of this server run from those of previous runs
+__boot_id = uuid.uuid4().hex[:8]
+# JSON bodies below this size (in bytes) are sent uncompressed
+__min_compression_size = 1024
+__encodings = ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def __matching_etag(etag: str) -> str | None:
+    # Compressed representations carry the content coding as ETag suffix
+    for tag in [etag] + [f"{etag}-{encoding}" for encoding in __encodings]:
+        if request.if_none_match.contains_weak(tag):
+            return tag
+    return None
+
+
+def __compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def versioned(f):
+    """
+    Tags the user-scoped GET response with the version of the user's data, which
+    every published event advances, and answers 304 without running the view if
+    the client already holds that version. Unversioned users are always answered
+    by the view
+    """
+    def decorator(user_id, data, *args, **kwargs):
+        version = get_version(user_id)
+        if version is None:
+            return f(user_id, data, *args, **kwargs)
+        etag = f"{__boot_id}-{user_id}-{version}"
+        matched_etag = __matching_etag(etag)
+        if matched_etag is not None:
+            response = Response(status=304)
+            response.set_etag(matched_etag)
+            return response
+        response = make_response(f(user_id, data, *args, **kwargs))
+        if response.status_code == 200:
+            response.set_etag(etag)
+        return response
+    decorator.__name__ = f.__name__
+    return decorator
+
+
+def __finalize(response: Response) -> Response:
+    if (
+        request.method != "GET"
+        or response.status_code != 200
+        or response.direct_passthrough
+        or response.mimetype != "application/json"
+    ):
+        return response
+    body = response.get_data()
+    etag, _ = response.get_etag()
+    if etag is None:
+        etag = hashlib.sha1(body).hexdigest()
+        response.set_etag(etag)
+    response.vary.add("Accept-Encoding")
+    response.vary.add("Auth-Token")
+    response.headers.setdefault("Cache-Control", "private, no-cache")
+    matched_etag = __matching_etag(etag)
+    if matched_etag is not None:
+        response.status_code = 304
+        response.set_data(b"")
+        response.set_etag(matched_etag)
+        return response
+    encoding = request.accept_encodings.best_match(__encodings)
+    if encoding is not None and len(body) >= __min_compression_size:
+        response.set_data(__compress(body, encoding))
+        response.headers["Content-Encoding"] = encoding
+        response.set_etag(f"{etag}-{encoding}")
+    return response
+
+
+def register(app: Flask) -> None:
+    """
+    Adds ETags, conditional 304 responses and compression to the JSON GET responses
+    """
+    app.after_request(__finalize)
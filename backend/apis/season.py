@@ -1,7 +1,9 @@
 from flask import Blueprint, jsonify, send_from_directory
 from apis.authentication import authentication_required
+from apis.response import versioned
 from logics.season import get_ndvi_raster, get_season_options, get_season, add_season, modify_season, remove_season, get_season_fertilizer_recommendation
 from logics.event import publish
+from logics.prefetch import submit_ndvi_prefetch
 from config import NDVI
 
 
@@ -22,6 +24,7 @@ def retrieve_ndvi_raster(user_id, _, field_id, season_id):
 
 @api.route("/<int:field_id>", methods=["GET"])
 @authentication_required
+@versioned
 def retrieve_season_options(user_id, _, field_id):
     season_ids = get_season_options(user_id, field_id)
     if season_ids is not None:
@@ -32,6 +35,7 @@ def retrieve_season_options(user_id, _, field_id):
 
 @api.route("/<int:field_id>/<season_id>", methods=["GET"])
 @authentication_required
+@versioned
 def retrieve_season(user_id, _, field_id, season_id):
     season = get_season(user_id, field_id, season_id)
     if season is not None:
@@ -45,7 +49,10 @@ def retrieve_season(user_id, _, field_id, season_id):
 def register_season(user_id, data, field_id, season_id):
     inserted_season = add_season(user_id, field_id, season_id, data)
     if inserted_season is not None:
-        if publish(user_id, "season.create", inserted_season):
+        published = publish(user_id, "season.create", inserted_season)
+        # The raster is ready on disk by the time the NDVI layer is first opened
+        submit_ndvi_prefetch(user_id, field_id, season_id)
+        if published:
             return jsonify({"data": "Successfully register the season"}), 201
         else:
             return jsonify({"data": "Successfully register the season but failed to publish sync event"}), 503
@@ -0,0 +1,30 @@
+from flask import Blueprint, Response, jsonify, request
+from apis.authentication import authentication_required
+from logics.tile import get_tile
+from repos.store.dafs.tile import TILE_LAYERS
+
+
+api = Blueprint("tile", __name__, url_prefix="/tiles")
+
+
+@api.route("/<layer>/<int:z>/<int:x>/<int:y>.mvt", methods=["GET"])
+@authentication_required
+def retrieve_tile(user_id, _, layer, z, x, y):
+    if layer not in TILE_LAYERS:
+        return jsonify({"data": f"Tile layer must be one of {', '.join(TILE_LAYERS)}"}), 404
+    if z > 24 or x >= 2 ** z or y >= 2 ** z:
+        return jsonify({"data": "Tile coordinates out of range"}), 404
+    field_id = request.args.get("field_id", type=int)
+    season_id = request.args.get("season_id")
+    if layer != "field" and season_id is None:
+        return jsonify({"data": f"Cannot retrieve {layer} tile without 'season_id'"}), 406
+    tile = get_tile(user_id, layer, z, x, y, field_id, season_id)
+    if tile is not None:
+        tile, etag = tile
+        response = Response(tile, status=200, mimetype="application/vnd.mapbox-vector-tile")
+        response.set_etag(etag)
+        # Tiles change with the user's data, so clients revalidate on every use
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response.make_conditional(request)
+    else:
+        return jsonify({"data": "Failed to retrieve the tile"}), 500
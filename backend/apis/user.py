@@ -1,5 +1,6 @@
 from flask import Blueprint, jsonify
 from apis.authentication import authentication_required
+from apis.response import versioned
 from logics.user import get_user, modify_user
 from logics.event import publish
 from libs.hash.hasher import encrypt
@@ -9,6 +10,7 @@ api = Blueprint("user", __name__, url_prefix="/user")
 
 @api.route("", methods=["GET"])
 @authentication_required
+@versioned
 def retrieve_user(user_id, _):
     user = get_user(user_id=user_id)
     if user is not None:
@@ -1,9 +1,11 @@
 from flask import Flask
-from apis import authentication, metadata, user, field, season, measurement, sse
+from apis import authentication, metadata, user, field, season, measurement, tile, sse, response
 from repos.store import storage
 from repos.mail import mailer
 from repos.recommend import recommender
 from repos.notify import notifier
+from repos.ndvi import raster
+from logics import job, prefetch
 from config import APP
 
 
@@ -13,19 +15,27 @@ if __name__ == "__main__":
         mailer.init()
         recommender.init()
         notifier.init()
+        raster.init()
+        job.init()
+        prefetch.init()
         app = Flask(__name__)
+        response.register(app)
         app.register_blueprint(authentication.api)
         app.register_blueprint(metadata.api)
         app.register_blueprint(user.api)
         app.register_blueprint(field.api)
         app.register_blueprint(season.api)
         app.register_blueprint(measurement.api)
+        app.register_blueprint(tile.api)
         app.register_blueprint(sse.api)
         app.run(host=APP.host, port=APP.port, threaded=True)
     except Exception as error:
         print("[App]", error)
     finally:
+        prefetch.term()
+        job.term()
         storage.term()
         mailer.term()
         recommender.term()
         notifier.term()
+        raster.term()
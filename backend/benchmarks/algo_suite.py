@@ -0,0 +1,184 @@
+# Times the subfield split, the measurement placement and the measurement NDVI sampling
+# of libs.algo on synthetic rasters of several sizes, CRSs and noise patterns and on
+# convex, concave and holed fields. Runs offline on the CPU only.
+# Run from the backend folder (next to config.json): python -m benchmarks.algo_suite
+# The results are written as JSON (to stdout or --output), --baseline compares them with
+# the JSON of a previous run. Every case runs in a fresh process, so that its peak memory
+# is its own, the synthetic rasters are removed at the end
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import resource
+import tempfile
+import itertools
+import multiprocessing
+import numpy as np
+import rasterio
+import shapely
+from benchmarks.synthetic import NOISES, FIELD_SHAPES, synthetic_raster, synthetic_field
+from libs.metric.recorder import Recorder
+from config import NDVI
+
+
+def __peak_rss() -> float:
+    # In MB, ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def __timings(recorder: Recorder) -> dict[str, float]:
+    summary = recorder.summary()
+    return {"p50": summary["p50"], "p99": summary["p99"], "max": summary["max"]}
+
+
+def __run(result, data_folder: str, tiff_file: str, coordinates, classes: int, repeat: int) -> None:
+    from libs.algo.subfield_split import get_subfields_pixel_based_split
+    from libs.algo.measurement_position import find_measurement_position, get_measurement_position_ndvi
+    NDVI.data_folder = data_folder
+    baseline = __peak_rss()
+    split_time = Recorder()
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        subfield_groups = get_subfields_pixel_based_split(tiff_file, coordinates, classes)
+        split_time.record(time.perf_counter() - start_time)
+        if subfield_groups is None:
+            result.put(None)
+            return
+    split_peak = __peak_rss()
+    zones = [subfields for subfields in subfield_groups if len(subfields) > 0]
+    placement_time, sampling_time = Recorder(), Recorder()
+    for _ in range(repeat):
+        for subfields in zones:
+            pixel_count = sum(statistics["pixel_count"] for _, statistics in subfields)
+            zone_ndvi = sum(statistics["ndvi"] * statistics["pixel_count"] for _, statistics in subfields) / pixel_count
+            start_time = time.perf_counter()
+            point = find_measurement_position([subfield for subfield, _ in subfields], tiff_file, zone_ndvi)
+            placement_time.record((time.perf_counter() - start_time) * 1000)
+            start_time = time.perf_counter()
+            get_measurement_position_ndvi(tiff_file, [point.x, point.y])
+            sampling_time.record((time.perf_counter() - start_time) * 1000)
+    result.put({
+        "split": {
+            "time_s": __timings(split_time),
+            "peak_rss_mb": split_peak,
+            "rss_growth_mb": split_peak - baseline,
+            "zones": len(zones),
+            "subfields": sum(len(subfields) for subfields in subfield_groups),
+            "vertices": int(sum(
+                shapely.get_num_coordinates(subfield) for subfields in subfield_groups for subfield, _ in subfields
+            )),
+        },
+        "placement": {"time_ms": __timings(placement_time), "peak_rss_mb": __peak_rss()},
+        "sampling": {"time_ms": __timings(sampling_time)},
+    })
+
+
+def __environment() -> dict[str, str | int | None]:
+    import dask
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "rasterio": rasterio.__version__,
+        "gdal": rasterio.__gdal_version__,
+        "shapely": shapely.__version__,
+        "dask": dask.__version__,
+    }
+
+
+def __compare(cases: list[dict], baseline_cases: list[dict]) -> None:
+    # Ratios above 1 are slower (or larger) than the baseline
+    baseline_cases = {case["name"]: case for case in baseline_cases}
+    print("%36s %10s %10s %10s %10s %12s" % (
+        "case", "split", "peak RSS", "placement", "sampling", "subfields"
+    ), file=sys.stderr)
+    for case in cases:
+        baseline = baseline_cases.get(case["name"])
+        if baseline is None or case.get("split") is None or baseline.get("split") is None:
+            print("%36s %10s" % (case["name"], "n/a"), file=sys.stderr)
+            continue
+        print("%36s %9.2fx %9.2fx %9.2fx %9.2fx %+12d" % (
+            case["name"],
+            case["split"]["time_s"]["p50"] / baseline["split"]["time_s"]["p50"],
+            case["split"]["peak_rss_mb"] / baseline["split"]["peak_rss_mb"],
+            case["placement"]["time_ms"]["p50"] / max(baseline["placement"]["time_ms"]["p50"], 1e-9),
+            case["sampling"]["time_ms"]["p50"] / max(baseline["sampling"]["time_ms"]["p50"], 1e-9),
+            case["split"]["subfields"] - baseline["split"]["subfields"]
+        ), file=sys.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[256, 1024])
+    parser.add_argument("--crss", nargs="+", default=["EPSG:4326", "EPSG:3857", "EPSG:32633"])
+    parser.add_argument("--noises", nargs="+", choices=NOISES, default=NOISES)
+    parser.add_argument("--fields", nargs="+", choices=FIELD_SHAPES, default=FIELD_SHAPES)
+    parser.add_argument("--classes", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="JSON file of the results, stdout by default")
+    parser.add_argument("--baseline", help="JSON file of a previous run to compare with")
+    args = parser.parse_args()
+    data_folder = tempfile.mkdtemp(prefix="algo-suite-")
+    context = multiprocessing.get_context("spawn")
+    cases = []
+    try:
+        print("%36s %10s %14s %10s %14s %14s" % (
+            "case", "split (s)", "peak RSS (MB)", "subfields", "placement (ms)", "sampling (ms)"
+        ), file=sys.stderr)
+        for size, crs, noise in itertools.product(args.sizes, args.crss, args.noises):
+            tiff_file = "%d-%s-%s.tif" % (size, crs.replace(":", ""), noise)
+            synthetic_raster(os.path.join(data_folder, tiff_file), size, crs=crs, noise=noise)
+            for shape in args.fields:
+                case = {
+                    "name": "%d/%s/%s/%s" % (size, crs, noise, shape),
+                    "size": size, "crs": crs, "noise": noise, "field": shape
+                }
+                coordinates = synthetic_field(os.path.join(data_folder, tiff_file), shape)
+                result = context.Queue()
+                process = context.Process(
+                    target=__run, args=(result, data_folder, tiff_file, coordinates, args.classes, args.repeat)
+                )
+                process.start()
+                process.join()
+                # E.g. killed by the kernel when running out of memory
+                measured = result.get() if process.exitcode == 0 else None
+                if measured is None:
+                    case["error"] = "exit %d" % process.exitcode if process.exitcode != 0 else "split failed"
+                    print("%36s %10s" % (case["name"], case["error"]), file=sys.stderr)
+                else:
+                    case.update(measured)
+                    print("%36s %10.3f %14.0f %10d %14.2f %14.2f" % (
+                        case["name"], case["split"]["time_s"]["p50"], case["split"]["peak_rss_mb"],
+                        case["split"]["subfields"], case["placement"]["time_ms"]["p50"],
+                        case["sampling"]["time_ms"]["p50"]
+                    ), file=sys.stderr)
+                cases.append(case)
+    finally:
+        shutil.rmtree(data_folder)
+    report = {
+        "environment": __environment(),
+        "parameters": {
+            "classes": args.classes, "repeat": args.repeat,
+            "split_max_pixels": NDVI.split_max_pixels, "split_chunk_size": NDVI.split_chunk_size,
+            "split_workers": NDVI.split_workers, "split_min_pixels": NDVI.split_min_pixels,
+            "split_min_area": NDVI.split_min_area,
+        },
+        "cases": cases,
+    }
+    if args.baseline is not None:
+        with open(args.baseline, "r") as baseline_file:
+            __compare(cases, json.load(baseline_file)["cases"])
+    if args.output is not None:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# Compares the call overhead of the per-call process of the former timeout_function
+# with the persistent process pool of libs.timeout.function_timeout.
+# Run from the backend folder (next to config.json): python -m benchmarks.function_timeout
+import time
+import argparse
+import multiprocessing
+from libs.timeout import function_timeout
+from libs.metric.recorder import Recorder
+
+
+def __trigger_function(result, f, *args):
+    result["data"] = f(*args)
+
+
+def __per_call_timeout_function(timeout, f, *args):
+    # The former implementation: a Manager and a process per call, polled every 200 ms
+    result = multiprocessing.Manager().dict()
+    process = multiprocessing.Process(target=__trigger_function, args=(result, f, *args,))
+    start_time = time.time()
+    process.start()
+    while time.time() - start_time < timeout and process.is_alive():
+        time.sleep(0.2)
+    process.terminate()
+    return result["data"] if "data" in result else None
+
+
+def __measure(call, repeat: int) -> dict[str, float | int]:
+    latency = Recorder()
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        call()
+        latency.record((time.perf_counter() - start_time) * 1000)
+    return latency.summary()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+    function_timeout.init(args.workers, preload=["libs.algo.subfield_split"])
+    try:
+        print("%24s %10s %10s %10s" % ("mode", "mean (ms)", "p50 (ms)", "p99 (ms)"))
+        for mode, call in [
+            ("per-call process", lambda: __per_call_timeout_function(5, pow, 2, 10)),
+            ("persistent pool", lambda: function_timeout.timeout_function(5, pow, 2, 10)),
+            # A hung task is killed at its deadline and its worker replaced
+            ("pool, 100 ms deadline", lambda: function_timeout.timeout_function(0.1, time.sleep, 1)),
+        ]:
+            summary = __measure(call, args.repeat)
+            print("%24s %10.2f %10.2f %10.2f" % (mode, summary["mean"], summary["p50"], summary["p99"]))
+    finally:
+        function_timeout.term()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# Compares the text (GeoJSON/WKT) and the binary (WKB) geometry transport of the subfield storage.
+# Run from the backend folder (next to config.json): python -m benchmarks.geometry_transport
+# All synthetic rows are inserted in a single transaction which is rolled back at the end
+import time
+import argparse
+from psycopg2 import connect
+from repos.store.dafs.field import insert_field
+from repos.store.dafs.season import insert_season
+from repos.store.dafs.measurement import insert_measurement
+from repos.store.dafs.subfield import insert_subfields, select_subfields
+from repos.store.geometry import geometry_column, decode_coordinates
+from benchmarks.synthetic import synthetic_regions
+from config import STORAGE
+
+
+__modes = ["text", "binary"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 10000])
+    parser.add_argument("--vertices", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    configured_transport = STORAGE.geometry_transport
+    conn = connect(
+        dbname=STORAGE.dbname, user=STORAGE.user, password=STORAGE.password,
+        host=STORAGE.host, port=STORAGE.port
+    )
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            """INSERT INTO "user"(email, password) VALUES ('geometry-transport@livesen.local', '-') RETURNING id"""
+        )
+        user_id = cursor.fetchone()[0]
+        field = insert_field(
+            cursor, user_id, "geometry-transport",
+            "POLYGON((12.5 48.8, 12.6 48.8, 12.6 48.9, 12.5 48.9, 12.5 48.8))"
+        )
+        print("%8s %8s %16s %14s %14s %14s" % (
+            "rows", "mode", "payload (KiB)", "insert (ms)", "select (ms)", "decode (ms)"
+        ))
+        for i, size in enumerate(args.sizes):
+            season_id = "2024-05-%02d" % (i + 1)
+            insert_season(cursor, user_id, field["id"], season_id, {})
+            measurement = insert_measurement(
+                cursor, user_id, field["id"], season_id,
+                {"longitude": 12.55, "latitude": 48.85, "ndvi": 0.5}
+            )
+            subfields = [
+                (measurement["id"], region, {"ndvi": 0.5})
+                for region in synthetic_regions(size, args.vertices)
+            ]
+            for mode in __modes:
+                STORAGE.geometry_transport = mode
+                insert_latencies, select_latencies, decode_latencies = [], [], []
+                for _ in range(args.repeat):
+                    cursor.execute("SAVEPOINT geometry_transport")
+                    start_time = time.perf_counter()
+                    insert_subfields(cursor, user_id, field["id"], season_id, subfields)
+                    insert_latencies.append((time.perf_counter() - start_time) * 1000)
+                    cursor.execute("ROLLBACK TO SAVEPOINT geometry_transport")
+                insert_subfields(cursor, user_id, field["id"], season_id, subfields)
+                for _ in range(args.repeat):
+                    start_time = time.perf_counter()
+                    select_subfields(cursor, user_id, field["id"], season_id)
+                    select_latencies.append((time.perf_counter() - start_time) * 1000)
+                    # Decoding alone, on the rows as fetched from the driver
+                    cursor.execute(
+                        f"""
+                        SELECT {geometry_column("region")}
+                        FROM subfield WHERE user_id = %s AND field_id = %s AND season_id = %s
+                        """,
+                        (user_id, field["id"], season_id,)
+                    )
+                    values = [value for value, in cursor.fetchall()]
+                    start_time = time.perf_counter()
+                    decode_coordinates(values)
+                    decode_latencies.append((time.perf_counter() - start_time) * 1000)
+                payload = sum(len(value) for value in values) / 1024
+                cursor.execute(
+                    "DELETE FROM subfield WHERE user_id = %s AND field_id = %s AND season_id = %s",
+                    (user_id, field["id"], season_id,)
+                )
+                print("%8d %8s %16.1f %14.2f %14.2f %14.2f" % (
+                    size, mode, payload,
+                    min(insert_latencies), min(select_latencies), min(decode_latencies)
+                ))
+    finally:
+        STORAGE.geometry_transport = configured_transport
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
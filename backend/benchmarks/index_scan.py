@@ -0,0 +1,164 @@
+# Confirms that the hot dafs queries are served by index scans on a large data set.
+# Run from the backend folder (next to config.json): python -m benchmarks.index_scan
+# All synthetic rows are inserted in a single transaction which is rolled back at the end
+import sys
+import argparse
+from psycopg2 import connect
+from psycopg2.extensions import cursor as BaseCursor
+from repos.store.migration import migrate
+from repos.store.dafs.field import select_field, select_fields_ids
+from repos.store.dafs.season import select_season, list_season_ids, select_ndvi_rasters
+from repos.store.dafs.measurement import select_measurements, select_sample_images
+from repos.store.dafs.subfield import select_subfields
+from config import STORAGE
+
+
+__tables = {"field", "season", "measurement", "subfield"}
+
+
+class ExplainCursor(BaseCursor):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.plans = []
+
+    def execute(self, query, vars=None):
+        super().execute("EXPLAIN (FORMAT JSON) " + query, vars)
+        self.plans.append((" ".join(query.split()), super().fetchone()[0][0]["Plan"]))
+        return super().execute(query, vars)
+
+
+def __scan_nodes(plan: dict) -> list[tuple[str, str]]:
+    nodes = []
+    if "Relation Name" in plan:
+        nodes.append((plan["Node Type"], plan["Relation Name"]))
+    for subplan in plan.get("Plans", []):
+        nodes += __scan_nodes(subplan)
+    return nodes
+
+
+def __populate(cursor: BaseCursor, num_fields: int, num_subfields: int) -> tuple[int, int, str, int]:
+    num_users = max(1, num_fields // 10)
+    cursor.execute(
+        """
+        INSERT INTO "user"(email, password)
+        SELECT 'index-scan-' || i || '@livesen.local', '-' FROM generate_series(0, %s - 1) AS i
+        """,
+        (num_users,)
+    )
+    cursor.execute(
+        """
+        INSERT INTO field(user_id, name, region)
+        SELECT u.id, 'field-' || i, ST_MakeEnvelope(
+            (i %% 100) * 0.1, (i / 100) * 0.1, (i %% 100) * 0.1 + 0.05, (i / 100) * 0.1 + 0.05, 4326
+        )
+        FROM generate_series(0, %s - 1) AS i
+        JOIN "user" AS u ON u.email = 'index-scan-' || (i %% %s) || '@livesen.local'
+        """,
+        (num_fields, num_users,)
+    )
+    season_id = "2024-05-01"
+    cursor.execute(
+        """
+        INSERT INTO season(user_id, field_id, season_id)
+        SELECT user_id, id, %s FROM field WHERE name LIKE 'field-%%'
+        AND user_id IN (SELECT id FROM "user" WHERE email LIKE 'index-scan-%%')
+        """,
+        (season_id,)
+    )
+    num_measurements = 3
+    cursor.execute(
+        """
+        INSERT INTO measurement(user_id, field_id, season_id, longitude, latitude, ndvi)
+        SELECT s.user_id, s.field_id, s.season_id, 0, 0, random()
+        FROM season AS s JOIN "user" AS u ON u.id = s.user_id, generate_series(1, %s)
+        WHERE u.email LIKE 'index-scan-%%'
+        """,
+        (num_measurements,)
+    )
+    per_measurement = max(1, num_subfields // (num_fields * num_measurements))
+    cursor.execute(
+        """
+        INSERT INTO subfield(user_id, field_id, season_id, measurement_id, region, area, ndvi)
+        SELECT m.user_id, m.field_id, m.season_id, m.id, ST_MakeEnvelope(
+            (m.field_id %% 100) * 0.1 + (k %% 32) * 0.001,
+            (m.field_id / 100) * 0.1 + (k / 32) * 0.001,
+            (m.field_id %% 100) * 0.1 + (k %% 32) * 0.001 + 0.001,
+            (m.field_id / 100) * 0.1 + (k / 32) * 0.001 + 0.001,
+            4326
+        ), 0.01, random()
+        FROM measurement AS m JOIN "user" AS u ON u.id = m.user_id, generate_series(0, %s - 1) AS k
+        WHERE u.email LIKE 'index-scan-%%'
+        """,
+        (per_measurement,)
+    )
+    cursor.execute("SELECT count(*) FROM subfield")
+    print(f"[Index Scan] {cursor.fetchone()[0]} subfields over {num_fields} fields of {num_users} users")
+    cursor.execute(
+        """
+        SELECT f.user_id, f.id FROM field AS f JOIN "user" AS u ON u.id = f.user_id
+        WHERE u.email = 'index-scan-' || %s || '@livesen.local'
+        ORDER BY f.id LIMIT 1
+        """,
+        (num_users // 2,)
+    )
+    user_id, field_id = cursor.fetchone()
+    cursor.execute("SELECT id FROM measurement WHERE field_id = %s LIMIT 1", (field_id,))
+    measurement_id = cursor.fetchone()[0]
+    return user_id, field_id, season_id, measurement_id
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fields", type=int, default=2000)
+    parser.add_argument("--subfields", type=int, default=1_000_000)
+    args = parser.parse_args()
+    conn = connect(
+        dbname=STORAGE.dbname, user=STORAGE.user, password=STORAGE.password,
+        host=STORAGE.host, port=STORAGE.port
+    )
+    failed = False
+    try:
+        with conn.cursor() as cursor:
+            migrate(cursor)
+            user_id, field_id, season_id, measurement_id = __populate(
+                cursor, args.fields, args.subfields
+            )
+            for table in __tables:
+                cursor.execute(f"ANALYZE {table}")
+        cursor = conn.cursor(cursor_factory=ExplainCursor)
+        select_field(cursor, user_id, field_id)
+        select_fields_ids(cursor, user_id)
+        select_season(cursor, user_id, field_id, season_id)
+        list_season_ids(cursor, user_id, field_id)
+        select_ndvi_rasters(cursor, user_id, field_id)
+        select_ndvi_rasters(cursor, user_id, field_id, season_id)
+        select_measurements(cursor, user_id, field_id, season_id)
+        select_sample_images(cursor, user_id, field_id)
+        select_sample_images(cursor, user_id, field_id, season_id)
+        select_subfields(cursor, user_id, field_id, season_id)
+        # Lookups issued by the foreign-key cascades and by spatial filters
+        cursor.execute("SELECT id FROM subfield WHERE measurement_id = %s", (measurement_id,))
+        cursor.execute("SELECT id FROM measurement WHERE field_id = %s AND season_id = %s",
+                       (field_id, season_id,))
+        cursor.execute("SELECT id FROM measurement WHERE field_id = %s", (field_id,))
+        cursor.execute("SELECT id FROM field WHERE region && ST_MakeEnvelope(1, 1, 1.01, 1.01, 4326)")
+        cursor.execute("SELECT id FROM subfield WHERE region && ST_MakeEnvelope(1, 1, 1.01, 1.01, 4326)")
+        for query, plan in cursor.plans:
+            nodes = [
+                (node_type, relation) for node_type, relation in __scan_nodes(plan)
+                if relation in __tables
+            ]
+            seq_scans = [relation for node_type, relation in nodes if node_type == "Seq Scan"]
+            status = "FAIL" if seq_scans else "OK"
+            failed = failed or len(seq_scans) > 0
+            print(f"[{status}] {query}")
+            for node_type, relation in nodes:
+                print(f"       {node_type} on {relation}")
+    finally:
+        conn.rollback()
+        conn.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
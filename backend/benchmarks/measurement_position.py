@@ -0,0 +1,111 @@
+# Compares the former random sampler placing the measurement in the first polygon
+# of a zone with the deterministic placement over all polygons of the zone.
+# Run from the backend folder (next to config.json): python -m benchmarks.measurement_position
+# The zones are split from a synthetic EPSG:4326 NDVI raster, which is removed at the end
+import os
+import math
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import rasterio
+import shapely
+from shapely.geometry import Point, Polygon
+from libs.algo.subfield_split import get_subfields_pixel_based_split
+from libs.algo.measurement_position import find_measurement_position
+from libs.metric.recorder import Recorder
+from benchmarks.synthetic import synthetic_raster
+from config import NDVI
+
+
+def __random_sampler(polygon: Polygon, num_points: int = 100) -> Point | None:
+    # The former implementation, applied to the first polygon of the zone
+    centroid = polygon.centroid
+    if polygon.contains(centroid):
+        return centroid
+    min_x, min_y, max_x, max_y = polygon.bounds
+    max_distance = 0
+    farthest_point = None
+    for _ in range(num_points):
+        x = min_x + (max_x - min_x) * random.random()
+        y = min_y + (max_y - min_y) * random.random()
+        point = Point(x, y)
+        if polygon.contains(point):
+            distance = point.distance(polygon.exterior)
+            if distance > max_distance:
+                max_distance = distance
+                farthest_point = point
+    return farthest_point
+
+
+def __neighbourhood(data: np.ndarray, raster_file, point: Point) -> np.ndarray:
+    row, col = raster_file.index(point.x, point.y)
+    values = data[max(0, row - 1):row + 2, max(0, col - 1):col + 2].ravel()
+    return values[~np.isnan(values)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--noise", type=float, default=0.03)
+    parser.add_argument("--classes", type=int, nargs="+", default=[3, 5, 7])
+    args = parser.parse_args()
+    data_folder = tempfile.mkdtemp(prefix="measurement-position-")
+    NDVI.data_folder = data_folder
+    try:
+        synthetic_raster(
+            os.path.join(data_folder, "synthetic.tif"), args.size,
+            noise="gaussian", noise_std=args.noise, period=40
+        )
+        zones = []
+        for classes in args.classes:
+            coordinates = [[[12.51, 48.81], [12.58, 48.81], [12.58, 48.89], [12.51, 48.89], [12.51, 48.81]]]
+            for subfields in get_subfields_pixel_based_split("synthetic.tif", coordinates, classes):
+                if len(subfields) > 0:
+                    pixel_count = sum(statistics["pixel_count"] for _, statistics in subfields)
+                    zones.append((
+                        [subfield for subfield, _ in subfields],
+                        sum(statistics["ndvi"] * statistics["pixel_count"] for _, statistics in subfields) / pixel_count
+                    ))
+        metres_per_degree = 111320 * math.cos(math.radians(48.85))
+        with rasterio.open(os.path.join(data_folder, "synthetic.tif")) as raster_file:
+            data = raster_file.read(1)
+            print("%d zones of %d to %d polygons" % (
+                len(zones), min(len(zone) for zone, _ in zones), max(len(zone) for zone, _ in zones)
+            ))
+            print("%16s %10s %10s %8s %14s %14s %14s %14s" % (
+                "placement", "p50 (ms)", "p99 (ms)", "none", "deterministic",
+                "boundary (m)", "local std", "zone offset"
+            ))
+            for placement, place in [
+                ("random sampler", lambda zone: __random_sampler(zone[0])),
+                ("deterministic", lambda zone: find_measurement_position(zone, "synthetic.tif", zone_ndvi)),
+            ]:
+                latency = Recorder()
+                nones, deterministic, distances, deviations, offsets = 0, 0, [], [], []
+                for zone, zone_ndvi in zones:
+                    start_time = time.perf_counter()
+                    point = place(zone)
+                    latency.record((time.perf_counter() - start_time) * 1000)
+                    if point is None:
+                        nones += 1
+                        continue
+                    deterministic += int(point.equals(place(zone)))
+                    distances.append(shapely.union_all(zone).boundary.distance(point) * metres_per_degree)
+                    values = __neighbourhood(data, raster_file, point)
+                    deviations.append(values.std())
+                    offsets.append(abs(values.mean() - zone_ndvi))
+                summary = latency.summary()
+                print("%16s %10.2f %10.2f %8d %14s %14.1f %14.4f %14.4f" % (
+                    placement, summary["p50"], summary["p99"], nones,
+                    "%d/%d" % (deterministic, len(zones) - nones),
+                    np.mean(distances), np.mean(deviations), np.mean(offsets)
+                ))
+    finally:
+        shutil.rmtree(data_folder)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# Compares the former bare `requests` calls with the pooled NDVI client (timeouts, retries,
+# circuit breaker) against the local stand-in provider answering normally, slowly, with
+# failures and with intermittent failures.
+# Run from the backend folder (next to config.json): python -m benchmarks.ndvi_client
+import time
+import argparse
+import requests
+from benchmarks.ndvi_provider import MODES, StandInProvider
+from repos.ndvi.client import NdviClient
+from libs.circuit.breaker import CircuitOpenError
+from libs.metric.recorder import Recorder
+
+
+def __former_call(provider: StandInProvider, path: str) -> bool:
+    # As formerly in repos.ndvi.raster: no session, no timeout, no retry
+    response = requests.get(url=f"{provider.url}{path}", params={"key": "benchmark"})
+    response.content
+    return response.status_code < 400
+
+
+def __client_call(client: NdviClient, path: str) -> bool:
+    with client.request("benchmark", "GET", path, stream=True) as response:
+        response.content
+        return response.status_code < 400
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--delay", type=float, default=1, help="response delay of the slow mode")
+    parser.add_argument("--failure-rate", type=float, default=0.3, help="failure rate of the flaky mode")
+    parser.add_argument("--read-timeout", type=float, default=0.3)
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--failure-threshold", type=int, default=5)
+    args = parser.parse_args()
+    provider = StandInProvider(delay=args.delay, failure_rate=args.failure_rate).start()
+    try:
+        # A parcel whose raster listing and (about 1 MB) raster download are requested
+        parcel_id = requests.post(f"{provider.url}/parcels", json={
+            "planting": "2024-05-01", "harvest": "2024-05-15",
+            "geometry": {"type": "Polygon", "coordinates": [[
+                [12.5, 48.8], [12.55, 48.8], [12.55, 48.85], [12.5, 48.85], [12.5, 48.8]
+            ]]}
+        }).json()["content"]["parcel_id"]
+        raster_id = requests.get(f"{provider.url}/parcels/{parcel_id}/ndvi").json()["content"][0]["raster_id"]
+        paths = {
+            "listing": f"/parcels/{parcel_id}/ndvi",
+            "download": f"/parcels/{parcel_id}/ndvi/sentinel2/{raster_id}.tif",
+        }
+        print("%8s %10s %8s %10s %10s %10s %10s %10s %10s" % (
+            "mode", "call", "impl", "succeeded", "p50 (ms)", "p99 (ms)", "max (ms)", "served", "rejected"
+        ))
+        for mode in args.modes:
+            for call, path in paths.items():
+                if mode == "slow" and call == "download":
+                    # Same as the listing, the delay precedes the body
+                    continue
+                for implementation in ["former", "client"]:
+                    client = NdviClient(
+                        url=provider.url, api_key="benchmark",
+                        connect_timeout=1, read_timeout=args.read_timeout,
+                        retries=args.retries, backoff_factor=0.05, pool_size=4,
+                        failure_threshold=args.failure_threshold, reset_timeout=30
+                    )
+                    provider.mode = "normal"
+                    # Warms up the connection (and the raster of the stand-in)
+                    __client_call(client, path)
+                    provider.mode = mode
+                    served = provider.requests
+                    latency, succeeded = Recorder(), 0
+                    for _ in range(args.calls):
+                        start_time = time.perf_counter()
+                        try:
+                            if implementation == "former":
+                                succeeded += int(__former_call(provider, path))
+                            else:
+                                succeeded += int(__client_call(client, path))
+                        except (requests.RequestException, CircuitOpenError):
+                            pass
+                        latency.record((time.perf_counter() - start_time) * 1000)
+                    summary = latency.summary()
+                    print("%8s %10s %8s %10s %10.2f %10.2f %10.2f %10d %10s" % (
+                        mode, call, implementation, "%d/%d" % (succeeded, args.calls),
+                        summary["p50"], summary["p99"], summary["max"],
+                        provider.requests - served,
+                        client.metrics()["rejected"] if implementation == "client" else "-"
+                    ))
+                    client.close()
+    finally:
+        provider.stop()
+
+
+if __name__ == "__main__":
+    main()
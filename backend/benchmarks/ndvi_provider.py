@@ -0,0 +1,227 @@
+# Local stand-in of the NDVI provider API (parcels, raster listing and raster download)
+# answering normally, slowly, with failures or with intermittent failures.
+# Used by the NDVI client benchmark, or started on its own to point ndvi.url at it:
+# python -m benchmarks.ndvi_provider --port 8099 --mode flaky
+# The rasters are synthetic EPSG:4326 rasters covering the registered parcels
+import os
+import re
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from benchmarks.synthetic import synthetic_raster
+
+
+# Behaviours of the stand-in
+# - normal: answers at once
+# - slow: answers after `delay` seconds
+# - failing: answers 503 at once
+# - flaky: answers 503 to a `failure_rate` fraction of the requests, normally otherwise
+MODES = ["normal", "slow", "failing", "flaky"]
+# Pixel size of the synthetic rasters in degrees, and their maximum size in pixels
+_resolution = 0.0001
+_max_size = 2048
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, as the provider, without delaying the body after the headers
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "StandInProvider"
+
+    def log_message(self, *_) -> None:
+        pass
+
+    def __send(self, status: int, body: bytes, content_type: str = "application/json") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def __send_json(self, status: int, content) -> None:
+        self.__send(status, json.dumps({"content": content}).encode())
+
+    def __degraded(self) -> bool:
+        # Answers 503 if the request fails under the current mode, after the delay of the slow mode
+        self.server.count_request()
+        mode = self.server.mode
+        if mode == "slow":
+            time.sleep(self.server.delay)
+        if mode == "failing" or (mode == "flaky" and self.server.draw_failure()):
+            self.__send_json(503, "unavailable")
+            return True
+        return False
+
+    def __body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_POST(self) -> None:
+        body = self.__body()
+        if self.__degraded():
+            return
+        if self.path.split("?")[0] != "/parcels":
+            self.__send_json(404, "not found")
+            return
+        self.__send_json(200, {"parcel_id": self.server.register(json.loads(body))})
+
+    def do_DELETE(self) -> None:
+        if self.__degraded():
+            return
+        match = re.fullmatch(r"/parcels/(\d+)", self.path.split("?")[0])
+        if match is None or not self.server.unregister(int(match.group(1))):
+            self.__send_json(404, "not found")
+            return
+        self.__send_json(200, "deleted")
+
+    def do_GET(self) -> None:
+        if self.__degraded():
+            return
+        path = self.path.split("?")[0]
+        match = re.fullmatch(r"/parcels/(\d+)/ndvi", path)
+        if match is not None:
+            rasters = self.server.rasters(int(match.group(1)))
+            if rasters is None:
+                self.__send_json(404, "not found")
+            else:
+                self.__send_json(200, rasters)
+            return
+        match = re.fullmatch(r"/parcels/(\d+)/ndvi/sentinel2/(\d+)\.tif", path)
+        if match is not None:
+            raster = self.server.raster(int(match.group(1)), int(match.group(2)))
+            if raster is None:
+                self.__send_json(404, "not found")
+            else:
+                self.__send(200, raster, "image/tiff")
+            return
+        self.__send_json(404, "not found")
+
+
+class StandInProvider(ThreadingHTTPServer):
+    """
+    Stand-in of the NDVI provider API on `127.0.0.1:port` (0 picks a free port),
+    served by a background thread between `start` and `stop`. The mode can be
+    switched while serving, every served request is counted
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self, port: int = 0, mode: str = "normal",
+        delay: float = 2, failure_rate: float = 0.3, seed: int = 0
+    ) -> None:
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.mode = mode
+        self.delay = delay
+        self.failure_rate = failure_rate
+        self.__random = random.Random(seed)
+        self.__lock = threading.Lock()
+        self.__requests = 0
+        self.__parcels: dict[int, dict] = {}
+        self.__rasters: dict[int, bytes] = {}
+        self.__folder = tempfile.mkdtemp(prefix="ndvi-provider-")
+        self.__thread: threading.Thread | None = None
+
+    def handle_error(self, request, client_address) -> None:
+        # Clients giving up on a slow response close their connection before it is written
+        pass
+
+    @property
+    def url(self) -> str:
+        return "http://127.0.0.1:%d" % self.server_address[1]
+
+    @property
+    def requests(self) -> int:
+        with self.__lock:
+            return self.__requests
+
+    def count_request(self) -> None:
+        with self.__lock:
+            self.__requests += 1
+
+    def draw_failure(self) -> bool:
+        with self.__lock:
+            return self.__random.random() < self.failure_rate
+
+    def register(self, parcel: dict) -> int:
+        with self.__lock:
+            parcel_id = len(self.__parcels) + 1
+            self.__parcels[parcel_id] = parcel
+            return parcel_id
+
+    def unregister(self, parcel_id: int) -> bool:
+        with self.__lock:
+            return self.__parcels.pop(parcel_id, None) is not None
+
+    def rasters(self, parcel_id: int) -> list[dict] | None:
+        with self.__lock:
+            parcel = self.__parcels.get(parcel_id)
+        if parcel is None:
+            return None
+        # Rasters every 5 days over the registered period
+        planting, harvest = date.fromisoformat(parcel["planting"]), date.fromisoformat(parcel["harvest"])
+        return [
+            {"raster_id": parcel_id * 1000 + k, "date": (planting + timedelta(days=5 * k)).isoformat()}
+            for k in range(min((harvest - planting).days // 5 + 1, 1000))
+        ]
+
+    def raster(self, parcel_id: int, raster_id: int) -> bytes | None:
+        with self.__lock:
+            parcel = self.__parcels.get(parcel_id)
+            raster = self.__rasters.get(raster_id)
+        if parcel is None or raster_id // 1000 != parcel_id:
+            return None
+        if raster is None:
+            # Covers the parcel with a margin of 10 pixels
+            coordinates = parcel["geometry"]["coordinates"][0]
+            lons, lats = [lon for lon, _ in coordinates], [lat for _, lat in coordinates]
+            size = int(max(max(lons) - min(lons), max(lats) - min(lats)) / _resolution) + 20
+            path = os.path.join(self.__folder, f"{raster_id}.tif")
+            synthetic_raster(
+                path, min(size, _max_size), noise="gaussian", seed=raster_id,
+                origin=(min(lons) - 10 * _resolution, max(lats) + 10 * _resolution)
+            )
+            with open(path, "rb") as raster_file:
+                raster = raster_file.read()
+            os.remove(path)
+            with self.__lock:
+                self.__rasters[raster_id] = raster
+        return raster
+
+    def start(self) -> "StandInProvider":
+        self.__thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self.__thread is not None:
+            self.__thread.join()
+        os.rmdir(self.__folder)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--mode", choices=MODES, default="normal")
+    parser.add_argument("--delay", type=float, default=2)
+    parser.add_argument("--failure-rate", type=float, default=0.3)
+    args = parser.parse_args()
+    provider = StandInProvider(args.port, args.mode, args.delay, args.failure_rate).start()
+    print("[NDVI Provider] %s mode on %s" % (args.mode, provider.url))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        provider.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# Compares the raster as downloaded (uncompressed strips) with its cloud-optimized rewrite
+# served by Flask as the NDVI endpoint does: file size, and bytes transferred and latency of
+# HTTP range reads of a map preview (at most 256 x 256 pixels) and of a full resolution
+# window, as read by GDAL over /vsicurl/.
+# Run from the backend folder (next to config.json): python -m benchmarks.raster_cog
+import os
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+import rasterio
+import rasterio.shutil
+from rasterio.windows import Window
+from flask import Flask, request, send_from_directory
+from werkzeug.serving import make_server
+from benchmarks.synthetic import NOISES, synthetic_raster
+from libs.algo.ndvi_ingest import write_cog
+
+
+class _Server:
+    """
+    Serves the files of `folder` with range support, counting the bytes sent
+    """
+
+    def __init__(self, folder: str) -> None:
+        self.sent = 0
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        app = Flask(__name__)
+
+        @app.route("/<path:name>", methods=["GET"])
+        def serve(name):
+            return send_from_directory(folder, name)
+
+        @app.after_request
+        def count(response):
+            if request.method == "GET":
+                self.sent += response.content_length or 0
+            return response
+
+        self.__server = make_server("127.0.0.1", 0, app, threaded=True)
+        self.url = "http://127.0.0.1:%d" % self.__server.server_port
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+        self.__thread.start()
+
+    def stop(self) -> None:
+        self.__server.shutdown()
+        self.__thread.join()
+
+
+def __range_read(server: _Server, name: str, read) -> tuple[int, float]:
+    # A fresh open per read, so that nothing is served from the GDAL block cache
+    sent = server.sent
+    start_time = time.perf_counter()
+    with rasterio.Env(
+        GDAL_DISABLE_READDIR_ON_OPEN="EMPTY_DIR", GDAL_CACHEMAX=0, VSI_CACHE=False,
+        CPL_VSIL_CURL_NON_CACHED=f"/vsicurl/{server.url}"
+    ), rasterio.open(f"/vsicurl/{server.url}/{name}") as raster_file:
+        read(raster_file)
+    return server.sent - sent, (time.perf_counter() - start_time) * 1000
+
+
+def __preview(raster_file) -> None:
+    scale = max(raster_file.width, raster_file.height) / 256
+    raster_file.read(1, out_shape=(
+        max(int(raster_file.height / scale), 1), max(int(raster_file.width / scale), 1)
+    ))
+
+
+def __window(raster_file) -> None:
+    raster_file.read(1, window=Window(raster_file.width // 2, raster_file.height // 2, 256, 256))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1024, 4096])
+    parser.add_argument("--noises", nargs="+", choices=NOISES, default=["smooth", "gaussian"])
+    args = parser.parse_args()
+    folder = tempfile.mkdtemp(prefix="raster-cog-")
+    server = _Server(folder)
+    try:
+        print("%6s %10s %8s %12s %14s %14s %14s %14s" % (
+            "size", "noise", "layout", "file (KiB)", "preview (KiB)", "preview (ms)", "window (KiB)", "window (ms)"
+        ))
+        for size in args.sizes:
+            for noise in args.noises:
+                synthetic = os.path.join(folder, "synthetic.tif")
+                synthetic_raster(synthetic, size, noise=noise)
+                downloaded = f"{size}-{noise}.tif"
+                rasterio.shutil.copy(synthetic, os.path.join(folder, downloaded), driver="GTiff")
+                optimized = f"{size}-{noise}.cog.tif"
+                write_cog(os.path.join(folder, downloaded), os.path.join(folder, optimized))
+                for layout, name in [("strips", downloaded), ("cog", optimized)]:
+                    preview_bytes, preview_time = __range_read(server, name, __preview)
+                    window_bytes, window_time = __range_read(server, name, __window)
+                    print("%6d %10s %8s %12.0f %14.0f %14.1f %14.0f %14.1f" % (
+                        size, noise, layout, os.path.getsize(os.path.join(folder, name)) / 1024,
+                        preview_bytes / 1024, preview_time, window_bytes / 1024, window_time
+                    ))
+    finally:
+        server.stop()
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# Compares the subfield response built by Flask from parsed records with the
+# response document assembled by PostgreSQL and passed through as text.
+# Run from the backend folder (next to config.json): python -m benchmarks.response_passthrough
+# All synthetic rows are inserted in a single transaction which is rolled back at the end
+import time
+import argparse
+import tracemalloc
+from flask import Flask, Response
+from psycopg2 import connect
+from repos.store.dafs.field import insert_field
+from repos.store.dafs.season import insert_season
+from repos.store.dafs.measurement import insert_measurement
+from repos.store.dafs.subfield import insert_subfields, select_subfields, select_subfields_json
+from libs.metric.recorder import Recorder
+from benchmarks.synthetic import synthetic_regions
+from config import STORAGE
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subfields", type=int, default=5000)
+    parser.add_argument("--vertices", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    app = Flask(__name__)
+    conn = connect(
+        dbname=STORAGE.dbname, user=STORAGE.user, password=STORAGE.password,
+        host=STORAGE.host, port=STORAGE.port
+    )
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            """INSERT INTO "user"(email, password) VALUES ('response-passthrough@livesen.local', '-') RETURNING id"""
+        )
+        user_id = cursor.fetchone()[0]
+        field = insert_field(
+            cursor, user_id, "response-passthrough",
+            "POLYGON((12.5 48.8, 12.6 48.8, 12.6 48.9, 12.5 48.9, 12.5 48.8))"
+        )
+        season_id = "2024-05-01"
+        insert_season(cursor, user_id, field["id"], season_id, {})
+        measurement = insert_measurement(
+            cursor, user_id, field["id"], season_id,
+            {"longitude": 12.55, "latitude": 48.85, "ndvi": 0.5}
+        )
+        insert_subfields(cursor, user_id, field["id"], season_id, [
+            (measurement["id"], region, {"ndvi": 0.5})
+            for region in synthetic_regions(args.subfields, args.vertices)
+        ])
+
+        def parsed() -> bytes:
+            subfields = select_subfields(cursor, user_id, field["id"], season_id)
+            return app.json.response(subfields).get_data()
+
+        def passthrough() -> bytes:
+            subfields = select_subfields_json(cursor, user_id, field["id"], season_id)
+            return Response(subfields, status=200, mimetype="application/json").get_data()
+
+        print("%12s %14s %10s %10s %16s" % ("mode", "body (KiB)", "p50 (ms)", "p99 (ms)", "peak (MiB)"))
+        with app.app_context():
+            for mode, build in [("parsed", parsed), ("passthrough", passthrough)]:
+                latency = Recorder()
+                for _ in range(args.repeat):
+                    start_time = time.perf_counter()
+                    body = build()
+                    latency.record((time.perf_counter() - start_time) * 1000)
+                tracemalloc.start()
+                build()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                summary = latency.summary()
+                print("%12s %14.1f %10.2f %10.2f %16.2f" % (
+                    mode, len(body) / 1024, summary["p50"], summary["p99"], peak / 1024 / 1024
+                ))
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# Compares the peak resident memory and the duration of the in-memory and the
+# chunked subfield split on a synthetic NDVI raster (10k x 10k pixels by default).
+# Run from the backend folder (next to config.json): python -m benchmarks.split_memory
+# Every split runs in a fresh process, the synthetic raster is removed at the end
+import os
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import multiprocessing
+from benchmarks.synthetic import synthetic_raster, synthetic_field
+from config import NDVI
+
+
+def __run(result, data_folder: str, coordinates, chunked: bool, chunk_size: int, workers: int) -> None:
+    from libs.algo.subfield_split import get_subfields_pixel_based_split
+    NDVI.data_folder = data_folder
+    NDVI.split_chunk_size = chunk_size
+    NDVI.split_workers = workers
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start_time = time.perf_counter()
+    subfield_groups = get_subfields_pixel_based_split("synthetic.tif", coordinates, chunked=chunked)
+    elapsed = time.perf_counter() - start_time
+    result.put((
+        elapsed,
+        None if subfield_groups is None else sum(len(subfields) for subfields in subfield_groups),
+        baseline / 1024,
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    ))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--fractions", type=float, nargs="+", default=[0.95, 0.1])
+    parser.add_argument("--chunk-size", type=int, default=NDVI.split_chunk_size)
+    parser.add_argument("--workers", type=int, default=NDVI.split_workers)
+    args = parser.parse_args()
+    data_folder = tempfile.mkdtemp(prefix="split-memory-")
+    context = multiprocessing.get_context("spawn")
+    try:
+        path = os.path.join(data_folder, "synthetic.tif")
+        # Smooth NDVI zones with a nodata corner
+        synthetic_raster(path, args.size, crs="EPSG:3857", nodata_corner=64)
+        print("%10s %10s %12s %10s %14s %14s" % (
+            "field", "mode", "subfields", "time (s)", "peak RSS (MB)", "split (MB)"
+        ))
+        for fraction in args.fractions:
+            coordinates = synthetic_field(path, fraction=fraction)
+            for mode in ["in-memory", "chunked"]:
+                result = context.Queue()
+                process = context.Process(
+                    target=__run,
+                    args=(result, data_folder, coordinates, mode == "chunked", args.chunk_size, args.workers)
+                )
+                process.start()
+                process.join()
+                if process.exitcode != 0:
+                    # E.g. killed by the kernel when running out of memory
+                    print("%10s %10s %12s" % ("%d%%" % (fraction * 100), mode, "exit %d" % process.exitcode))
+                    continue
+                elapsed, subfields, baseline, peak = result.get()
+                print("%10s %10s %12s %10.1f %14.0f %14.0f" % (
+                    "%d%%" % (fraction * 100), mode, subfields, elapsed, peak, peak - baseline
+                ))
+    finally:
+        shutil.rmtree(data_folder)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Compares the per-row and the bulk persistence of subfields.
+# Run from the backend folder (next to config.json): python -m benchmarks.subfield_insert
+# All synthetic rows are inserted in a single transaction which is rolled back at the end
+import time
+import argparse
+from psycopg2 import connect
+from psycopg2.extensions import cursor as BaseCursor
+from repos.store.dafs.field import insert_field
+from repos.store.dafs.season import insert_season
+from repos.store.dafs.measurement import insert_measurement
+from repos.store.dafs.subfield import insert_subfield, insert_subfields
+from config import STORAGE
+
+
+class CountingCursor(BaseCursor):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.statements = 0
+
+    def execute(self, query, vars=None):
+        self.statements += 1
+        return super().execute(query, vars)
+
+
+def __synthetic_regions(n: int) -> list[str]:
+    size = 0.0001
+    return [
+        "POLYGON((%f %f, %f %f, %f %f, %f %f, %f %f))" % (
+            x, y, x + size, y, x + size, y + size, x, y + size, x, y
+        )
+        for x, y in (
+            (12.5 + (i % 40) * size, 48.8 + (i // 40) * size) for i in range(n)
+        )
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    conn = connect(
+        dbname=STORAGE.dbname, user=STORAGE.user, password=STORAGE.password,
+        host=STORAGE.host, port=STORAGE.port
+    )
+    try:
+        cursor = conn.cursor(cursor_factory=CountingCursor)
+        cursor.execute(
+            """INSERT INTO "user"(email, password) VALUES ('subfield-insert@livesen.local', '-') RETURNING id"""
+        )
+        user_id = cursor.fetchone()[0]
+        field = insert_field(
+            cursor, user_id, "subfield-insert",
+            "POLYGON((12.5 48.8, 12.6 48.8, 12.6 48.9, 12.5 48.9, 12.5 48.8))"
+        )
+        season_id = "2024-05-01"
+        insert_season(cursor, user_id, field["id"], season_id, {})
+        measurement = insert_measurement(
+            cursor, user_id, field["id"], season_id,
+            {"longitude": 12.55, "latitude": 48.85, "ndvi": 0.5}
+        )
+        print("%8s %10s %14s %14s %14s" % ("rows", "mode", "statements", "mean (ms)", "min (ms)"))
+        for size in args.sizes:
+            regions = __synthetic_regions(size)
+            subfields = [(measurement["id"], region, {"ndvi": 0.5}) for region in regions]
+            for mode in ["per-row", "bulk"]:
+                latencies = []
+                for _ in range(args.repeat):
+                    cursor.statements = 0
+                    start_time = time.perf_counter()
+                    if mode == "per-row":
+                        for measurement_id, region, statistics in subfields:
+                            insert_subfield(
+                                cursor, user_id, field["id"], season_id, measurement_id, region, statistics
+                            )
+                    else:
+                        insert_subfields(cursor, user_id, field["id"], season_id, subfields)
+                    latencies.append((time.perf_counter() - start_time) * 1000)
+                print("%8d %10s %14d %14.2f %14.2f" % (
+                    size, mode, cursor.statements, sum(latencies) / len(latencies), min(latencies)
+                ))
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import math
+import numpy as np
+import rasterio
+from rasterio import warp
+from rasterio.crs import CRS
+from rasterio.windows import Window
+from rasterio.transform import from_origin
+
+
+# Patterns of the synthetic NDVI rasters
+# - smooth: sinusoidal NDVI zones
+# - gaussian: smooth zones with gaussian pixel noise
+# - speckle: smooth zones with heavy-tailed noise, negative (water) and nodata (cloud) pixels
+NOISES = ["smooth", "gaussian", "speckle"]
+# Shapes of the synthetic fields: convex quadrilateral, concave star and quadrilateral with two holes
+FIELD_SHAPES = ["convex", "concave", "holes"]
+# Default upper left corner (lon, lat) of the synthetic rasters
+__origin = (12.5, 48.9)
+
+
+def synthetic_regions(n: int, vertices: int) -> list[str]:
+    # Regular polygons standing in for the pixel-aligned subfields of a split
+    radius = 0.00004
+    regions = []
+    for i in range(n):
+        cx, cy = 12.5 + (i % 100) * 0.0001, 48.8 + (i // 100) * 0.0001
+        ring = [
+            (cx + radius * math.cos(2 * math.pi * k / vertices), cy + radius * math.sin(2 * math.pi * k / vertices))
+            for k in range(vertices)
+        ]
+        ring.append(ring[0])
+        regions.append("POLYGON((%s))" % ", ".join("%.9f %.9f" % point for point in ring))
+    return regions
+
+
+def __ndvi(
+    rows: slice, cols: slice, noise: str, noise_std: float, period: float, rng: np.random.Generator
+) -> np.ndarray:
+    yy, xx = np.mgrid[rows, cols]
+    data = 0.5 + 0.3 * np.sin(xx / period) * np.cos(yy / (period * 1.2))
+    if noise == "gaussian":
+        data += rng.normal(0, noise_std, data.shape)
+    elif noise == "speckle":
+        data += rng.laplace(0, noise_std, data.shape)
+        data[rng.random(data.shape) < 0.002] = -0.2
+        data[rng.random(data.shape) < 0.01] = np.nan
+    elif noise != "smooth":
+        raise ValueError(f"Unknown noise '{noise}'")
+    return data.astype("float32")
+
+
+def synthetic_raster(
+    path: str, size: int, crs: str = "EPSG:4326", noise: str = "smooth",
+    noise_std: float = 0.05, period: float = 250, nodata_corner: int = 0,
+    resolution: float | None = None, seed: int = 0, origin: tuple[float, float] | None = None
+) -> None:
+    """
+    Writes a `size` x `size` float32 NDVI GeoTIFF in `crs`, whose upper left
+    corner is at `origin` (lon, lat) whatever the CRS. Pixels are 0.0001 degree
+    (geographic CRS) or 10 metres (projected CRS) unless `resolution` is given.
+    The raster is written in strips, each seeded from `seed` and its row, so that
+    the same arguments always write the same raster
+    """
+    crs = CRS.from_user_input(crs)
+    if resolution is None:
+        resolution = 0.0001 if crs.is_geographic else 10
+    lon, lat = origin if origin is not None else __origin
+    xs, ys = warp.transform("EPSG:4326", crs, [lon], [lat])
+    profile = {
+        "driver": "GTiff", "height": size, "width": size, "count": 1, "dtype": "float32",
+        "crs": crs, "transform": from_origin(xs[0], ys[0], resolution, resolution), "nodata": np.nan,
+        "tiled": True, "blockxsize": 512, "blockysize": 512, "compress": "deflate",
+    }
+    with rasterio.open(path, "w", **profile) as raster_file:
+        for row_start in range(0, size, 512):
+            rows = min(512, size - row_start)
+            data = __ndvi(
+                slice(row_start, row_start + rows), slice(0, size), noise, noise_std, period,
+                np.random.default_rng([seed, row_start])
+            )
+            if row_start < nodata_corner:
+                data[:nodata_corner - row_start, :nodata_corner] = np.nan
+            raster_file.write(data, 1, window=Window(0, row_start, size, rows))
+
+
+def synthetic_field(
+    path: str, shape: str = "convex", fraction: float = 0.8
+) -> list[list[list[float]]]:
+    """
+    Coordinates (EPSG:4326, exterior ring then holes) of a field around the
+    center of the raster at `path`, covering about `fraction` of its extent
+    """
+    with rasterio.open(path) as raster_file:
+        minx, miny, maxx, maxy = warp.transform_bounds(raster_file.crs, "EPSG:4326", *raster_file.bounds)
+    cx, cy = (minx + maxx) / 2, (miny + maxy) / 2
+    dx, dy = (maxx - minx) * fraction / 2, (maxy - miny) * fraction / 2
+
+    def ring(points: list[tuple[float, float]]) -> list[list[float]]:
+        return [[cx + x * dx, cy + y * dy] for x, y in points + points[:1]]
+
+    quadrilateral = [(-1, -0.9), (0.9, -1), (1, 0.9), (-0.9, 1)]
+    if shape == "convex":
+        return [ring(quadrilateral)]
+    if shape == "concave":
+        # Star of 7 branches, whose inner vertices are at 40% of the outer radius
+        return [ring([
+            ((1 if k % 2 == 0 else 0.4) * math.cos(math.pi * k / 7),
+             (1 if k % 2 == 0 else 0.4) * math.sin(math.pi * k / 7))
+            for k in range(14)
+        ])]
+    if shape == "holes":
+        # Holes are clockwise, as the exterior ring is counterclockwise
+        return [ring(quadrilateral)] + [
+            ring([(hx + 0.2 * math.cos(-math.pi * k / 8), hy + 0.2 * math.sin(-math.pi * k / 8)) for k in range(16)])
+            for hx, hy in [(-0.4, -0.3), (0.4, 0.35)]
+        ]
+    raise ValueError(f"Unknown field shape '{shape}'")
@@ -16,6 +16,12 @@ class Storage:
     host: str | None = None
     port: int | None = None
     dbname: str | None = None
+    minconn: int = 1
+    maxconn: int = 64
+    checkout_timeout: float = 10
+    max_lifetime: float = 1800
+    statement_timeout: int = 30000
+    geometry_transport: str = "text"
 
     def parse(self, config: dict[str, Any]) -> None:
         self.user = config["user"]
@@ -23,6 +29,13 @@ class Storage:
         self.host = config["host"]
         self.port = config["port"]
         self.dbname = config["dbname"]
+        pool = config.get("pool", {})
+        self.minconn = pool.get("minconn", self.minconn)
+        self.maxconn = pool.get("maxconn", self.maxconn)
+        self.checkout_timeout = pool.get("checkout_timeout", self.checkout_timeout)
+        self.max_lifetime = pool.get("max_lifetime", self.max_lifetime)
+        self.statement_timeout = pool.get("statement_timeout", self.statement_timeout)
+        self.geometry_transport = config.get("geometry_transport", self.geometry_transport)
 
 
 class Recommender:
@@ -47,18 +60,63 @@ class Ndvi:
     data_folder: str | None = None
     url: str | None = None
     api_key: str | None = None
+    split_chunk_size: int = 2048
+    split_max_pixels: int = 4096 * 4096
+    split_workers: int = 2
+    split_min_pixels: int = 0
+    split_min_area: float = 0
+    split_cache_size: int = 256 * 1024 * 1024
+    connect_timeout: float = 3.05
+    read_timeout: float = 20
+    retries: int = 2
+    backoff_factor: float = 0.5
+    pool_size: int = 8
+    failure_threshold: int = 5
+    reset_timeout: float = 30
+    lease_timeout: float = 30
+    listing_ttl: float = 3600
+    prefetch_workers: int = 2
+    prefetch_pending: int = 256
+    refresh_interval: float = 6
+    refresh_days: int = 14
 
     def parse(self, config: dict[str, Any]) -> None:
         self.data_folder = config["data_folder"]
         self.url = config["url"]
         self.api_key = config["api_key"]
+        split = config.get("split", {})
+        self.split_chunk_size = split.get("chunk_size", self.split_chunk_size)
+        self.split_max_pixels = split.get("max_pixels", self.split_max_pixels)
+        self.split_workers = split.get("workers", self.split_workers)
+        self.split_min_pixels = split.get("min_pixels", self.split_min_pixels)
+        self.split_min_area = split.get("min_area", self.split_min_area)
+        self.split_cache_size = split.get("cache_size", self.split_cache_size)
+        client = config.get("client", {})
+        self.connect_timeout = client.get("connect_timeout", self.connect_timeout)
+        self.read_timeout = client.get("read_timeout", self.read_timeout)
+        self.retries = client.get("retries", self.retries)
+        self.backoff_factor = client.get("backoff_factor", self.backoff_factor)
+        self.pool_size = client.get("pool_size", self.pool_size)
+        self.failure_threshold = client.get("failure_threshold", self.failure_threshold)
+        self.reset_timeout = client.get("reset_timeout", self.reset_timeout)
+        self.lease_timeout = config.get("lease_timeout", self.lease_timeout)
+        self.listing_ttl = config.get("listing_ttl", self.listing_ttl)
+        prefetch = config.get("prefetch", {})
+        self.prefetch_workers = prefetch.get("workers", self.prefetch_workers)
+        self.prefetch_pending = prefetch.get("max_pending", self.prefetch_pending)
+        self.refresh_interval = prefetch.get("refresh_interval", self.refresh_interval)
+        self.refresh_days = prefetch.get("refresh_days", self.refresh_days)
 
 
 class Measurement:
     data_folder: str | None = None
+    max_workers: int = 2
+    max_pending: int = 32
 
     def parse(self, config: dict[str, Any]) -> None:
         self.data_folder = config["data_folder"]
+        self.max_workers = config.get("max_workers", self.max_workers)
+        self.max_pending = config.get("max_pending", self.max_pending)
 
 
 class Jwtoken:
@@ -1,43 +1,164 @@
 import os
-import random
+import math
+from functools import lru_cache
+import numpy as np
+import shapely
 from shapely.geometry import Point, Polygon
+from shapely.ops import polylabel
 import rasterio
+from rasterio import windows
+from affine import Affine
 from pyproj import Transformer
+from libs.algo.ndvi_ingest import resolve_raster
 from config import NDVI
 
 
+# Polygons of a zone, by decreasing area, whose pole of inaccessibility is a candidate
+__max_poles = 8
+# Weight of the NDVI heterogeneity of the neighbourhood against the normalized
+# distance to the zone boundary
+__homogeneity_weight = 0.5
+
+
+def __zone_polygons(zone: list[Polygon] | Polygon | list[list[list[float]]]) -> list[Polygon]:
+    if isinstance(zone, Polygon):
+        return [zone]
+    if len(zone) > 0 and isinstance(zone[0], Polygon):
+        return zone
+    return [Polygon(zone[0], zone[1:])]
+
+
+def __ndvi_window(
+    tiff_file: str | None, bounds: tuple[float, float, float, float]
+) -> tuple[np.ndarray, Affine] | None:
+    """
+    NDVI of the pixels covering the bounds, None without an EPSG:4326 raster
+    """
+    if tiff_file is None:
+        return None
+    with rasterio.open(resolve_raster(tiff_file)) as raster_file:
+        if raster_file.crs.to_epsg() != 4326:
+            return None
+        min_x, min_y, max_x, max_y = bounds
+        col_start, row_start = ~raster_file.transform * (min_x, max_y)
+        col_end, row_end = ~raster_file.transform * (max_x, min_y)
+        window = windows.Window.from_slices(
+            (max(0, math.floor(row_start)), min(raster_file.height, math.ceil(row_end))),
+            (max(0, math.floor(col_start)), min(raster_file.width, math.ceil(col_end))),
+            boundless=True
+        )
+        data = raster_file.read(1, window=window, out_dtype="float64")
+        return data, windows.transform(window, raster_file.transform)
+
+
+def __local_statistics(data: np.ndarray, valid: np.ndarray, radius: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Mean and standard deviation of the valid pixels in the (2r+1) x (2r+1)
+    neighbourhood of every pixel, from integral images
+    """
+    def box_sum(values: np.ndarray) -> np.ndarray:
+        size = 2 * radius + 1
+        # A leading zero row and column make the box sums of the first pixels regular
+        padded = np.pad(values, ((radius + 1, radius), (radius + 1, radius)))
+        integral = padded.cumsum(0).cumsum(1)
+        return (
+            integral[size:, size:] - integral[:-size, size:]
+            - integral[size:, :-size] + integral[:-size, :-size]
+        )
+    values = np.where(valid, data, 0)
+    count = box_sum(valid.astype(np.float64))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = box_sum(values) / count
+        variance = box_sum(values * values) / count - mean * mean
+    return mean, np.sqrt(np.maximum(variance, 0))
+
+
 def find_measurement_position(
-    coordinates: list[list[list[float]]] | Polygon,
-    num_points: int = 100
+    zone: list[Polygon] | Polygon | list[list[list[float]]],
+    tiff_file: str | None = None,
+    ndvi: float | None = None,
+    grid_size: int = 32,
+    radius: int = 1
 ) -> Point:
-    if isinstance(coordinates, Polygon):
-        polygon = coordinates
-    else:
-        shell = coordinates[0]
-        holes = coordinates[1:]
-        polygon = Polygon(shell, holes)
-    centroid = polygon.centroid
-    if polygon.contains(centroid):
-        return centroid
-    bbox = polygon.bounds
-    min_x, min_y, max_x, max_y = bbox
-    max_distance = 0
-    farthest_point = None
-    for _ in range(num_points):
-        x = min_x + (max_x - min_x) * random.random()
-        y = min_y + (max_y - min_y) * random.random()
-        point = Point(x, y)
-        if polygon.contains(point):
-            distance = point.distance(polygon.exterior)
-            if distance > max_distance:
-                max_distance = distance
-                farthest_point = point
-    return farthest_point
-
-
-def get_measurement_position_ndvi(tiff_file: str, coordinate: list[float]) -> float:
-    with rasterio.open(os.path.join(NDVI.data_folder, tiff_file)) as raster_file:
-        transformer = Transformer.from_crs("epsg:4326", raster_file.crs)
-        transformed_coordinate =  transformer.transform(coordinate[1], coordinate[0])
-        ndvi = next(raster_file.sample([transformed_coordinate], 1))
-        return float(ndvi[0])
+    """
+    Places the measurement of a zone, given as its polygons, at the candidate
+    farthest inside the zone whose neighbourhood of `radius` pixels has the most
+    homogeneous NDVI, closest to the `ndvi` of the zone (by default, that of the
+    candidates' neighbourhoods).
+    Candidates are the poles of inaccessibility of the largest polygons and a
+    `grid_size` x `grid_size` grid over the zone, so the placement is deterministic
+    """
+    polygons = sorted(__zone_polygons(zone), key=lambda polygon: polygon.area, reverse=True)
+    # The polygons of a zone do not overlap, so no union is needed
+    zone_geometry = shapely.multipolygons(polygons)
+    shapely.prepare(zone_geometry)
+    min_x, min_y, max_x, max_y = zone_geometry.bounds
+    cell_size = max(max_x - min_x, max_y - min_y) / grid_size
+    poles = [
+        polylabel(polygon, tolerance=cell_size / 4 or 1e-9)
+        for polygon in polygons[:__max_poles]
+    ]
+    grid_x, grid_y = np.meshgrid(
+        np.linspace(min_x, max_x, grid_size + 2)[1:-1],
+        np.linspace(min_y, max_y, grid_size + 2)[1:-1]
+    )
+    inside = shapely.contains_xy(zone_geometry, grid_x, grid_y)
+    x = np.concatenate([[pole.x for pole in poles], grid_x[inside]])
+    y = np.concatenate([[pole.y for pole in poles], grid_y[inside]])
+    # Distance of every candidate to the nearest polygon boundary of the zone
+    boundary_tree = shapely.STRtree(shapely.boundary(polygons))
+    _, distance = boundary_tree.query_nearest(shapely.points(x, y), return_distance=True, all_matches=False)
+    score = distance / distance.max() if distance.max() > 0 else np.zeros(x.size)
+    ndvi_window = __ndvi_window(tiff_file, zone_geometry.bounds)
+    if ndvi_window is not None and ndvi_window[0].size > 0:
+        data, window_transform = ndvi_window
+        mean, std = __local_statistics(data, ~np.isnan(data) & (data >= 0), radius)
+        rows, cols = rasterio.transform.rowcol(window_transform, x, y)
+        rows = np.clip(rows, 0, data.shape[0] - 1)
+        cols = np.clip(cols, 0, data.shape[1] - 1)
+        mean, std = mean[rows, cols], std[rows, cols]
+        finite = np.isfinite(mean)
+        if finite.any():
+            zone_ndvi = ndvi if ndvi is not None else np.median(mean[finite])
+            # Neighbourhoods varying in themselves or deviating from the zone are penalized,
+            # those without valid pixels the most
+            heterogeneity = std + np.abs(mean - zone_ndvi)
+            max_heterogeneity = heterogeneity[finite].max()
+            if max_heterogeneity > 0:
+                heterogeneity = np.where(finite, heterogeneity / max_heterogeneity, 2)
+                score = score - __homogeneity_weight * heterogeneity
+    best = int(np.argmax(score))
+    return Point(x[best], y[best])
+
+
+@lru_cache(maxsize=16)
+def __transformer(crs: str) -> Transformer:
+    return Transformer.from_crs("epsg:4326", crs)
+
+
+def __sample(path: str, coordinate: list[float]) -> float | None:
+    with rasterio.open(path) as raster_file:
+        if raster_file.crs.to_epsg() == 4326:
+            # Ingested derivatives are sampled at the longitude/latitude directly
+            transformed_coordinate = (coordinate[0], coordinate[1])
+        else:
+            transformer = __transformer(raster_file.crs.to_string())
+            transformed_coordinate = transformer.transform(coordinate[1], coordinate[0])
+        ndvi = float(next(raster_file.sample([transformed_coordinate], 1))[0])
+        if math.isnan(ndvi) or ndvi == raster_file.nodata:
+            return None
+        return ndvi
+
+
+def get_measurement_position_ndvi(tiff_file: str, coordinate: list[float]) -> float | None:
+    """
+    NDVI of the pixel at the longitude/latitude, None outside the raster's
+    valid pixels. Positions outside the field, masked in the derivative, are
+    sampled from the downloaded raster
+    """
+    path = resolve_raster(tiff_file)
+    ndvi = __sample(path, coordinate)
+    source_path = os.path.join(NDVI.data_folder, tiff_file)
+    if ndvi is None and path != source_path:
+        ndvi = __sample(source_path, coordinate)
+    return ndvi
@@ -0,0 +1,116 @@
+import os
+import uuid
+import numpy as np
+import rasterio
+import rasterio.shutil
+from rasterio import mask, windows
+from rasterio.io import DatasetReader
+from rasterio.enums import Resampling
+from rasterio.vrt import WarpedVRT
+from shapely.geometry import Polygon
+from config import NDVI
+
+
+# CRS of the derivatives, the one of the stored field and subfield geometries
+INGEST_CRS = "EPSG:4326"
+# Tag marking a derivative whose pixels outside the field are nodata
+__field_mask_tag = "FIELD_MASK"
+# Internal tile size of the stored rasters, overviews are built down to a single tile
+__cog_blocksize = 256
+
+
+def ingested_raster(tiff_file: str) -> str:
+    """
+    Name of the EPSG:4326 derivative of the downloaded raster
+    """
+    name, _ = os.path.splitext(tiff_file)
+    return f"{name}.4326.tif"
+
+
+def resolve_raster(tiff_file: str) -> str:
+    """
+    Path of the derivative of the raster if it has been ingested, of the
+    downloaded raster otherwise
+    """
+    path = os.path.join(NDVI.data_folder, ingested_raster(tiff_file))
+    if os.path.exists(path):
+        return path
+    return os.path.join(NDVI.data_folder, tiff_file)
+
+
+def is_field_masked(raster_file: DatasetReader) -> bool:
+    return raster_file.tags().get(__field_mask_tag) == "applied"
+
+
+def write_cog(source_path: str, path: str) -> bool:
+    """
+    Rewrites the raster as a cloud-optimized GeoTIFF: internal tiles, DEFLATE
+    compression with the predictor of its data type and overviews stored
+    ahead of the full resolution, so that readers of byte ranges only fetch
+    the tiles of the level they display. Returns False if it failed
+    """
+    try:
+        rasterio.shutil.copy(
+            source_path, path, driver="COG",
+            blocksize=__cog_blocksize, compress="DEFLATE", predictor="YES",
+            overviews="AUTO", overview_resampling="AVERAGE", bigtiff="IF_SAFER"
+        )
+        return True
+    except Exception as error:
+        print("[NDVI Ingest]", error)
+        if os.path.exists(path):
+            os.remove(path)
+        return False
+
+
+def ingest_ndvi_raster(
+    tiff_file: str, coordinates: list[list[list[float]]]
+) -> str | None:
+    """
+    Warps the downloaded raster once into a georeferenced EPSG:4326 derivative,
+    whose pixels outside the field are set to nodata (NaN). Returns the name
+    of the derivative, or None if the ingest failed
+    """
+    derivative = ingested_raster(tiff_file)
+    path = os.path.join(NDVI.data_folder, derivative)
+    if os.path.exists(path):
+        return derivative
+    field = Polygon(coordinates[0], coordinates[1:])
+    # Concurrent ingests of the same raster each write their own file, the last rename wins
+    temporary_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with rasterio.open(os.path.join(NDVI.data_folder, tiff_file)) as raster_file, WarpedVRT(
+            raster_file, crs=INGEST_CRS, resampling=Resampling.nearest,
+            dtype="float32", nodata=np.nan
+        ) as warped_file:
+            profile = {
+                "driver": "GTiff", "width": warped_file.width, "height": warped_file.height,
+                "count": 1, "dtype": "float32", "nodata": np.nan,
+                "crs": INGEST_CRS, "transform": warped_file.transform,
+                "tiled": True, "blockxsize": 256, "blockysize": 256,
+                "compress": "deflate", "predictor": 3,
+            }
+            with rasterio.open(temporary_path, "w", **profile) as ingested_file:
+                # Block by block, so that large rasters are never held in memory
+                for _, window in ingested_file.block_windows(1):
+                    data = warped_file.read(1, window=window)
+                    data[mask.geometry_mask(
+                        geometries=[field],
+                        out_shape=data.shape,
+                        transform=windows.transform(window, warped_file.transform)
+                    )] = np.nan
+                    ingested_file.write(data, 1, window=window)
+                ingested_file.update_tags(**{__field_mask_tag: "applied"})
+        os.replace(temporary_path, path)
+        return derivative
+    except Exception as error:
+        print("[NDVI Ingest]", error)
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        return None
+
+
+def remove_ingested_raster(tiff_file: str) -> None:
+    path = os.path.join(NDVI.data_folder, ingested_raster(tiff_file))
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,138 @@
+import io
+import os
+import json
+import hashlib
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+from libs.cache.lru import LRUCache
+from libs.cache.disk import DiskCache
+from libs.algo.ndvi_ingest import resolve_raster
+from libs.algo.subfield_split import get_subfields_pixel_based_split
+from config import NDVI
+
+
+# Bumped whenever the split or the encoding below changes, so that older entries are never read
+__version = 1
+__statistics = ["ndvi", "ndvi_min", "ndvi_max", "ndvi_std"]
+# Digests of the rasters by (path, size, modification time), so that unchanged rasters are hashed once
+__raster_digests = LRUCache(capacity=256)
+__cache: DiskCache | None = None
+
+
+def __raster_digest(path: str) -> str:
+    stat = os.stat(path)
+    identity = (path, stat.st_size, stat.st_mtime_ns)
+    digest = __raster_digests.get(identity)
+    if digest is None:
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as raster_file:
+            for block in iter(lambda: raster_file.read(1 << 20), b""):
+                sha256.update(block)
+        digest = sha256.hexdigest()
+        __raster_digests.put(identity, digest)
+    return digest
+
+
+def split_key(
+    tiff_file: str, coordinates: list[list[list[float]]],
+    classes: int = 3, classification: str = "equal_interval", breaks: list[float] | None = None
+) -> str | None:
+    """
+    Content address of the split: digest of the raster read by the split, of
+    the field geometry and of every parameter the zones depend on. None if the
+    raster cannot be read
+    """
+    field = Polygon(coordinates[0], coordinates[1:])
+    parameters = json.dumps([
+        __version, classes, classification, breaks,
+        NDVI.split_max_pixels, NDVI.split_min_pixels, NDVI.split_min_area
+    ])
+    try:
+        raster_digest = __raster_digest(resolve_raster(tiff_file))
+    except Exception as error:
+        print("[Split Cache]", error)
+        return None
+    sha256 = hashlib.sha256()
+    sha256.update(raster_digest.encode())
+    sha256.update(shapely.to_wkb(field, byte_order=1))
+    sha256.update(parameters.encode())
+    return sha256.hexdigest()
+
+
+def __encode(subfield_groups: list[list[tuple[Polygon, dict[str, float | int]]]]) -> bytes:
+    # WKB of all subfields concatenated, with the group, offset and statistics of every subfield in columns
+    subfield_statistics = [item for subfields in subfield_groups for item in subfields]
+    wkbs = [shapely.to_wkb(subfield) for subfield, _ in subfield_statistics]
+    columns = {
+        "groups": np.array([len(subfields) for subfields in subfield_groups], dtype=np.int64),
+        "offsets": np.cumsum([0] + [len(wkb) for wkb in wkbs], dtype=np.int64),
+        "wkb": np.frombuffer(b"".join(wkbs), dtype=np.uint8),
+        "pixel_count": np.array([statistics["pixel_count"] for _, statistics in subfield_statistics], dtype=np.int64),
+    }
+    for col in __statistics:
+        columns[col] = np.array([statistics[col] for _, statistics in subfield_statistics], dtype=np.float64)
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **columns)
+    return buffer.getvalue()
+
+
+def __decode(value: bytes) -> list[list[tuple[Polygon, dict[str, float | int]]]]:
+    with np.load(io.BytesIO(value)) as columns:
+        offsets, wkb = columns["offsets"], columns["wkb"].tobytes()
+        subfields = shapely.from_wkb([wkb[start:end] for start, end in zip(offsets[:-1], offsets[1:])])
+        statistics = [
+            dict(zip(__statistics + ["pixel_count"], values))
+            for values in zip(
+                *(columns[col].tolist() for col in __statistics), columns["pixel_count"].tolist()
+            )
+        ]
+        subfield_groups, start = [], 0
+        for length in columns["groups"].tolist():
+            subfield_groups.append(list(zip(subfields[start:start + length], statistics[start:start + length])))
+            start += length
+    return subfield_groups
+
+
+def __split_cache() -> DiskCache | None:
+    global __cache
+    if __cache is None and NDVI.split_cache_size > 0:
+        __cache = DiskCache(os.path.join(NDVI.data_folder, "split_cache"), NDVI.split_cache_size)
+    return __cache
+
+
+def cached_split(key: str) -> list[list[tuple[Polygon, dict[str, float | int]]]] | None:
+    """
+    Split stored under `key`, None if not cached
+    """
+    try:
+        cache = __split_cache()
+        value = cache.get(key) if cache is not None else None
+        return __decode(value) if value is not None else None
+    except Exception as error:
+        print("[Split Cache]", error)
+        return None
+
+
+def get_cached_subfields_pixel_based_split(
+    key: str, tiff_file: str, coordinates: list[list[list[float]]],
+    classes: int = 3, classification: str = "equal_interval", breaks: list[float] | None = None
+) -> list[list[tuple[Polygon, dict[str, float | int]]]] | None:
+    """
+    `get_subfields_pixel_based_split` memoized under its `split_key`, shared
+    by every process through the cache folder next to the NDVI rasters
+    """
+    subfield_groups = cached_split(key)
+    if subfield_groups is not None:
+        return subfield_groups
+    subfield_groups = get_subfields_pixel_based_split(
+        tiff_file, coordinates, classes, classification, breaks
+    )
+    if subfield_groups is not None:
+        try:
+            cache = __split_cache()
+            if cache is not None:
+                cache.put(key, __encode(subfield_groups))
+        except Exception as error:
+            print("[Split Cache]", error)
+    return subfield_groups
@@ -1,23 +1,143 @@
-import os
 import math
+import warnings
 import numpy as np
 import rasterio
 from rasterio.io import DatasetReader
+from rasterio.errors import NotGeoreferencedWarning
 from rasterio import features, mask, windows, warp, transform
+from affine import Affine
+import shapely
 from shapely.geometry import Polygon, box
-from shapely import unary_union
+import dask
+import dask.array
+import rioxarray
+from libs.algo.ndvi_ingest import resolve_raster, is_field_masked
 from config import NDVI
 
 
-def __ndvi_range(raster_data, n: int) -> list[tuple[float, float]]:
-    raster_data = raster_data[raster_data >= 0]
-    ndvi_min = np.nanmin(raster_data)
-    ndvi_max = np.nanmax(raster_data)
-    d = ndvi_max - ndvi_min
-    ndvi_ranges = [(ndvi_min - 1e-7, ndvi_min + d/n)]\
-        + [(ndvi_min + d*i/n, ndvi_min + d*(i+1)/n) for i in range(1, n-1)]\
-        + [(ndvi_min + d*(n-1)/n, ndvi_max)]
-    return ndvi_ranges
+# Methods placing the class breaks between the minimum and maximum NDVI of the field
+CLASSIFICATIONS = ["equal_interval", "quantile"]
+# Resolution of the NDVI histogram from which the chunked split derives quantile breaks
+__histogram_bins = 4096
+# Length of a degree of latitude, from which the area of a pixel is approximated
+__metres_per_degree = 111320
+# Sieving and rasterizing in pixel coordinates use the identity transform on purpose
+warnings.filterwarnings("ignore", category=NotGeoreferencedWarning, module="rasterio.features")
+
+
+def __class_breaks(
+    values: np.ndarray, classes: int, classification: str
+) -> np.ndarray:
+    if classification == "equal_interval":
+        return np.linspace(values.min(), values.max(), classes + 1)[1:-1]
+    if classification == "quantile":
+        return np.quantile(values, np.linspace(0, 1, classes + 1)[1:-1])
+    raise ValueError(f"Unknown classification '{classification}'")
+
+
+def __label(
+    raster_data: np.ndarray, valid: np.ndarray, class_breaks: np.ndarray
+) -> np.ndarray:
+    # A pixel belongs to class i if breaks[i-2] < ndvi <= breaks[i-1]
+    labels = np.zeros(raster_data.shape, dtype=np.int32)
+    labels[valid] = np.digitize(raster_data[valid], class_breaks, right=True) + 1
+    return labels
+
+
+def __classify(
+    raster_data: np.ndarray, valid: np.ndarray,
+    classes: int, classification: str, breaks: list[float] | None
+) -> tuple[np.ndarray, int]:
+    """
+    Labels every valid pixel with its class 1..n in one pass, 0 elsewhere
+    """
+    values = raster_data[valid]
+    if breaks is not None:
+        class_breaks = np.sort(np.asarray(breaks, dtype=raster_data.dtype))
+    elif values.size > 0:
+        class_breaks = __class_breaks(values, classes, classification)
+    else:
+        class_breaks = np.zeros(classes - 1)
+    return __label(raster_data, valid, class_breaks), len(class_breaks) + 1
+
+
+def __sieve_size(raster_transform, field: Polygon) -> int:
+    """
+    Minimum mapping unit in pixels, from `NDVI.split_min_pixels` and the
+    `NDVI.split_min_area` in square metres at the latitude of the field
+    """
+    size = NDVI.split_min_pixels
+    if NDVI.split_min_area > 0:
+        pixel_area = (
+            abs(raster_transform.a * raster_transform.e) * __metres_per_degree ** 2
+            * math.cos(math.radians(field.centroid.y))
+        )
+        size = max(size, math.ceil(NDVI.split_min_area / pixel_area))
+    return size
+
+
+def __sieve(labels: np.ndarray, valid: np.ndarray, size: int) -> np.ndarray:
+    """
+    Merges the zones smaller than `size` pixels into a neighbouring zone, GDAL
+    picks the largest neighbour. Zones without valid neighbour are kept
+    """
+    if size <= 1:
+        return labels
+    return features.sieve(labels, size, mask=valid, connectivity=4)
+
+
+def __shapes(
+    labels: np.ndarray, valid: np.ndarray, shape_transform
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Polygonizes the label raster once, returns the polygons with their class
+    """
+    coords, ring_offsets, polygon_offsets, polygon_labels = [], [0], [0], []
+    for shape, label in features.shapes(
+        labels, valid, connectivity=4, transform=shape_transform
+    ):
+        for ring in shape["coordinates"]:
+            coords.extend(ring)
+            ring_offsets.append(len(coords))
+        polygon_offsets.append(len(ring_offsets) - 1)
+        polygon_labels.append(int(label))
+    if len(polygon_labels) == 0:
+        return np.empty(0, dtype=object), np.empty(0, dtype=np.int32)
+    polygons = shapely.from_ragged_array(
+        shapely.GeometryType.POLYGON,
+        np.asarray(coords, dtype=np.float64),
+        (np.asarray(ring_offsets), np.asarray(polygon_offsets))
+    )
+    return polygons, np.asarray(polygon_labels, dtype=np.int32)
+
+
+def __dissolve(
+    polygons: np.ndarray, polygon_labels: np.ndarray, classes: int,
+    union=shapely.coverage_union_all
+) -> list[list[Polygon]]:
+    # The zones of each class are dissolved and split into their connected parts
+    result = [[] for _ in range(classes)]
+    for label in np.unique(polygon_labels):
+        dissolved = union(polygons[polygon_labels == label])
+        result[label - 1] = list(shapely.get_parts(dissolved))
+    return result
+
+
+def __polygonize(
+    labels: np.ndarray, valid: np.ndarray, raster_transform, classes: int
+) -> list[list[Polygon]]:
+    """
+    Polygonizes the label raster once, the zones of each class are dissolved
+    with a coverage union since they share exact pixel edges
+    """
+    return __dissolve(*__shapes(labels, valid, raster_transform), classes)
+
+
+def __affine_transform(geometries, affine: Affine):
+    a, b, c, d, e, f = affine[:6]
+    return shapely.transform(
+        geometries, lambda coords: coords @ np.array([[a, d], [b, e]]) + np.array([c, f])
+    )
 
 
 def __polygon(coordinates) -> Polygon:
@@ -27,6 +147,9 @@ def __polygon(coordinates) -> Polygon:
 
 
 def __transform(raster_file: DatasetReader):
+    # Ingested derivatives are georeferenced in EPSG:4326 already
+    if raster_file.crs.to_epsg() == 4326:
+        return raster_file.transform
     transformed_bounds = warp.transform_bounds(raster_file.crs, "epsg:4326",
                                                *raster_file.bounds)
     raster_transform = transform.from_bounds(*transformed_bounds,
@@ -34,99 +157,369 @@ def __transform(raster_file: DatasetReader):
     return raster_transform
 
 
+def __field_window(
+    raster_file: DatasetReader, raster_transform, field: Polygon
+) -> windows.Window | None:
+    """
+    Pixel window covering the bounding box of the field, None if the field
+    lies outside the raster
+    """
+    minx, miny, maxx, maxy = field.bounds
+    col_start, row_start = ~raster_transform * (minx, maxy)
+    col_end, row_end = ~raster_transform * (maxx, miny)
+    col_start, row_start = max(0, math.floor(col_start)), max(0, math.floor(row_start))
+    col_end = min(raster_file.width, math.ceil(col_end))
+    row_end = min(raster_file.height, math.ceil(row_end))
+    if col_start >= col_end or row_start >= row_end:
+        return None
+    return windows.Window.from_slices((row_start, row_end), (col_start, col_end))
+
+
+def __zonal_aggregates(
+    raster_data: np.ndarray, zones: np.ndarray, count_zones: int
+) -> tuple[np.ndarray, ...]:
+    """
+    Zone ids present in the label raster with their pixel count, sum, sum of
+    squares, minimum and maximum of the NDVI, in one pass over the pixels
+    """
+    labels = zones.ravel()
+    inside = labels > 0
+    labels = labels[inside]
+    values = raster_data.ravel()[inside].astype(np.float64)
+    pixel_count = np.bincount(labels, minlength=count_zones + 1)
+    zone_ids = np.flatnonzero(pixel_count)
+    total = np.bincount(labels, weights=values, minlength=count_zones + 1)
+    squares = np.bincount(labels, weights=values * values, minlength=count_zones + 1)
+    # Minimum and maximum are reduced over the runs of the pixels sorted by zone
+    sorted_values = values[np.argsort(labels, kind="stable")]
+    counts = pixel_count[zone_ids]
+    starts = np.cumsum(counts) - counts
+    if zone_ids.size > 0:
+        minimum = np.minimum.reduceat(sorted_values, starts)
+        maximum = np.maximum.reduceat(sorted_values, starts)
+    else:
+        minimum, maximum = np.empty(0), np.empty(0)
+    return zone_ids, counts, total[zone_ids], squares[zone_ids], minimum, maximum
+
+
+def __zonal_statistics(
+    aggregates: list[tuple[np.ndarray, ...]], count_zones: int
+) -> list[dict[str, float | int] | None]:
+    """
+    Statistics of every zone 1..n combined from the aggregates of (chunks of)
+    the label raster, None for a zone without pixels
+    """
+    pixel_count = np.zeros(count_zones + 1, dtype=np.int64)
+    total = np.zeros(count_zones + 1)
+    squares = np.zeros(count_zones + 1)
+    minimum = np.full(count_zones + 1, np.inf)
+    maximum = np.full(count_zones + 1, -np.inf)
+    for zone_ids, counts, totals, sums_of_squares, minimums, maximums in aggregates:
+        # Zone ids are unique within the aggregates of one label raster
+        pixel_count[zone_ids] += counts
+        total[zone_ids] += totals
+        squares[zone_ids] += sums_of_squares
+        minimum[zone_ids] = np.minimum(minimum[zone_ids], minimums)
+        maximum[zone_ids] = np.maximum(maximum[zone_ids], maximums)
+    result = []
+    for zone in range(1, count_zones + 1):
+        count = int(pixel_count[zone])
+        if count == 0:
+            result.append(None)
+            continue
+        mean = total[zone] / count
+        result.append({
+            "ndvi": float(mean),
+            "ndvi_min": float(minimum[zone]),
+            "ndvi_max": float(maximum[zone]),
+            "ndvi_std": float(np.sqrt(max(squares[zone] / count - mean * mean, 0))),
+            "pixel_count": count
+        })
+    return result
+
+
+def __group_statistics(
+    subfield_groups: list[list[Polygon]], statistics: list[dict[str, float | int] | None]
+) -> list[list[tuple[Polygon, dict[str, float | int]]]]:
+    # Statistics are ordered as the subfields of the flattened groups
+    statistics = iter(statistics)
+    result = []
+    for subfields in subfield_groups:
+        group = []
+        for subfield in subfields:
+            subfield_statistics = next(statistics)
+            if subfield_statistics is not None:
+                group.append((subfield, subfield_statistics))
+        result.append(group)
+    return result
+
+
+def __rasterize_zones(
+    subfields: list[Polygon], out_shape: tuple[int, int], zones_transform
+) -> np.ndarray:
+    # The subfields follow the pixel edges, so rasterizing them by pixel center
+    # assigns every classified pixel to exactly the subfield it was polygonized into
+    return features.rasterize(
+        ((subfield, zone) for zone, subfield in enumerate(subfields, start=1)),
+        out_shape=out_shape,
+        transform=zones_transform,
+        fill=0,
+        all_touched=False,
+        dtype=np.int32
+    )
+
+
+def __compute_statistics(
+    raster_data: np.ndarray, raster_transform, subfield_groups: list[list[Polygon]]
+) -> list[list[tuple[Polygon, dict[str, float | int]]]]:
+    subfields = [subfield for subfields in subfield_groups for subfield in subfields]
+    if len(subfields) == 0:
+        return [[] for _ in subfield_groups]
+    zones = __rasterize_zones(subfields, raster_data.shape, raster_transform)
+    aggregates = __zonal_aggregates(raster_data, zones, len(subfields))
+    return __group_statistics(subfield_groups, __zonal_statistics([aggregates], len(subfields)))
+
+
 def __pixel_based_nochunk_split(
-    raster_file: DatasetReader, coordinates: list[list[list[float]]]
-) -> list[list[Polygon]]:
-    n = 3
-    result = [[] for _ in range(n)]
-    raster_transform = __transform(raster_file)
-    raster_mask = mask.geometry_mask(
-        geometries=[__polygon(coordinates)],
-        out_shape=(raster_file.height, raster_file.width),
-        transform=raster_transform
+    raster_file: DatasetReader, raster_transform, field: Polygon, window: windows.Window,
+    classes: int, classification: str, breaks: list[float] | None, sieve_size: int
+) -> list[list[tuple[Polygon, dict[str, float | int]]]]:
+    window_transform = windows.transform(window, raster_transform)
+    raster_data = raster_file.read(1, window=window)
+    # Pixels outside the field, without data or with negative NDVI are not classified
+    valid = ~np.isnan(raster_data) & (raster_data >= 0)
+    if not is_field_masked(raster_file):
+        valid &= ~mask.geometry_mask(
+            geometries=[field],
+            out_shape=raster_data.shape,
+            transform=window_transform
+        )
+    labels, classes = __classify(raster_data, valid, classes, classification, breaks)
+    labels = __sieve(labels, valid, sieve_size)
+    subfield_groups = __polygonize(labels, valid, window_transform, classes)
+    return __compute_statistics(raster_data, window_transform, subfield_groups)
+
+
+def __chunk_valid(
+    chunk_data: np.ndarray, row_off: int, col_off: int, pixel_field: Polygon | None
+) -> np.ndarray:
+    # The field mask of an ingested derivative is part of its nodata already
+    valid = ~np.isnan(chunk_data) & (chunk_data >= 0)
+    if pixel_field is not None:
+        valid &= ~mask.geometry_mask(
+            geometries=[pixel_field],
+            out_shape=chunk_data.shape,
+            transform=Affine.translation(col_off, row_off)
+        )
+    return valid
+
+
+def __chunk_range(
+    chunk_data: np.ndarray, row_off: int, col_off: int, pixel_field: Polygon | None
+) -> tuple[float, float] | None:
+    values = chunk_data[__chunk_valid(chunk_data, row_off, col_off, pixel_field)]
+    if values.size == 0:
+        return None
+    return float(values.min()), float(values.max())
+
+
+def __chunk_histogram(
+    chunk_data: np.ndarray, row_off: int, col_off: int, pixel_field: Polygon | None,
+    value_range: tuple[float, float]
+) -> np.ndarray:
+    values = chunk_data[__chunk_valid(chunk_data, row_off, col_off, pixel_field)]
+    return np.histogram(values, bins=__histogram_bins, range=value_range)[0]
+
+
+def __chunk_shapes(
+    halo_data: np.ndarray, halo_row_off: int, halo_col_off: int,
+    row_off: int, col_off: int, height: int, width: int,
+    pixel_field: Polygon | None, class_breaks: np.ndarray, sieve_size: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Zone polygons of the chunk in pixel coordinates with their class, and
+    whether they touch the chunk border. The chunk is classified and sieved
+    with a halo of neighbouring pixels, so that a zone of the chunk is only
+    sieved if it is small across chunk borders too
+    """
+    valid = __chunk_valid(halo_data, halo_row_off, halo_col_off, pixel_field)
+    labels = __sieve(__label(halo_data, valid, class_breaks), valid, sieve_size)
+    chunk = (
+        slice(row_off - halo_row_off, row_off - halo_row_off + height),
+        slice(col_off - halo_col_off, col_off - halo_col_off + width)
     )
-    raster_data = np.where(raster_mask, -1, raster_file.read(1))
-    ndvi_ranges = __ndvi_range(raster_data, n)
-    for row, ndvi_range in enumerate(ndvi_ranges):
-        raster_mask = np.logical_and(
-            ~np.isnan(raster_data),
-            (ndvi_range[0] < raster_data)
-            & (raster_data <= ndvi_range[1])
+    polygons, polygon_labels = __shapes(
+        labels[chunk], valid[chunk], Affine.translation(col_off, row_off)
+    )
+    interior = box(col_off + 0.5, row_off + 0.5, col_off + width - 0.5, row_off + height - 0.5)
+    return polygons, polygon_labels, ~shapely.contains_properly(interior, polygons)
+
+
+def __chunk_aggregates(
+    chunk_data: np.ndarray, row_off: int, col_off: int,
+    zone_tree: shapely.STRtree, subfields: np.ndarray
+) -> tuple[np.ndarray, ...]:
+    height, width = chunk_data.shape
+    candidates = zone_tree.query(box(col_off, row_off, col_off + width, row_off + height))
+    zones = np.zeros(chunk_data.shape, dtype=np.int32)
+    if candidates.size > 0:
+        zones = __rasterize_zones(
+            list(subfields[candidates]), chunk_data.shape, Affine.translation(col_off, row_off)
         )
-        shapes = features.shapes(raster_data, raster_mask,
-                                 connectivity=4, transform=raster_transform)
-        polygons = [__polygon(shape["coordinates"]) for shape, _ in shapes]
-        union = unary_union(polygons)
-        if union.geom_type == "Polygon":
-            result[row].append(union)
-        else:
-            for polygon in union.geoms:
-                result[row].append(polygon)
-    return result
+    zone_ids, *aggregates = __zonal_aggregates(chunk_data, zones, candidates.size)
+    # The chunk-local zone ids map back to the ids of all subfields
+    return candidates[zone_ids - 1] + 1, *aggregates
 
 
-def __compute_average_ndvi(
-    raster_file: DatasetReader, subfields: list[Polygon]
-) -> list[tuple[Polygon, float]]:
-    result = []
-    subfield_transform = ~__transform(raster_file)
-    for subfield in subfields:
-        minx, miny, maxx, maxy = subfield.bounds
-        col_start, row_start, col_end, row_end = raster_file.width, raster_file.height, 0, 0
-        for point in ([minx, miny], [minx, maxy], [maxx, miny], [maxx, maxy]):
-            x, y = subfield_transform * point
-            col_start = min(col_start, math.floor(x))
-            row_start = min(row_start, math.floor(y))
-            col_end = max(col_end, math.ceil(x))
-            row_end = max(row_end, math.ceil(y))
-        if (
-            col_start >= raster_file.width
-            or col_end <= 0
-            or row_start >= raster_file.height
-            or row_end <= 0
-        ):
-            continue
-        window = windows.Window(col_start, row_start, col_end, row_end)
-        windowed_raster = raster_file.read(1, window=window)
-        windowed_bounds = warp.transform_bounds(raster_file.crs, "epsg:4326",
-                                                *raster_file.window_bounds(window))
-        windowed_transform = transform.from_bounds(*windowed_bounds,
-                                                   width=window.width, height=window.height)
-        windowed_subfield = subfield.intersection(box(*windowed_bounds))
-        if (
-            not windowed_subfield.is_empty
-            and windowed_raster.shape[0] > 0
-            and windowed_raster.shape[1] > 0
-        ):
-            windowed_mask = mask.geometry_mask(
-                geometries=[windowed_subfield],
-                all_touched=True,
-                out_shape=windowed_raster.shape,
-                transform=windowed_transform
-            )
-            windowed_condition = np.where(
-                windowed_mask, -1, windowed_raster
-            ) >= 0
-            count = np.count_nonzero(windowed_condition)
-            total = np.sum(
-                np.where(windowed_condition, windowed_raster, 0)
+def __chunk_lengths(length: int, chunk_size: int, min_size: int) -> tuple[int, ...]:
+    # The last chunk is merged into its predecessor if smaller than the halo
+    lengths = [min(chunk_size, length - start) for start in range(0, length, chunk_size)]
+    if len(lengths) > 1 and lengths[-1] < min_size:
+        lengths[-2] += lengths.pop()
+    return tuple(lengths)
+
+
+def __histogram_quantiles(
+    histogram: np.ndarray, value_range: tuple[float, float], quantiles: np.ndarray
+) -> np.ndarray:
+    edges = np.linspace(*value_range, histogram.size + 1)
+    cumulative = np.concatenate([[0], np.cumsum(histogram)])
+    return np.interp(quantiles * cumulative[-1], cumulative, edges)
+
+
+def __pixel_based_chunk_split(
+    raster_file: DatasetReader, raster_transform, field: Polygon, window: windows.Window,
+    classes: int, classification: str, breaks: list[float] | None, sieve_size: int
+) -> list[list[tuple[Polygon, dict[str, float | int]]]]:
+    """
+    Splits the field window chunk by chunk through dask, holding about
+    `NDVI.split_workers` chunks of the raster in memory. Chunks are polygonized
+    in pixel coordinates, in which the borders shared by neighbouring chunks are
+    exact, and the zones crossing chunk borders are stitched by a union.
+    Quantile breaks are interpolated from a histogram of the NDVI
+    """
+    chunk_size = NDVI.split_chunk_size
+    # A zone smaller than the sieve size reaches at most that far into the neighbours
+    halo = sieve_size if sieve_size > 1 else 0
+    window_data = rioxarray.open_rasterio(
+        raster_file.name, chunks={"band": 1, "y": chunk_size, "x": chunk_size}
+    ).isel(
+        band=0,
+        y=slice(window.row_off, window.row_off + window.height),
+        x=slice(window.col_off, window.col_off + window.width)
+    ).data.rechunk((
+        __chunk_lengths(window.height, chunk_size, halo),
+        __chunk_lengths(window.width, chunk_size, halo)
+    ))
+    row_offsets = window.row_off + np.cumsum((0,) + window_data.chunks[0])[:-1]
+    col_offsets = window.col_off + np.cumsum((0,) + window_data.chunks[1])[:-1]
+    blocks = window_data.to_delayed()
+    chunks = [
+        (blocks[i, j], int(row_off), int(col_off))
+        for i, row_off in enumerate(row_offsets)
+        for j, col_off in enumerate(col_offsets)
+    ]
+    halo_blocks = dask.array.overlap.overlap(
+        window_data,
+        depth={axis: halo if len(window_data.chunks[axis]) > 1 else 0 for axis in (0, 1)},
+        boundary="none"
+    ).to_delayed()
+    halo_chunks = [
+        (
+            halo_blocks[i, j],
+            int(row_off) - (halo if i > 0 else 0), int(col_off) - (halo if j > 0 else 0),
+            int(row_off), int(col_off), height, width
+        )
+        for i, (row_off, height) in enumerate(zip(row_offsets, window_data.chunks[0]))
+        for j, (col_off, width) in enumerate(zip(col_offsets, window_data.chunks[1]))
+    ]
+    pixel_field = None if is_field_masked(raster_file) else __affine_transform(field, ~raster_transform)
+
+    def compute(f, *args) -> tuple:
+        # Every pass reads the chunks anew instead of keeping the window in memory
+        return dask.compute(
+            *[dask.delayed(f)(block, row_off, col_off, *args) for block, row_off, col_off in chunks],
+            scheduler="threads", num_workers=NDVI.split_workers
+        )
+
+    if breaks is not None:
+        class_breaks = np.sort(np.asarray(breaks, dtype=window_data.dtype))
+    elif classification not in CLASSIFICATIONS:
+        raise ValueError(f"Unknown classification '{classification}'")
+    else:
+        value_ranges = [
+            value_range for value_range in compute(__chunk_range, pixel_field)
+            if value_range is not None
+        ]
+        if len(value_ranges) == 0:
+            return [[] for _ in range(classes)]
+        value_range = (min(low for low, _ in value_ranges), max(high for _, high in value_ranges))
+        if classification == "equal_interval":
+            class_breaks = np.linspace(*value_range, classes + 1)[1:-1]
+        else:
+            histogram = np.sum(compute(__chunk_histogram, pixel_field, value_range), axis=0)
+            class_breaks = __histogram_quantiles(
+                histogram, value_range, np.linspace(0, 1, classes + 1)[1:-1]
             )
-            if count > 0:
-                average_ndvi = total / count
-                result.append((subfield, average_ndvi))
-    return result
+    classes = len(class_breaks) + 1
+    chunk_shapes = dask.compute(
+        *[dask.delayed(__chunk_shapes)(*halo_chunk, pixel_field, class_breaks, sieve_size)
+          for halo_chunk in halo_chunks],
+        scheduler="threads", num_workers=NDVI.split_workers
+    )
+    polygons = np.concatenate([chunk_polygons for chunk_polygons, _, _ in chunk_shapes])
+    polygon_labels = np.concatenate([chunk_labels for _, chunk_labels, _ in chunk_shapes])
+    on_border = np.concatenate([chunk_on_border for _, _, chunk_on_border in chunk_shapes])
+    # Zones inside a chunk are complete, only those on its border are merged with
+    # their neighbours. Their vertices along the border do not match, hence the
+    # overlay union instead of the coverage union
+    subfield_groups = __dissolve(polygons[~on_border], polygon_labels[~on_border], classes)
+    for subfields, border_subfields in zip(subfield_groups, __dissolve(
+        polygons[on_border], polygon_labels[on_border], classes, shapely.union_all
+    )):
+        subfields.extend(border_subfields)
+    subfields = np.asarray(
+        [subfield for subfields in subfield_groups for subfield in subfields], dtype=object
+    )
+    if subfields.size == 0:
+        return [[] for _ in subfield_groups]
+    aggregates = compute(__chunk_aggregates, shapely.STRtree(subfields), subfields)
+    statistics = __zonal_statistics(aggregates, subfields.size)
+    transformed_subfields = iter(__affine_transform(subfields, raster_transform))
+    subfield_groups = [
+        [next(transformed_subfields) for _ in subfields] for subfields in subfield_groups
+    ]
+    return __group_statistics(subfield_groups, statistics)
 
 
 def get_subfields_pixel_based_split(
-    tiff_file: str, coordinates: list[list[list[float]]]
-) -> list[list[tuple[Polygon, float]]] | None:
+    tiff_file: str, coordinates: list[list[list[float]]],
+    classes: int = 3, classification: str = "equal_interval", breaks: list[float] | None = None,
+    chunked: bool | None = None
+) -> list[list[tuple[Polygon, dict[str, float | int]]]] | None:
+    """
+    Splits the field into NDVI zones of `classes` classes, whose breaks are placed
+    by `classification` or given explicitly as the ascending inner `breaks`.
+    Every subfield comes with the mean (ndvi), minimum, maximum and standard
+    deviation of its NDVI as well as its pixel count.
+    Only the window of the field is read, chunk by chunk if `chunked` or, by
+    default, if the window exceeds `NDVI.split_max_pixels`.
+    Zones below the minimum mapping unit are merged into a neighbouring zone
+    """
     try:
-        with rasterio.open(os.path.join(NDVI.data_folder, tiff_file)) as raster_file:
-            subfield_groups = __pixel_based_nochunk_split(raster_file, coordinates)
-            result = []
-            for subfields in subfield_groups:
-                result.append(__compute_average_ndvi(raster_file, subfields))
-        return result
+        with rasterio.open(resolve_raster(tiff_file)) as raster_file:
+            raster_transform = __transform(raster_file)
+            field = __polygon(coordinates)
+            window = __field_window(raster_file, raster_transform, field)
+            if window is None:
+                return [[] for _ in range(len(breaks) + 1 if breaks is not None else classes)]
+            if chunked is None:
+                chunked = window.width * window.height > NDVI.split_max_pixels
+            split = __pixel_based_chunk_split if chunked else __pixel_based_nochunk_split
+            return split(
+                raster_file, raster_transform, field, window, classes, classification, breaks,
+                __sieve_size(raster_transform, field)
+            )
     except Exception as error:
         print("[Subfield Split]", error)
         return None
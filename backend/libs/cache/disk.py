@@ -0,0 +1,76 @@
+import os
+import uuid
+
+
+class DiskCache:
+    """
+    Cache of byte values in one file per key under `folder`, shared by every
+    process using the same folder. Beyond `max_bytes` in total, the entries
+    least recently used (by file modification time) are evicted
+    - Values are written to a temporary file and renamed, so that readers never
+      see a partial entry
+    - Keys must be valid file names, e.g. hexadecimal digests
+    """
+
+    def __init__(self, folder: str, max_bytes: int) -> None:
+        self.__folder = folder
+        self.__max_bytes = max_bytes
+        os.makedirs(folder, exist_ok=True)
+
+    def __path(self, key: str) -> str:
+        return os.path.join(self.__folder, f"{key}.bin")
+
+    def get(self, key: str) -> bytes | None:
+        path = self.__path(key)
+        try:
+            with open(path, "rb") as file:
+                value = file.read()
+            # Marks the entry as recently used
+            os.utime(path)
+            return value
+        except FileNotFoundError:
+            # Not cached, or evicted by another process meanwhile
+            return None
+
+    def put(self, key: str, value: bytes) -> None:
+        if len(value) > self.__max_bytes:
+            return
+        path = self.__path(key)
+        temporary_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(value)
+        os.replace(temporary_path, path)
+        self.__evict()
+
+    def __evict(self) -> None:
+        entries = []
+        for entry in os.scandir(self.__folder):
+            if not entry.name.endswith(".bin"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.__max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Concurrently evicted by another process
+                pass
+            total -= size
+
+
+if __name__ == "__main__":
+    import time
+    import tempfile
+    cache = DiskCache(tempfile.mkdtemp(prefix="disk-cache-"), max_bytes=8)
+    # Apart by more than the granularity of file modification times
+    for step in [lambda: cache.put("a", b"1234"), lambda: cache.put("b", b"5678"), lambda: cache.get("a")]:
+        step()
+        time.sleep(0.05)
+    cache.put("c", b"9")
+    print(cache.get("a"), cache.get("b"), cache.get("c"))
@@ -0,0 +1,63 @@
+from typing import Any, Callable, Hashable
+from threading import Lock
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread-safe cache evicting the least recently used entry beyond `capacity`.
+    Every invalidation advances the cache generation, so that a value computed
+    before a concurrent invalidation is not stored afterwards
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.__lock = Lock()
+        self.__capacity = capacity
+        self.__entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self.__generation = 0
+
+    def generation(self) -> int:
+        with self.__lock:
+            return self.__generation
+
+    def get(self, key: Hashable) -> Any | None:
+        with self.__lock:
+            if key not in self.__entries:
+                return None
+            self.__entries.move_to_end(key)
+            return self.__entries[key]
+
+    def put(self, key: Hashable, value: Any, generation: int | None = None) -> bool:
+        with self.__lock:
+            if generation is not None and generation != self.__generation:
+                return False
+            self.__entries[key] = value
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__capacity:
+                self.__entries.popitem(last=False)
+            return True
+
+    def invalidate(self, predicate: Callable[[Hashable], bool] | None = None) -> None:
+        """
+        Removes the entries whose key satisfies `predicate`, all entries if omitted
+        """
+        with self.__lock:
+            self.__generation += 1
+            for key in [key for key in self.__entries if predicate is None or predicate(key)]:
+                del self.__entries[key]
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return len(self.__entries)
+
+
+if __name__ == "__main__":
+    cache = LRUCache(capacity=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    print(cache.get("a"), cache.get("b"), cache.get("c"))
+    generation = cache.generation()
+    cache.invalidate(lambda key: key == "a")
+    print(cache.put("d", 4, generation), len(cache))
@@ -0,0 +1,76 @@
+import time
+from threading import Lock
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker of calls to a remote service.
+    - closed: calls pass, `failure_threshold` consecutive failures open the circuit
+    - open: calls fail fast with CircuitOpenError for `reset_timeout` seconds
+    - half-open: a single trial call passes, whose success closes the circuit
+      again and whose failure opens it for another `reset_timeout` seconds
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.__lock = Lock()
+        self.__failure_threshold = failure_threshold
+        self.__reset_timeout = reset_timeout
+        self.__failures = 0
+        self.__opened_time: float | None = None
+        self.__trial = False
+        self.rejected = 0
+
+    def state(self) -> str:
+        with self.__lock:
+            if self.__opened_time is None:
+                return "closed"
+            if self.__trial or time.monotonic() - self.__opened_time >= self.__reset_timeout:
+                return "half-open"
+            return "open"
+
+    def acquire(self) -> None:
+        """
+        Raises CircuitOpenError if the call must not be attempted
+        """
+        with self.__lock:
+            if self.__opened_time is None:
+                return
+            if not self.__trial and time.monotonic() - self.__opened_time >= self.__reset_timeout:
+                self.__trial = True
+                return
+            self.rejected += 1
+            raise CircuitOpenError(
+                "circuit open after %d consecutive failures" % self.__failures
+            )
+
+    def succeed(self) -> None:
+        with self.__lock:
+            self.__failures = 0
+            self.__opened_time = None
+            self.__trial = False
+
+    def fail(self) -> None:
+        with self.__lock:
+            self.__failures += 1
+            if self.__trial or self.__failures >= self.__failure_threshold:
+                self.__opened_time = time.monotonic()
+            self.__trial = False
+
+
+if __name__ == "__main__":
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.1)
+    for _ in range(2):
+        breaker.acquire()
+        breaker.fail()
+    try:
+        breaker.acquire()
+    except CircuitOpenError as error:
+        print(breaker.state(), error)
+    time.sleep(0.1)
+    breaker.acquire()
+    breaker.succeed()
+    print(breaker.state(), breaker.rejected)
@@ -0,0 +1,23 @@
+import hashlib
+import shapely
+from shapely.geometry import Polygon
+
+
+# Grid (in degrees) to which coordinates are snapped, so that round trips through the storage keep the hash
+__precision = 1e-9
+
+
+def geometry_hash(coordinates: list[list[list[float]]]) -> str:
+    """
+    Digest of the polygon whatever its ring orientation and starting vertex
+    """
+    polygon = shapely.normalize(shapely.set_precision(
+        Polygon(coordinates[0], coordinates[1:]), __precision
+    ))
+    return hashlib.sha256(shapely.to_wkb(polygon, byte_order=1)).hexdigest()
+
+
+if __name__ == "__main__":
+    square = [[[12.5, 48.8], [12.6, 48.8], [12.6, 48.9], [12.5, 48.9], [12.5, 48.8]]]
+    reversed_square = [[[12.6, 48.9], [12.6, 48.8], [12.5, 48.8], [12.5, 48.9], [12.6, 48.9]]]
+    print(geometry_hash(square) == geometry_hash(reversed_square), geometry_hash(square)[:16])
@@ -0,0 +1,132 @@
+import time
+import uuid
+from typing import Any, Callable, Hashable
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobQueue:
+    """
+    Runs submitted tasks on a bounded pool of worker threads.
+    - At most `max_pending` jobs are queued or running, further submissions are rejected
+    - A submission whose `key` matches an unfinished job joins that job instead
+    - Every change of a job is reported to `listener(owner, job)`
+    - Finished jobs stay pollable for `retention` seconds
+    """
+
+    def __init__(
+        self,
+        max_workers: int, max_pending: int, retention: float = 600,
+        listener: Callable[[Hashable, dict[str, Any]], None] | None = None
+    ) -> None:
+        self.__executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.__max_pending = max_pending
+        self.__retention = retention
+        self.__listener = listener
+        self.__lock = Lock()
+        self.__jobs: dict[str, dict[str, Any]] = {}
+        self.__owners: dict[str, Hashable] = {}
+        self.__active_keys: dict[Hashable, str] = {}
+
+    def submit(
+        self,
+        owner: Hashable, key: Hashable,
+        task: Callable[[Callable[[str], None]], Any],
+        details: dict[str, Any] | None = None
+    ) -> str | None:
+        """
+        Queues `task(progress)` and returns the job id, None if the queue is full.
+        The task reports its current step through `progress(step)`, and fails
+        the job by raising or returning False
+        """
+        with self.__lock:
+            self.__prune()
+            job_id = self.__active_keys.get(key)
+            if job_id is not None:
+                return job_id
+            pending = sum(1 for job in self.__jobs.values() if job["status"] in ["queued", "running"])
+            if pending >= self.__max_pending:
+                return None
+            job_id = uuid.uuid4().hex
+            self.__jobs[job_id] = {
+                **(details or {}),
+                "id": job_id,
+                "status": "queued",
+                "step": None,
+                "error": None,
+                "created_at": time.time(),
+                "finished_at": None,
+            }
+            self.__owners[job_id] = owner
+            self.__active_keys[key] = job_id
+        self.__notify(job_id)
+        self.__executor.submit(self.__run, job_id, key, task)
+        return job_id
+
+    def status(self, owner: Hashable, job_id: str) -> dict[str, Any] | None:
+        with self.__lock:
+            if job_id not in self.__jobs or self.__owners[job_id] != owner:
+                return None
+            return dict(self.__jobs[job_id])
+
+    def pending(self) -> int:
+        with self.__lock:
+            return sum(1 for job in self.__jobs.values() if job["status"] in ["queued", "running"])
+
+    def shutdown(self) -> None:
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+
+    def __run(self, job_id: str, key: Hashable, task: Callable[[Callable[[str], None]], Any]) -> None:
+        def progress(step: str) -> None:
+            self.__update(job_id, step=step)
+        self.__update(job_id, status="running")
+        try:
+            failed = task(progress) is False
+            error = "job did not complete" if failed else None
+        except Exception as exception:
+            print("[Job]", exception)
+            failed, error = True, str(exception)
+        with self.__lock:
+            self.__active_keys.pop(key, None)
+        self.__update(
+            job_id,
+            status="failed" if failed else "done", error=error, finished_at=time.time()
+        )
+
+    def __update(self, job_id: str, **changes) -> None:
+        with self.__lock:
+            self.__jobs[job_id].update(changes)
+        self.__notify(job_id)
+
+    def __notify(self, job_id: str) -> None:
+        if self.__listener is None:
+            return
+        with self.__lock:
+            owner, job = self.__owners[job_id], dict(self.__jobs[job_id])
+        try:
+            self.__listener(owner, job)
+        except Exception as error:
+            print("[Job]", error)
+
+    def __prune(self) -> None:
+        now = time.time()
+        for job_id in [
+            job_id for job_id, job in self.__jobs.items()
+            if job["finished_at"] is not None and now - job["finished_at"] > self.__retention
+        ]:
+            del self.__jobs[job_id]
+            del self.__owners[job_id]
+
+
+if __name__ == "__main__":
+    def task(progress):
+        for step in ["first", "second"]:
+            progress(step)
+            time.sleep(0.1)
+        return True
+    queue = JobQueue(max_workers=1, max_pending=2, listener=lambda owner, job: print(owner, job["status"], job["step"]))
+    job_id = queue.submit(1, "a", task)
+    print(queue.submit(1, "a", task) == job_id, queue.submit(1, "b", task) is not None, queue.submit(1, "c", task))
+    time.sleep(0.5)
+    print(queue.status(1, job_id)["status"], queue.status(2, job_id))
+    queue.shutdown()
@@ -0,0 +1,53 @@
+from typing import Any, Callable, Hashable
+from threading import Lock
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls sharing a key: the first caller runs the
+    function while the others wait for its result (or exception) instead of
+    running it again. Calls after its completion run the function anew
+    """
+
+    def __init__(self) -> None:
+        self.__lock = Lock()
+        self.__calls: dict[Hashable, Future] = {}
+
+    def run(self, key: Hashable, f: Callable[..., Any], *args) -> Any:
+        with self.__lock:
+            future = self.__calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.__calls[key] = future
+        if not leader:
+            return future.result()
+        try:
+            result = f(*args)
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.__lock:
+                del self.__calls[key]
+
+
+if __name__ == "__main__":
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    calls = 0
+
+    def fetch(key: str) -> str:
+        global calls
+        calls += 1
+        time.sleep(0.1)
+        return key.upper()
+
+    flight = SingleFlight()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: flight.run("a", fetch, "a"), range(8)))
+    print(results, calls)
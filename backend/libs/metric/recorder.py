@@ -0,0 +1,48 @@
+import math
+from threading import Lock
+from collections import deque
+
+
+class Recorder:
+    """
+    Thread-safe recorder of a measured quantity (e.g. durations in seconds).
+    Count, mean and max cover every recorded sample, percentiles only the
+    most recent `window` samples
+    """
+
+    def __init__(self, window: int = 1024) -> None:
+        self.__lock = Lock()
+        self.__samples = deque(maxlen=window)
+        self.__count = 0
+        self.__total = 0.0
+        self.__max = 0.0
+
+    def record(self, value: float) -> None:
+        with self.__lock:
+            self.__samples.append(value)
+            self.__count += 1
+            self.__total += value
+            self.__max = max(self.__max, value)
+
+    def summary(self) -> dict[str, float | int]:
+        with self.__lock:
+            samples = sorted(self.__samples)
+            count, total, maximum = self.__count, self.__total, self.__max
+        def percentile(p: float) -> float:
+            if len(samples) == 0:
+                return 0.0
+            return samples[min(len(samples) - 1, math.ceil(p * len(samples)) - 1)]
+        return {
+            "count": count,
+            "mean": total / count if count > 0 else 0.0,
+            "p50": percentile(0.5),
+            "p99": percentile(0.99),
+            "max": maximum,
+        }
+
+
+if __name__ == "__main__":
+    recorder = Recorder(window=100)
+    for i in range(1, 201):
+        recorder.record(i / 1000)
+    print(recorder.summary())
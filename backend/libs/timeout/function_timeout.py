@@ -1,21 +1,163 @@
-import multiprocessing
+import os
 import time
+import multiprocessing
+from threading import Condition, Lock
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+
+
+def _serve(conn: Connection) -> None:
+    # Worker loop: receives (f, args), answers (succeeded, result or error message)
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        f, args = task
+        try:
+            conn.send((True, f(*args)))
+        except Exception as error:
+            conn.send((False, repr(error)))
+
+
+class ProcessPool:
+    """
+    Long-lived pool of worker processes forked from a forkserver which has
+    imported the `preload` modules, so that tasks start without re-importing them.
+    - A task is sent to an idle worker over a pipe and its result read back from it
+    - The deadline of a task covers the wait for an idle worker and its execution
+    - A worker exceeding the deadline is killed and replaced by a fresh one
+    """
+
+    def __init__(self, size: int, preload: list[str] | None = None) -> None:
+        self.__context = multiprocessing.get_context("forkserver")
+        self.__context.set_forkserver_preload(preload or [])
+        self.__size = size
+        self.__condition = Condition()
+        self.__closed = False
+        self.__idle: list[tuple[BaseProcess, Connection]] = []
+        self.__busy = 0
+        self.__waiting = 0
+        for _ in range(size):
+            self.__idle.append(self.__spawn())
+
+    def run(self, timeout: float, f, *args):
+        deadline = time.monotonic() + timeout
+        with self.__condition:
+            self.__waiting += 1
+            try:
+                while len(self.__idle) == 0:
+                    remaining = deadline - time.monotonic()
+                    if self.__closed or remaining <= 0:
+                        return None
+                    self.__condition.wait(remaining)
+            finally:
+                self.__waiting -= 1
+            process, conn = self.__idle.pop()
+            self.__busy += 1
+        result, healthy = None, False
+        try:
+            conn.send((f, args))
+            if conn.poll(max(0, deadline - time.monotonic())):
+                succeeded, result = conn.recv()
+                healthy = True
+                if not succeeded:
+                    print("[Timeout]", result)
+                    result = None
+        except Exception as error:
+            print("[Timeout]", error)
+        if not healthy:
+            # The worker is hung or dead, a fresh one takes its place
+            self.__kill(process, conn)
+            process, conn = self.__spawn()
+        with self.__condition:
+            self.__busy -= 1
+            if self.__closed:
+                self.__kill(process, conn)
+            else:
+                self.__idle.append((process, conn))
+            self.__condition.notify()
+        return result
+
+    def metrics(self) -> dict[str, int]:
+        with self.__condition:
+            return {
+                "size": self.__size,
+                "idle": len(self.__idle),
+                "busy": self.__busy,
+                "waiting": self.__waiting,
+            }
+
+    def close(self) -> None:
+        with self.__condition:
+            self.__closed = True
+            idle, self.__idle = self.__idle, []
+            self.__condition.notify_all()
+        for process, conn in idle:
+            try:
+                conn.send(None)
+            except Exception:
+                pass
+            self.__kill(process, conn, grace=1)
 
+    def __spawn(self) -> tuple[BaseProcess, Connection]:
+        parent_conn, child_conn = self.__context.Pipe()
+        process = self.__context.Process(target=_serve, args=(child_conn,), daemon=True)
+        process.start()
+        child_conn.close()
+        return process, parent_conn
 
-def __trigger_function(result, f, *args):
-    result["data"] = f(*args)
+    def __kill(self, process: BaseProcess, conn: Connection, grace: float = 0) -> None:
+        process.join(grace)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        conn.close()
+
+
+__pool: ProcessPool | None = None
+__pool_lock = Lock()
+
+
+def init(size: int | None = None, preload: list[str] | None = None) -> None:
+    global __pool
+    with __pool_lock:
+        if __pool is None:
+            __pool = ProcessPool(size or os.cpu_count() or 1, preload)
+
+
+def term() -> None:
+    global __pool
+    if __pool is not None:
+        __pool.close()
+        __pool = None
+
+
+def queue_depth() -> int:
+    """
+    Number of calls waiting for an idle worker
+    """
+    return __pool.metrics()["waiting"] if __pool is not None else 0
 
 
 def timeout_function(timeout, f, *args):
-    result = multiprocessing.Manager().dict()
-    process = multiprocessing.Process(target=__trigger_function,
-                                      args=(result, f, *args,))
-    start_time = time.time()
-    process.start()
-    while time.time() - start_time < timeout and process.is_alive():
-        time.sleep(0.2)
-    process.terminate()
-    if "data" in result:
-        return result["data"]
-    else:
-        return None
+    """
+    Runs `f(*args)` in a worker process, returns its result or None if it
+    raises or does not finish within `timeout` seconds
+    """
+    if __pool is None:
+        init()
+    return __pool.run(timeout, f, *args)
+
+
+if __name__ == "__main__":
+    init(size=2)
+    start_time = time.perf_counter()
+    print(timeout_function(1, pow, 2, 10), "in %.1f ms" % ((time.perf_counter() - start_time) * 1000))
+    start_time = time.perf_counter()
+    print(timeout_function(0.5, time.sleep, 5), "in %.1f ms" % ((time.perf_counter() - start_time) * 1000))
+    print(timeout_function(1, int, "x"))
+    print(timeout_function(1, pow, 3, 3), queue_depth())
+    term()
@@ -1,11 +1,30 @@
 import os
 from repos.store.storage import DbCursor
-from repos.store.dafs.season import select_ndvi_rasters
+from repos.store.dafs.season import select_ndvi_rasters, count_ndvi_raster_references
 from repos.store.dafs.measurement import select_sample_images
-from repos.ndvi.raster import unregister_parcel
+from libs.algo.ndvi_ingest import remove_ingested_raster
+from logics.parcel import release_parcel
 from config import NDVI, MEASUREMENT
 
 
+def remove_unreferenced_raster(ndvi_raster: str) -> None:
+    """
+    Removes the raster file unless a season still refers to it, as the seasons
+    sharing a parcel may share its rasters
+    """
+    references = None
+    db_cursor = DbCursor()
+    with db_cursor as cursor:
+        references = count_ndvi_raster_references(cursor, ndvi_raster)
+    if db_cursor.error is not None or references > 0:
+        return
+    try:
+        os.remove(os.path.join(NDVI.data_folder, ndvi_raster))
+        remove_ingested_raster(ndvi_raster)
+    except Exception as error:
+        print("[Season Callback]", error)
+
+
 def season_unregistration_callback(user_id: int, field_id: int, season_id: str | None = None):
     db_cursor = DbCursor()
     ndvi_rasters = None
@@ -20,9 +39,9 @@ def season_unregistration_callback(user_id: int, field_id: int, season_id: str |
         try:
             for ndvi_raster, parcel_id in ndvi_rasters:
                 if parcel_id is not None:
-                    unregister_parcel(parcel_id)
+                    release_parcel(parcel_id)
                 if ndvi_raster is not None:
-                    os.remove(os.path.join(NDVI.data_folder, ndvi_raster))
+                    remove_unreferenced_raster(ndvi_raster)
         except Exception as error:
             print("[Season Callback]", error)
     return task
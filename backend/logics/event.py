@@ -1,10 +1,17 @@
 from time import sleep
-from repos.notify.notifier import publish_event as publish
+from typing import Any
+from repos.notify.notifier import publish_event, bump_version
 from repos.notify.notifier import get_channel, ConnectionError
 from libs.jwt.token import verify_token
 from config import APP
 
 
+def publish(user_id: int, type: str, payload: Any) -> bool:
+    # Cached responses of the user are revalidated from now on
+    bump_version(user_id)
+    return publish_event(user_id, type, payload)
+
+
 def stream(auth_token: str):
     channel = None
     try:
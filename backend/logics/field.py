@@ -1,8 +1,10 @@
 from typing import Any
 from shapely.geometry import Polygon
 from repos.store.storage import DbCursor
-from repos.store.dafs.field import select_field, insert_field, delete_field, select_fields_ids
+from repos.store.dafs.field import select_field_json, insert_field, delete_field, select_fields_ids
 from logics.callback import season_unregistration_callback, measurement_unregistration_callback
+from logics.geometry import invalidate_subfields
+from logics.tile import invalidate_tiles
 
 
 def get_field_options(user_id: int) -> list[dict[str, Any]] | None:
@@ -13,11 +15,11 @@ def get_field_options(user_id: int) -> list[dict[str, Any]] | None:
     return field_ids if db_cursor.error is None else None
 
 
-def get_field(user_id: int, field_id: int) -> dict[str, Any] | None:
+def get_field(user_id: int, field_id: int, tolerance: float | None = None) -> str | None:
     field = None
     db_cursor = DbCursor()
     with db_cursor as cursor:
-        field = select_field(cursor, user_id, field_id)
+        field = select_field_json(cursor, user_id, field_id, tolerance)
     return field if db_cursor.error is None else None
 
 
@@ -26,12 +28,15 @@ def add_field(
 ) -> dict[str, Any] | None:
     shell = coordinates[0]
     holes = coordinates[1:]
-    region = Polygon(shell, holes).__str__()
+    region = Polygon(shell, holes)
     inserted_field = None
     db_cursor = DbCursor()
     with db_cursor as cursor:
         inserted_field = insert_field(cursor, user_id, name, region)
-    return inserted_field if db_cursor.error is None else None
+    if db_cursor.error is not None:
+        return None
+    invalidate_tiles(user_id)
+    return inserted_field
 
 
 def remove_field(user_id: int, field_id: int) -> bool:
@@ -41,6 +46,8 @@ def remove_field(user_id: int, field_id: int) -> bool:
         measurement_callback = measurement_unregistration_callback(user_id, field_id)
         delete_field(cursor, user_id, field_id)
     if db_cursor.error is None:
+        invalidate_subfields(user_id, field_id)
+        invalidate_tiles(user_id)
         season_callback()
         measurement_callback()
         return True
@@ -0,0 +1,48 @@
+from libs.cache.lru import LRUCache
+
+
+# Simplified subfield documents keyed by (user_id, field_id, season_id, tolerance)
+__subfields = LRUCache(capacity=256)
+# Map tiles are 256 pixels wide and span 360 / 2^zoom degrees of longitude
+__tile_size = 256
+__max_zoom = 24
+
+
+def simplification_tolerance(tolerance: float | None = None, zoom: int | None = None) -> float | None:
+    """
+    Simplification tolerance in degrees: the given `tolerance`, otherwise the
+    width of a map pixel at `zoom`, otherwise none
+    """
+    if tolerance is not None:
+        if tolerance <= 0:
+            raise ValueError("tolerance must be positive")
+        return tolerance
+    if zoom is not None:
+        if zoom < 0 or zoom > __max_zoom:
+            raise ValueError(f"zoom must be between 0 and {__max_zoom}")
+        return 360 / (__tile_size * 2 ** zoom)
+    return None
+
+
+def cached_subfields(user_id: int, field_id: int, season_id: str, tolerance: float) -> str | None:
+    return __subfields.get((user_id, field_id, season_id, tolerance))
+
+
+def cache_subfields(
+    user_id: int, field_id: int, season_id: str, tolerance: float,
+    subfields: str, generation: int
+) -> None:
+    __subfields.put((user_id, field_id, season_id, tolerance), subfields, generation)
+
+
+def subfields_generation() -> int:
+    return __subfields.generation()
+
+
+def invalidate_subfields(user_id: int, field_id: int, season_id: str | None = None) -> None:
+    """
+    Drops the simplified subfields of the season, or of all seasons of the field
+    """
+    __subfields.invalidate(
+        lambda key: key[:2] == (user_id, field_id) and (season_id is None or key[2] == season_id)
+    )
@@ -0,0 +1,72 @@
+from typing import Any, Callable
+from libs.job.job_queue import JobQueue
+from libs.timeout import function_timeout
+from logics.measurement import get_measurement_positions
+from logics.event import publish
+from repos.notify.notifier import publish_event
+from config import MEASUREMENT
+
+
+__queue: JobQueue | None = None
+
+
+def __publish_job(user_id: int, job: dict[str, Any]) -> None:
+    # Progress changes no stored data, so the user's data version is kept
+    publish_event(user_id, "measurement.job", job)
+
+
+def submit_measurement_positions(
+    user_id: int, field_id: int, season_id: str,
+    classes: int = 3, classification: str = "equal_interval", breaks: list[float] | None = None
+) -> str | None:
+    """
+    Queues the measurement-position determination of the season, returns the
+    job id or None if the queue is full
+    """
+    def task(progress: Callable[[str], None]) -> bool:
+        inserted_measurements, inserted_subfields = get_measurement_positions(
+            user_id, field_id, season_id, classes, classification, breaks, progress
+        )
+        if inserted_measurements is None:
+            return False
+        publish(
+            user_id, "measurement.create",
+            {"field_id": field_id,
+             "season_id": season_id,
+             "measurements": inserted_measurements,
+             "subfields": inserted_subfields}
+        )
+        return True
+    # Requests of the same season with other split options are queued on their own
+    key = (
+        "measurement.position", user_id, field_id, season_id,
+        classes, classification, tuple(breaks) if breaks is not None else None
+    )
+    return __queue.submit(
+        user_id, key, task,
+        {"type": "measurement.position", "field_id": field_id, "season_id": season_id}
+    )
+
+
+def get_job(user_id: int, job_id: str) -> dict[str, Any] | None:
+    return __queue.status(user_id, job_id)
+
+
+def init():
+    global __queue
+    if __queue is None:
+        # One split worker process per job worker, with the raster libraries loaded up front
+        function_timeout.init(MEASUREMENT.max_workers, preload=["libs.algo.split_cache"])
+        __queue = JobQueue(
+            max_workers=MEASUREMENT.max_workers,
+            max_pending=MEASUREMENT.max_pending,
+            listener=__publish_job
+        )
+
+
+def term():
+    global __queue
+    if __queue is not None:
+        __queue.shutdown()
+        __queue = None
+        function_timeout.term()
@@ -1,14 +1,17 @@
-from typing import Any
+from typing import Any, Callable
 import os
 import uuid
-from repos.store.storage import DbCursor
+from repos.store.storage import DbCursor, Cursor
 from repos.store.dafs.field import select_field
-from repos.store.dafs.season import select_season
-from repos.store.dafs.measurement import select_measurements, select_measurement, insert_measurement, update_measurement
-from repos.store.dafs.subfield import select_subfields, insert_subfield, update_subfield
+from repos.store.dafs.season import select_season, update_season
+from repos.store.dafs.measurement import select_measurements, select_measurement, insert_measurements, update_measurement, delete_other_split_measurements
+from repos.store.dafs.subfield import select_subfields, select_subfields_json, insert_subfields, update_subfield
 from repos.recommend.recommender import recommend_subfield_fertilizer
 from logics.season import get_ndvi_raster
-from libs.algo.subfield_split import get_subfields_pixel_based_split
+from logics.geometry import cached_subfields, cache_subfields, subfields_generation, invalidate_subfields
+from logics.tile import invalidate_tiles
+from libs.algo.split_cache import split_key, cached_split, get_cached_subfields_pixel_based_split
+from libs.algo.ndvi_ingest import ingest_ndvi_raster
 from libs.algo.measurement_position import find_measurement_position, get_measurement_position_ndvi
 from libs.timeout.function_timeout import timeout_function
 from config import MEASUREMENT
@@ -38,58 +41,156 @@ def get_measurements(
 
 
 def get_subfields(
-    user_id: int, field_id: int, season_id: str
-) -> list[dict[str, Any]] | None:
+    user_id: int, field_id: int, season_id: str, tolerance: float | None = None
+) -> str | None:
+    if tolerance is not None:
+        subfields = cached_subfields(user_id, field_id, season_id, tolerance)
+        if subfields is not None:
+            return subfields
+    generation = subfields_generation()
     subfields = None
     db_cursor = DbCursor()
     with db_cursor as cursor:
-        subfields = select_subfields(cursor, user_id, field_id, season_id)
-    return subfields if db_cursor.error is None else None
+        subfields = select_subfields_json(cursor, user_id, field_id, season_id, tolerance)
+    if db_cursor.error is not None:
+        return None
+    if tolerance is not None:
+        cache_subfields(user_id, field_id, season_id, tolerance, subfields, generation)
+    return subfields
+
+
+def __no_progress(_: str) -> None:
+    pass
+
+
+def __select_split_records(
+    cursor: Cursor, user_id: int, field_id: int, season_id: str, key: str
+) -> tuple[list, list] | tuple[None, None]:
+    """
+    Stored measurements and subfields of the season inserted by the split `key`
+    """
+    measurements = select_measurements(cursor, user_id, field_id, season_id, key)
+    if len(measurements) == 0:
+        return None, None
+    return measurements, select_subfields(cursor, user_id, field_id, season_id, key)
+
+
+def __select_split(
+    user_id: int, field_id: int, season_id: str, key: str
+) -> tuple[list, list] | tuple[None, None]:
+    """
+    Stored measurements and subfields of the split `key`, which becomes the
+    persisted split of the season
+    """
+    measurements, subfields = None, None
+    db_cursor = DbCursor()
+    with db_cursor as cursor:
+        season = select_season(cursor, user_id, field_id, season_id, lock=True)
+        if season is None:
+            return None, None
+        measurements, subfields = __select_split_records(cursor, user_id, field_id, season_id, key)
+        if measurements is not None and season["split_key"] != key:
+            update_season(cursor, user_id, field_id, season_id, {"split_key": key})
+    return (measurements, subfields) if db_cursor.error is None else (None, None)
 
 
 def get_measurement_positions(
-    user_id: int, field_id: int, season_id: str
+    user_id: int, field_id: int, season_id: str,
+    classes: int = 3, classification: str = "equal_interval", breaks: list[float] | None = None,
+    progress: Callable[[str], None] = __no_progress
 ) -> tuple[list, list] | tuple[None, None]:
+    progress("fetching_raster")
     ndvi_raster, _ = get_ndvi_raster(user_id, field_id, season_id)
     if ndvi_raster is None:
         return None, None
+    field = None
     db_cursor = DbCursor()
-    inserted_measurements, inserted_subfields = [], []
     with db_cursor as cursor:
         field = select_field(cursor, user_id, field_id)
-        if field is None:
-            return None, None
+    if db_cursor.error is not None or field is None:
+        return None, None
+    # Rasters downloaded before their ingest (or whose ingest failed) are ingested now
+    ingest_ndvi_raster(ndvi_raster, field["coordinates"])
+    key = split_key(ndvi_raster, field["coordinates"], classes, classification, breaks)
+    if key is None:
+        return None, None
+    # The same split as the persisted one returns the stored rows instead of inserting them again
+    existing_measurements, existing_subfields = __select_split(user_id, field_id, season_id, key)
+    if existing_measurements is not None:
+        return existing_measurements, existing_subfields
+    # No pooled connection is held during the split computation
+    progress("splitting")
+    subfield_groups = cached_split(key)
+    if subfield_groups is None:
         subfield_groups = timeout_function(
-            20, get_subfields_pixel_based_split, ndvi_raster, field["coordinates"]
+            20, get_cached_subfields_pixel_based_split, key, ndvi_raster, field["coordinates"],
+            classes, classification, breaks
+        )
+    if subfield_groups is None:
+        return None, None
+    subfield_groups = [
+        subfield_statistics for subfield_statistics in subfield_groups
+        if len(subfield_statistics) > 0
+    ]
+    progress("scoring")
+    measurement_data = []
+    for subfield_statistics in subfield_groups:
+        pixel_count = sum(statistics["pixel_count"] for _, statistics in subfield_statistics)
+        zone_ndvi = sum(
+            statistics["ndvi"] * statistics["pixel_count"] for _, statistics in subfield_statistics
+        ) / pixel_count
+        measurement_position = find_measurement_position(
+            [subfield for subfield, _ in subfield_statistics], ndvi_raster, zone_ndvi
         )
-        if subfield_groups is None:
+        measurement_ndvi = get_measurement_position_ndvi(
+            ndvi_raster, [measurement_position.x, measurement_position.y]
+        )
+        measurement_data.append({
+            "longitude": measurement_position.x,
+            "latitude": measurement_position.y,
+            "ndvi": measurement_ndvi
+        })
+    progress("persisting")
+    inserted_measurements, inserted_subfields, stale_sample_images = None, None, []
+    db_cursor = DbCursor()
+    with db_cursor as cursor:
+        # The split is only valid for the raster it was computed from. The season row
+        # is locked, so that of concurrent requests of the same split only the first
+        # one inserts it
+        season = select_season(cursor, user_id, field_id, season_id, lock=True)
+        if season is None or season["ndvi_raster"] != ndvi_raster:
             return None, None
-        for subfield_ndvis in subfield_groups:
-            if len(subfield_ndvis) == 0:
-                continue
-            measurement_position = find_measurement_position(subfield_ndvis[0])
-            measurement_ndvi = get_measurement_position_ndvi(
-                ndvi_raster, [measurement_position.x, measurement_position.y]
-            )
-            data = {
-                "longitude": measurement_position.x,
-                "latitude": measurement_position.y,
-                "ndvi": measurement_ndvi
-            }
-            inserted_measurement = insert_measurement(
-                cursor, user_id, field_id, season_id, data
-            )
-            if inserted_measurement is not None:
-                inserted_measurements.append(inserted_measurement)
-                for subfield, ndvi in subfield_ndvis:
-                    inserted_subfields.append(
-                        insert_subfield(
-                            cursor,
-                            user_id, field_id, season_id, inserted_measurement["id"],
-                            subfield.__str__(), ndvi
-                        )
-                    )
+        existing_measurements, existing_subfields = __select_split_records(
+            cursor, user_id, field_id, season_id, key
+        )
+        if existing_measurements is not None:
+            if season["split_key"] != key:
+                update_season(cursor, user_id, field_id, season_id, {"split_key": key})
+            return existing_measurements, existing_subfields
+        update_season(cursor, user_id, field_id, season_id, {"split_key": key})
+        # The new split replaces the previous one, so that the season never holds two
+        stale_sample_images = delete_other_split_measurements(
+            cursor, user_id, field_id, season_id, key
+        )
+        inserted_measurements = insert_measurements(
+            cursor, user_id, field_id, season_id, measurement_data, key
+        )
+        subfield_data = [
+            (inserted_measurement["id"], subfield, statistics)
+            for inserted_measurement, subfield_statistics in zip(inserted_measurements, subfield_groups)
+            for subfield, statistics in subfield_statistics
+        ]
+        inserted_subfields = insert_subfields(
+            cursor, user_id, field_id, season_id, subfield_data, key
+        )
     if db_cursor.error is None:
+        invalidate_subfields(user_id, field_id, season_id)
+        invalidate_tiles(user_id)
+        try:
+            for sample_image in stale_sample_images:
+                os.remove(os.path.join(MEASUREMENT.data_folder, sample_image))
+        except Exception as error:
+            print("[Measurement]", error)
         return inserted_measurements, inserted_subfields
     else:
         return None, None
@@ -130,6 +231,8 @@ def modify_measurement(
                 recommended_fertilizer = subfield["recommended_fertilizer_amount"]
                 recommended_fertilizer = recommended_fertilizer if recommended_fertilizer is not None else 0
     if db_cursor.error is None:
+        invalidate_subfields(user_id, field_id, season_id)
+        invalidate_tiles(user_id)
         return updated_measurement, subfield_recommended_fertilizer
     else:
         return None, None
@@ -157,18 +260,29 @@ def upload_measurement_sample(user_id: int, measurement_id: int) -> dict[str, An
 def modify_measurement_position(
     user_id: int, measurement_id: int, lonlat: tuple[float, float]
 ) -> dict[str, Any] | None:
-    updated_measurement = None
+    measurement = None
     db_cursor = DbCursor()
     with db_cursor as cursor:
         measurement = select_measurement(cursor, user_id, measurement_id)
-        field_id, season_id = measurement["field_id"], measurement["season_id"]
-        ndvi_raster, _ = get_ndvi_raster(user_id, field_id, season_id)
-        if ndvi_raster is None:
-            return None
-        lon, lat = lonlat
-        ndvi = get_measurement_position_ndvi(ndvi_raster, lonlat)
-        data = {"longitude": lon, "latitude": lat, "ndvi": ndvi}
+    if db_cursor.error is not None or measurement is None:
+        return None
+    field_id, season_id = measurement["field_id"], measurement["season_id"]
+    ndvi_raster, _ = get_ndvi_raster(user_id, field_id, season_id)
+    if ndvi_raster is None:
+        return None
+    lon, lat = lonlat
+    ndvi = get_measurement_position_ndvi(ndvi_raster, lonlat)
+    if ndvi is None:
+        # Positions without a valid pixel are rejected, so that no NaN NDVI is stored
+        return None
+    data = {"longitude": lon, "latitude": lat, "ndvi": ndvi}
+    updated_measurement = None
+    db_cursor = DbCursor()
+    with db_cursor as cursor:
         updated_measurement = update_measurement(
             cursor, user_id, measurement_id, data
         )
-    return updated_measurement if db_cursor.error is None else None
+    if db_cursor.error is not None:
+        return None
+    invalidate_tiles(user_id)
+    return updated_measurement
@@ -0,0 +1,60 @@
+from datetime import date, timedelta
+from repos.store.storage import DbCursor
+from repos.store.dafs.parcel import select_covering_parcel, insert_parcel, update_parcel_references, delete_parcel
+from repos.ndvi.raster import register_parcel, unregister_parcel, season_window
+from libs.hash.geometry import geometry_hash
+
+
+# Provider parcels span a calendar year with this margin, so that every season
+# of a field in that year shares the same parcel
+__margin = timedelta(days=7)
+
+
+def acquire_parcel(season_id: str, coordinates: list[list[list[float]]]) -> int | None:
+    """
+    Provider parcel of the field geometry covering the season window, shared
+    with the other seasons of the geometry. A parcel spanning the year of the
+    season is registered if none covers it. Every acquired parcel is to be
+    released by `release_parcel`
+    """
+    start, end = season_window(season_id)
+    field_hash = geometry_hash(coordinates)
+    parcel_id = None
+    db_cursor = DbCursor()
+    with db_cursor as cursor:
+        parcel_id = select_covering_parcel(cursor, field_hash, start, end)
+        if parcel_id is not None:
+            update_parcel_references(cursor, parcel_id, 1)
+    if db_cursor.error is not None:
+        return None
+    if parcel_id is not None:
+        return parcel_id
+    # No pooled connection is held while waiting for the NDVI provider
+    year = (start + (end - start) / 2).year
+    planting, harvest = date(year, 1, 1) - __margin, date(year, 12, 31) + __margin
+    parcel_id = register_parcel(coordinates, planting, harvest)
+    if parcel_id is None:
+        return None
+    db_cursor = DbCursor()
+    with db_cursor as cursor:
+        insert_parcel(cursor, parcel_id, field_hash, planting, harvest)
+    if db_cursor.error is not None:
+        unregister_parcel(parcel_id)
+        return None
+    return parcel_id
+
+
+def release_parcel(parcel_id: int) -> None:
+    """
+    Drops a reference to the parcel, which is unregistered from the provider
+    with its last one. Parcels registered before the registry are unregistered
+    right away
+    """
+    references = None
+    db_cursor = DbCursor()
+    with db_cursor as cursor:
+        references = update_parcel_references(cursor, parcel_id, -1)
+        if references is not None and references <= 0:
+            delete_parcel(cursor, parcel_id)
+    if db_cursor.error is None and (references is None or references <= 0):
+        unregister_parcel(parcel_id)
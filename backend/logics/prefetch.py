@@ -0,0 +1,91 @@
+import time
+import schedule
+from datetime import date, timedelta
+from threading import Thread, Event
+from libs.job.job_queue import JobQueue
+from repos.store.storage import DbCursor
+from repos.store.dafs.season import select_refreshable_seasons
+from logics.season import get_ndvi_raster, refresh_ndvi_raster
+from logics.event import publish
+from config import NDVI
+
+
+__queue: JobQueue | None = None
+__event = None
+__thread = None
+# Own scheduler, so that the refresh only runs on the thread of this module
+__scheduler = schedule.Scheduler()
+
+
+def submit_ndvi_prefetch(user_id: int, field_id: int, season_id: str) -> str | None:
+    """
+    Queues the parcel registration and raster download of the season, whose
+    fetch publishes `season.update` once the raster is stored. Returns the job
+    id or None if the queue is full
+    """
+    def task(_) -> bool:
+        ndvi_raster, _ = get_ndvi_raster(user_id, field_id, season_id)
+        return ndvi_raster is not None
+    if __queue is None:
+        return None
+    return __queue.submit(
+        user_id, ("ndvi.prefetch", user_id, field_id, season_id), task,
+        {"type": "ndvi.prefetch", "field_id": field_id, "season_id": season_id}
+    )
+
+
+def __submit_ndvi_refresh(user_id: int, field_id: int, season_id: str) -> str | None:
+    def task(_) -> bool:
+        updated_season = refresh_ndvi_raster(user_id, field_id, season_id)
+        if updated_season is not None:
+            publish(user_id, "season.update", updated_season)
+        return True
+    return __queue.submit(
+        user_id, ("ndvi.refresh", user_id, field_id, season_id), task,
+        {"type": "ndvi.refresh", "field_id": field_id, "season_id": season_id}
+    )
+
+
+def __refresh_rasters():
+    # Seasons dated up to `refresh_days` ago may still get imagery closer to their date
+    since = (date.today() - timedelta(days=NDVI.refresh_days)).isoformat()
+    seasons = None
+    db_cursor = DbCursor()
+    with db_cursor as cursor:
+        seasons = select_refreshable_seasons(cursor, since)
+    if db_cursor.error is not None:
+        return
+    for user_id, field_id, season_id in seasons:
+        if __submit_ndvi_refresh(user_id, field_id, season_id) is None:
+            print("[Prefetch] Queue full, refresh postponed")
+            break
+
+
+def __run_job():
+    __scheduler.every(NDVI.refresh_interval).hours.do(__refresh_rasters)
+    while __event.is_set():
+        __scheduler.run_pending()
+        time.sleep(4)
+
+
+def init():
+    global __queue, __event, __thread
+    if __queue is None:
+        __queue = JobQueue(max_workers=NDVI.prefetch_workers, max_pending=NDVI.prefetch_pending)
+    if __thread is None:
+        __event = Event()
+        __event.set()
+        __thread = Thread(target=__run_job)
+        __thread.start()
+
+
+def term():
+    global __queue, __event, __thread
+    if __thread is not None:
+        __event.clear()
+        __thread.join()
+        __thread = None
+        __scheduler.clear()
+    if __queue is not None:
+        __queue.shutdown()
+        __queue = None
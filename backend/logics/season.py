@@ -1,35 +1,159 @@
-from typing import Any
-import os
+from typing import Any, Callable
+import time
+import uuid
+from threading import Event, Thread
 from repos.store.storage import DbCursor
 from repos.store.dafs.field import select_field
+from repos.store.dafs.measurement import select_measurements
 from repos.store.dafs.season import select_season, list_season_ids, insert_season, update_season, delete_season, select_ndvi_rasters
 from repos.recommend.recommender import recommend_season_fertilizer
-from repos.ndvi.raster import register_parcel, download_raster
-from logics.callback import season_unregistration_callback, measurement_unregistration_callback
+from repos.ndvi.raster import download_raster, select_raster, fetch_raster
+from repos.notify.notifier import bump_version, acquire_lease, renew_lease, release_lease, lease_held
+from libs.algo.ndvi_ingest import ingest_ndvi_raster
+from libs.job.single_flight import SingleFlight
+from logics.callback import season_unregistration_callback, measurement_unregistration_callback, remove_unreferenced_raster
+from logics.parcel import acquire_parcel, release_parcel
+from logics.event import publish
+from logics.geometry import invalidate_subfields
+from logics.tile import invalidate_tiles
+from config import NDVI
+
+
+# Concurrent fetches of the raster of a season within this process share a single one
+__fetches = SingleFlight()
+# Interval at which a lease held by another worker process is polled for its release
+__lease_poll_interval = 0.5
+
+
+def __hold_lease(lease: str, token: str) -> Callable[[], None]:
+    """
+    Renews the acquired lease every third of `NDVI.lease_timeout` seconds, so
+    that it does not expire during fetches lasting longer. The returned
+    function stops renewing and releases the lease
+    """
+    stopped = Event()
+
+    def renew():
+        while not stopped.wait(NDVI.lease_timeout / 3):
+            if not renew_lease(lease, token, NDVI.lease_timeout):
+                return
+
+    thread = Thread(target=renew, daemon=True)
+    thread.start()
+
+    def release():
+        stopped.set()
+        thread.join()
+        release_lease(lease, token)
+    return release
 
 
 def get_ndvi_raster(user_id: int, field_id: int, season_id: str):
-    updated_season = None
+    season = None
     db_cursor = DbCursor()
     with db_cursor as cursor:
         season = select_season(cursor, user_id, field_id, season_id)
-        if season is None:
+    if db_cursor.error is not None or season is None:
+        return None, None
+    if season["ndvi_raster"] is not None:
+        return season["ndvi_raster"], season["ndvi_date"]
+    return __fetches.run(
+        (user_id, field_id, season_id), __lease_ndvi_raster, user_id, field_id, season_id
+    )
+
+
+def __lease_ndvi_raster(user_id: int, field_id: int, season_id: str):
+    """
+    Fetches the raster under a lease shared by all worker processes, renewed
+    while fetching. Callers not holding the lease wait on Redis, without a
+    pooled connection, until it is released or expires (`NDVI.lease_timeout`
+    seconds after its holder stopped renewing it), then read the stored
+    raster or take the lease over. They give up after twice
+    `NDVI.lease_timeout` seconds, the raster being published by a
+    `season.update` event once stored. Without Redis, the raster is fetched
+    right away
+    """
+    lease = f"ndvi:{user_id}:{field_id}:{season_id}"
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + 2 * NDVI.lease_timeout
+    while True:
+        acquired = acquire_lease(lease, token, NDVI.lease_timeout)
+        if acquired is None:
+            return __fetch_ndvi_raster(user_id, field_id, season_id)
+        if acquired:
+            release = __hold_lease(lease, token)
+            try:
+                return __fetch_ndvi_raster(user_id, field_id, season_id)
+            finally:
+                release()
+        while lease_held(lease) and time.monotonic() < deadline:
+            time.sleep(__lease_poll_interval)
+        if time.monotonic() >= deadline:
+            return None, None
+        season = None
+        db_cursor = DbCursor()
+        with db_cursor as cursor:
+            season = select_season(cursor, user_id, field_id, season_id)
+        if db_cursor.error is not None or season is None:
             return None, None
         if season["ndvi_raster"] is not None:
             return season["ndvi_raster"], season["ndvi_date"]
-        parcel_id = season["parcel_id"]
-        if parcel_id is None:
+
+
+def __fetch_ndvi_raster(user_id: int, field_id: int, season_id: str):
+    season, field = None, None
+    db_cursor = DbCursor()
+    with db_cursor as cursor:
+        season = select_season(cursor, user_id, field_id, season_id)
+        if season is not None and season["ndvi_raster"] is None:
             field = select_field(cursor, user_id, field_id)
-            if field is None:
-                return None, None
-            parcel_id = register_parcel(season_id, field["coordinates"])
+    if db_cursor.error is not None or season is None:
+        return None, None
+    if season["ndvi_raster"] is not None:
+        return season["ndvi_raster"], season["ndvi_date"]
+    # No pooled connection is held while waiting for the NDVI provider
+    if field is None:
+        return None, None
+    data = {}
+    parcel_id = season["parcel_id"]
+    if parcel_id is None:
+        parcel_id = acquire_parcel(season_id, field["coordinates"])
         if parcel_id is None:
             return None, None
-        ndvi_raster, ndvi_date = download_raster(season_id, parcel_id)
-        data = {"ndvi_raster": ndvi_raster, "ndvi_date": ndvi_date}
-        updated_season = update_season(cursor, user_id, field_id, season_id, data)
+        data["parcel_id"] = parcel_id
+    ndvi_raster, ndvi_date = download_raster(season_id, parcel_id)
+    if ndvi_raster is not None:
+        # Failing ingests are retried before the next split, meanwhile the
+        # downloaded raster is used as is
+        ingest_ndvi_raster(ndvi_raster, field["coordinates"])
+    data["ndvi_raster"], data["ndvi_date"] = ndvi_raster, ndvi_date
+    if ndvi_raster is None and "parcel_id" not in data:
+        return None, None
+    # Only persist the results if no concurrent writer has done it meanwhile
+    updated_season, current_season = None, None
+    db_cursor = DbCursor()
+    with db_cursor as cursor:
+        updated_season = update_season(
+            cursor, user_id, field_id, season_id, data,
+            expected={"parcel_id": season["parcel_id"], "ndvi_raster": None}
+        )
+        if updated_season is None:
+            current_season = select_season(cursor, user_id, field_id, season_id)
     if db_cursor.error is None and updated_season is not None:
+        if updated_season["ndvi_raster"] is not None:
+            # Also delivers the raster to the requests which gave up waiting for it
+            publish(user_id, "season.update", updated_season)
+        else:
+            bump_version(user_id)
         return updated_season["ndvi_raster"], updated_season["ndvi_date"]
+    if "parcel_id" in data:
+        release_parcel(parcel_id)
+    if ndvi_raster is not None and (
+        current_season is None or current_season["ndvi_raster"] != ndvi_raster
+    ):
+        remove_unreferenced_raster(ndvi_raster)
+    if db_cursor.error is None and current_season is not None:
+        return current_season["ndvi_raster"], current_season["ndvi_date"]
     else:
         return None, None
 
@@ -51,19 +175,81 @@ def get_season(user_id: int, field_id: int, season_id: str) -> dict[str, Any] |
 
 
 def add_season(user_id: int, field_id: int, season_id: str, data: dict[str, Any]) -> dict[str, Any] | None:
+    # The parcel is registered and its raster downloaded in the background (see logics.prefetch)
     inserted_season = None
     db_cursor = DbCursor()
     with db_cursor as cursor:
-        field = select_field(cursor, user_id, field_id)
-        if field is None:
-            return None
-        data["parcel_id"] = register_parcel(season_id, field["coordinates"])
         inserted_season = insert_season(
             cursor, user_id, field_id, season_id, data
         )
     return inserted_season if db_cursor.error is None else None
 
 
+def refresh_ndvi_raster(user_id: int, field_id: int, season_id: str) -> dict[str, Any] | None:
+    """
+    Replaces the raster of a season without measurements by the provider's
+    raster closest to the season date if it is a different one. Returns the
+    updated season, None if unchanged
+    """
+    lease = f"ndvi:{user_id}:{field_id}:{season_id}"
+    token = uuid.uuid4().hex
+    # Seasons whose raster is being fetched by another caller are left for the next refresh
+    acquired = acquire_lease(lease, token, NDVI.lease_timeout)
+    if acquired is False:
+        return None
+    release = __hold_lease(lease, token) if acquired else None
+    try:
+        return __refresh_ndvi_raster(user_id, field_id, season_id)
+    finally:
+        if release is not None:
+            release()
+
+
+def __refresh_ndvi_raster(user_id: int, field_id: int, season_id: str) -> dict[str, Any] | None:
+    season, field = None, None
+    db_cursor = DbCursor()
+    with db_cursor as cursor:
+        season = select_season(cursor, user_id, field_id, season_id)
+        field = select_field(cursor, user_id, field_id)
+    if (
+        db_cursor.error is not None or season is None or field is None or
+        season["parcel_id"] is None or season["ndvi_raster"] is None
+    ):
+        return None
+    previous_raster = season["ndvi_raster"]
+    ndvi_raster, ndvi_date = select_raster(season_id, season["parcel_id"])
+    if ndvi_raster is None or ndvi_raster == previous_raster:
+        return None
+    if not fetch_raster(season["parcel_id"], ndvi_raster):
+        return None
+    ingest_ndvi_raster(ndvi_raster, field["coordinates"])
+    # The season row is locked before checking for measurements, so that none
+    # is persisted for the previous raster meanwhile
+    updated_season = None
+    db_cursor = DbCursor()
+    with db_cursor as cursor:
+        season = select_season(cursor, user_id, field_id, season_id, lock=True)
+        if (
+            season is not None and season["ndvi_raster"] == previous_raster and
+            len(select_measurements(cursor, user_id, field_id, season_id)) == 0
+        ):
+            updated_season = update_season(
+                cursor, user_id, field_id, season_id,
+                {"ndvi_raster": ndvi_raster, "ndvi_date": ndvi_date},
+                expected={"ndvi_raster": previous_raster}
+            )
+    refreshed = db_cursor.error is None and updated_season is not None
+    if refreshed:
+        stale_raster = previous_raster
+    elif season is None or season["ndvi_raster"] != ndvi_raster:
+        stale_raster = ndvi_raster
+    else:
+        stale_raster = None
+    if stale_raster is not None:
+        remove_unreferenced_raster(stale_raster)
+    return updated_season if refreshed else None
+
+
 def modify_season(user_id: int, field_id: int, season_id: str, data: dict[str, Any]) -> dict[str, Any] | None:
     updated_season = None
     db_cursor = DbCursor()
@@ -81,6 +267,8 @@ def remove_season(user_id: int, field_id: int, season_id: str) -> bool:
         measurement_callback = measurement_unregistration_callback(user_id, field_id, season_id)
         delete_season(cursor, user_id, field_id, season_id)
     if db_cursor.error is None:
+        invalidate_subfields(user_id, field_id, season_id)
+        invalidate_tiles(user_id)
         season_callback()
         measurement_callback()
         return True
@@ -0,0 +1,32 @@
+import hashlib
+from repos.store.storage import DbCursor
+from repos.store.dafs.tile import select_tile
+from libs.cache.lru import LRUCache
+
+
+# Rendered tiles as (tile, etag) keyed by (user_id, layer, field_id, season_id, z, x, y)
+__tiles = LRUCache(capacity=2048)
+
+
+def get_tile(
+    user_id: int, layer: str, z: int, x: int, y: int,
+    field_id: int | None = None, season_id: str | None = None
+) -> tuple[bytes, str] | None:
+    key = (user_id, layer, field_id, season_id, z, x, y)
+    cached_tile = __tiles.get(key)
+    if cached_tile is not None:
+        return cached_tile
+    generation = __tiles.generation()
+    tile = None
+    db_cursor = DbCursor()
+    with db_cursor as cursor:
+        tile = select_tile(cursor, user_id, layer, z, x, y, field_id, season_id)
+    if db_cursor.error is not None:
+        return None
+    etag = hashlib.sha1(tile).hexdigest()
+    __tiles.put(key, (tile, etag), generation)
+    return tile, etag
+
+
+def invalidate_tiles(user_id: int) -> None:
+    __tiles.invalidate(lambda key: key[0] == user_id)
@@ -0,0 +1,105 @@
+import time
+from threading import Lock
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from libs.circuit.breaker import CircuitBreaker
+from libs.metric.recorder import Recorder
+
+
+# Responses telling that the provider is degraded, retried and counted as failures by the circuit breaker
+_degraded_statuses = (429, 500, 502, 503, 504)
+
+
+class NdviClient:
+    """
+    Thread-safe client of the NDVI provider API over a pooled keep-alive session.
+    - Every request is bounded by `connect_timeout` and by `read_timeout` between two reads
+    - Idempotent requests (GET, DELETE) are retried up to `retries` times with exponential
+      backoff on connection errors, timeouts and degraded responses (429, 5xx). Requests
+      which never reached the provider are retried whatever their method
+    - A circuit breaker fails fast while the provider is degraded
+    - Latency (including the retries), request and error counts are recorded per operation
+    """
+
+    def __init__(
+        self,
+        url: str, api_key: str,
+        connect_timeout: float, read_timeout: float,
+        retries: int, backoff_factor: float, pool_size: int,
+        failure_threshold: int, reset_timeout: float
+    ) -> None:
+        self.__url = url
+        self.__api_key = api_key
+        self.__timeout = (connect_timeout, read_timeout)
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=_degraded_statuses,
+            allowed_methods=frozenset(["GET", "DELETE"]),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.__session = requests.Session()
+        self.__session.mount("http://", adapter)
+        self.__session.mount("https://", adapter)
+        self.__breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.__lock = Lock()
+        self.__operations: dict[str, dict] = {}
+
+    def request(self, operation: str, method: str, path: str, **kwargs) -> requests.Response:
+        """
+        Sends `method` to `path` under the provider url, raises CircuitOpenError
+        while the circuit is open and requests.RequestException on failure
+        """
+        self.__breaker.acquire()
+        params = kwargs.pop("params", {})
+        start_time = time.perf_counter()
+        try:
+            response = self.__session.request(
+                method, f"{self.__url}{path}",
+                params={**params, "key": self.__api_key},
+                timeout=self.__timeout,
+                **kwargs
+            )
+        except Exception:
+            # Also releases the trial call of a half-open circuit
+            self.__breaker.fail()
+            self.__record(operation, time.perf_counter() - start_time, True)
+            raise
+        degraded = response.status_code in _degraded_statuses
+        if degraded:
+            self.__breaker.fail()
+        else:
+            self.__breaker.succeed()
+        self.__record(operation, time.perf_counter() - start_time, degraded)
+        return response
+
+    def __record(self, operation: str, elapsed: float, failed: bool) -> None:
+        with self.__lock:
+            if operation not in self.__operations:
+                self.__operations[operation] = {"requests": 0, "errors": 0, "latency": Recorder()}
+            metrics = self.__operations[operation]
+            metrics["requests"] += 1
+            metrics["errors"] += int(failed)
+        metrics["latency"].record(elapsed)
+
+    def metrics(self) -> dict[str, str | int | dict]:
+        with self.__lock:
+            operations = {
+                operation: {
+                    "requests": metrics["requests"],
+                    "errors": metrics["errors"],
+                    "latency": metrics["latency"].summary(),
+                }
+                for operation, metrics in self.__operations.items()
+            }
+        return {
+            "circuit": self.__breaker.state(),
+            "rejected": self.__breaker.rejected,
+            "operations": operations,
+        }
+
+    def close(self) -> None:
+        self.__session.close()
@@ -1,10 +1,21 @@
 import os
-from datetime import datetime, timedelta
+import time
+import uuid
+from datetime import date, datetime, timedelta
 import pytz
-import requests
+from repos.ndvi.client import NdviClient
+from libs.cache.lru import LRUCache
+from libs.algo.ndvi_ingest import write_cog
 from config import NDVI
 
 
+__client: NdviClient | None = None
+# Rasters further than this number of days from the season date are not selected
+__window_days = 7
+# Raster listings by parcel id, as (expiry time, rasters)
+__listings = LRUCache(capacity=4096)
+
+
 def __seasonid2date(season_id: str) -> datetime:
     year, month, day = season_id.split("-")
     timezone = pytz.timezone("Europe/Berlin")
@@ -13,61 +24,156 @@ def __seasonid2date(season_id: str) -> datetime:
     )
 
 
-def register_parcel(season_id: str, coordinates: list[list[list[float]]]) -> int | None:
-    season_date = __seasonid2date(season_id)
-    start_date = season_date - timedelta(days=7)
-    end_date = season_date + timedelta(days=7)
-    response = requests.post(
-        url=f"{NDVI.url}/parcels",
-        json={
-            "crop": "", 
-            "name": "", 
-            "planting": "%04d-%02d-%02d" % (start_date.year, start_date.month, start_date.day), 
-            "harvest": "%04d-%02d-%02d" % (end_date.year, end_date.month, end_date.day), 
-            "geometry": {"type": "Polygon", "coordinates": coordinates}
-        },
-        params={"key": NDVI.api_key},
-        headers={"Content-Type": "application/json"}
-    )
-    if response.status_code < 400:
-        response_body = response.json()
-        return response_body["content"]["parcel_id"]
+def season_window(season_id: str) -> tuple[date, date]:
+    """
+    Dates from which the rasters of the season are selected
+    """
+    season_date = __seasonid2date(season_id).date()
+    return season_date - timedelta(days=__window_days), season_date + timedelta(days=__window_days)
+
+
+def __request(operation: str, method: str, path: str, **kwargs):
+    if __client is None:
+        init()
+    return __client.request(operation, method, path, **kwargs)
+
+
+def register_parcel(
+    coordinates: list[list[list[float]]], planting: date, harvest: date
+) -> int | None:
+    """
+    Registers the parcel whose rasters from `planting` to `harvest` are listed
+    """
+    try:
+        response = __request(
+            "register_parcel", "POST", "/parcels",
+            json={
+                "crop": "", 
+                "name": "", 
+                "planting": planting.isoformat(), 
+                "harvest": harvest.isoformat(), 
+                "geometry": {"type": "Polygon", "coordinates": coordinates}
+            },
+            headers={"Content-Type": "application/json"}
+        )
+        if response.status_code < 400:
+            response_body = response.json()
+            return response_body["content"]["parcel_id"]
+    except Exception as error:
+        print("[NDVI]", error)
     return None
 
 
 def unregister_parcel(parcel_id: int) -> None:
-    requests.delete(
-        url=f"{NDVI.url}/parcels/{parcel_id}",
-        params={"key": NDVI.api_key}
-    )
+    __listings.invalidate(lambda key: key == parcel_id)
+    try:
+        __request("unregister_parcel", "DELETE", f"/parcels/{parcel_id}")
+    except Exception as error:
+        print("[NDVI]", error)
 
 
-def download_raster(season_id: str, parcel_id: int) -> tuple[str, datetime] | tuple[None, None]:
-    response = requests.get(
-        url=f"{NDVI.url}/parcels/{parcel_id}/ndvi",
-        params={"key": NDVI.api_key}
-    )
+def __list_rasters(parcel_id: int) -> list[dict] | None:
+    # Listings are shared by the seasons of the parcel for `NDVI.listing_ttl` seconds
+    listing = __listings.get(parcel_id)
+    if listing is not None and time.monotonic() < listing[0]:
+        return listing[1]
+    generation = __listings.generation()
+    response = __request("list_rasters", "GET", f"/parcels/{parcel_id}/ndvi")
     if response.status_code >= 400:
+        return None
+    rasters = response.json()["content"]
+    __listings.put(parcel_id, (time.monotonic() + NDVI.listing_ttl, rasters), generation)
+    return rasters
+
+
+def select_raster(season_id: str, parcel_id: int) -> tuple[str, datetime] | tuple[None, None]:
+    """
+    Name and date of the provider's raster of the parcel closest to the season
+    date, within the season window
+    """
+    try:
+        rasters = __list_rasters(parcel_id)
+        if rasters is None:
+            return None, None
+        season_date = __seasonid2date(season_id)
+        ndvi_raster, ndvi_date = None, None
+        for raster in rasters:
+            raster_date = __seasonid2date(raster["date"])
+            if abs((season_date - raster_date).days) > __window_days:
+                # The parcel may be shared by seasons of the whole year
+                continue
+            if (
+                ndvi_date is None or 
+                abs((season_date - raster_date).days) < abs((season_date - ndvi_date).days)
+            ):
+                ndvi_date = raster_date
+                ndvi_raster =  "%d.tif" % raster["raster_id"]
+        return ndvi_raster, ndvi_date
+    except Exception as error:
+        print("[NDVI]", error)
         return None, None
-    season_date = __seasonid2date(season_id)
-    response_body = response.json()
-    ndvi_raster, ndvi_date = None, None
-    for raster in response_body["content"]:
-        raster_date = __seasonid2date(raster["date"])
-        if (
-            ndvi_date is None or 
-            abs((season_date - raster_date).days) < abs((season_date - ndvi_date).days)
-        ):
-            ndvi_date = raster_date
-            ndvi_raster =  "%d.tif" % raster["raster_id"]
-    response = requests.get(
-        url=f"{NDVI.url}/parcels/{parcel_id}/ndvi/sentinel2/{ndvi_raster}",
-        params={"key": NDVI.api_key},
-        stream=True
-    )
-    if response.status_code >= 400:
+
+
+def fetch_raster(parcel_id: int, ndvi_raster: str) -> bool:
+    """
+    Downloads the raster `ndvi_raster` of the parcel into the NDVI data folder
+    """
+    temporary_path = os.path.join(NDVI.data_folder, f"{ndvi_raster}.{uuid.uuid4().hex}.tmp")
+    cog_path = f"{temporary_path}.cog"
+    try:
+        with __request(
+            "download_raster", "GET", f"/parcels/{parcel_id}/ndvi/sentinel2/{ndvi_raster}",
+            stream=True
+        ) as response:
+            if response.status_code >= 400:
+                return False
+            # Concurrent downloads of the same raster each write their own file, the
+            # last rename wins and readers never see a partial raster
+            with open(temporary_path, "wb") as file:
+                for chunk in response.iter_content(chunk_size=1 << 16):
+                    file.write(chunk)
+        # Stored as a COG, or as downloaded if it cannot be rewritten
+        if write_cog(temporary_path, cog_path):
+            os.replace(cog_path, temporary_path)
+        os.replace(temporary_path, os.path.join(NDVI.data_folder, ndvi_raster))
+        return True
+    except Exception as error:
+        print("[NDVI]", error)
+        for path in [temporary_path, cog_path]:
+            if os.path.exists(path):
+                os.remove(path)
+        return False
+
+
+def download_raster(season_id: str, parcel_id: int) -> tuple[str, datetime] | tuple[None, None]:
+    ndvi_raster, ndvi_date = select_raster(season_id, parcel_id)
+    if ndvi_raster is None or not fetch_raster(parcel_id, ndvi_raster):
         return None, None
-    with open(os.path.join(NDVI.data_folder, ndvi_raster), "wb") as file:
-        for chunk in response:
-            file.write(chunk)
-    return ndvi_raster, ndvi_date
\ No newline at end of file
+    return ndvi_raster, ndvi_date
+
+
+def get_metrics() -> dict[str, str | int | dict]:
+    return __client.metrics() if __client is not None else {}
+
+
+def init():
+    global __client
+    if __client is None:
+        __client = NdviClient(
+            url=NDVI.url,
+            api_key=NDVI.api_key,
+            connect_timeout=NDVI.connect_timeout,
+            read_timeout=NDVI.read_timeout,
+            retries=NDVI.retries,
+            backoff_factor=NDVI.backoff_factor,
+            pool_size=NDVI.pool_size,
+            failure_threshold=NDVI.failure_threshold,
+            reset_timeout=NDVI.reset_timeout
+        )
+
+
+def term():
+    global __client
+    if __client is not None:
+        __client.close()
+        __client = None
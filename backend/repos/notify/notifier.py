@@ -1,3 +1,5 @@
+import uuid
+from threading import Lock
 from datetime import datetime, date
 from json import dumps
 from redis import Redis
@@ -33,6 +35,124 @@ def publish_event(channel_id: int, type: str, payload) -> bool:
         return False
 
 
+# The version of the user's data is "<epoch>-<count>", the epoch being drawn when
+# the version key is created. A counter lost with its key (e.g. Redis restarted
+# without persistence) restarts under another epoch, so it never repeats a version
+__version_script = """
+redis.call("hsetnx", KEYS[1], "epoch", ARGV[1])
+local count = redis.call("hincrby", KEYS[1], "count", tonumber(ARGV[2]))
+return redis.call("hget", KEYS[1], "epoch") .. "-" .. count
+"""
+# Users whose data changed while their version could not be advanced. Their
+# version is advanced once Redis is reachable again, until then they are unversioned
+__unversioned: set[int] = set()
+__unversioned_lock = Lock()
+
+
+def __advance_version(user_id: int, increment: int) -> str:
+    version = __redis.eval(
+        __version_script, 1, f"data_version:{user_id}", uuid.uuid4().hex[:8], increment
+    )
+    return version.decode() if isinstance(version, bytes) else version
+
+
+def bump_version(user_id: int) -> str | None:
+    """
+    Advances the version of the user's data, returns None if unavailable, in
+    which case the user is unversioned until it can be advanced
+    """
+    try:
+        return __advance_version(user_id, 1)
+    except:
+        with __unversioned_lock:
+            __unversioned.add(user_id)
+        return None
+
+
+def __advance_unversioned() -> None:
+    with __unversioned_lock:
+        user_ids = list(__unversioned)
+    for user_id in user_ids:
+        try:
+            __advance_version(user_id, 1)
+        except:
+            return
+        with __unversioned_lock:
+            __unversioned.discard(user_id)
+
+
+def get_version(user_id: int) -> str | None:
+    """
+    Version of the user's data, None if unavailable or if the user is unversioned
+    """
+    __advance_unversioned()
+    with __unversioned_lock:
+        if user_id in __unversioned:
+            return None
+    try:
+        return __advance_version(user_id, 0)
+    except:
+        return None
+
+
+# Deletes the lease only if still held by the given token, so that an expired
+# lease taken over by another holder is not released
+__release_script = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+# Extends the lease only if still held by the given token
+__renew_script = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def acquire_lease(name: str, token: str, ttl: float) -> bool | None:
+    """
+    Takes the lease `name` for `ttl` seconds unless another token holds it,
+    returns None if unavailable
+    """
+    try:
+        return bool(__redis.set(f"lease:{name}", token, nx=True, px=int(ttl * 1000)))
+    except:
+        return None
+
+
+def renew_lease(name: str, token: str, ttl: float) -> bool:
+    """
+    Extends the lease `name` held by `token` to `ttl` seconds from now,
+    returns False if it is no longer held by `token` or unavailable
+    """
+    try:
+        return bool(__redis.eval(__renew_script, 1, f"lease:{name}", token, int(ttl * 1000)))
+    except:
+        return False
+
+
+def lease_held(name: str) -> bool | None:
+    """
+    Whether the lease `name` is held, None if unavailable
+    """
+    try:
+        return bool(__redis.exists(f"lease:{name}"))
+    except:
+        return None
+
+
+def release_lease(name: str, token: str) -> None:
+    try:
+        __redis.eval(__release_script, 1, f"lease:{name}", token)
+    except:
+        pass
+
+
 def init():
     global __redis
     if __redis is None:
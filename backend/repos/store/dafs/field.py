@@ -1,17 +1,18 @@
 from typing import Any
-from json import loads as json_parse
+from shapely.geometry import Polygon
 from repos.store.storage import Cursor
+from repos.store.geometry import geometry_column, geometry_value, geometry_param, geojson_coordinates, decode_coordinates
 
 
 def __parse_record(record: tuple) -> dict[str, Any] | None:
     if record is None:
         return None
-    id, user_id, name, geojson, straubing_distance, area = record
+    id, user_id, name, region, straubing_distance, area = record
     return {
         "id": id,
         "user_id": user_id,
         "name": name,
-        "coordinates": json_parse(geojson)["coordinates"],
+        "coordinates": decode_coordinates([region])[0],
         "straubing_distance": straubing_distance,
         "area": area
     }
@@ -19,27 +20,49 @@ def __parse_record(record: tuple) -> dict[str, Any] | None:
 
 def select_field(cursor: Cursor, user_id: int, field_id: int) -> dict[str, Any] | None:
     cursor.execute(
-        """
-        SELECT id, user_id, name, ST_AsGeoJSON(region), straubing_distance, area
+        f"""
+        SELECT id, user_id, name, {geometry_column("region")}, straubing_distance, area
         FROM field
         WHERE id = %s AND user_id = %s
         """, (field_id, user_id,))
     return __parse_record(cursor.fetchone())
 
 
-def insert_field(cursor: Cursor, user_id: int, name: str, region: str) -> dict[str, Any] | None:
+def select_field_json(
+    cursor: Cursor, user_id: int, field_id: int, tolerance: float | None = None
+) -> str | None:
+    # The response document is assembled by PostgreSQL and passed through as text
+    coordinates, params = geojson_coordinates("region", tolerance)
     cursor.execute(
-        """
+        f"""
+        SELECT json_build_object(
+            'id', id,
+            'user_id', user_id,
+            'name', name,
+            'coordinates', {coordinates},
+            'straubing_distance', straubing_distance,
+            'area', area
+        )::text
+        FROM field
+        WHERE id = %s AND user_id = %s
+        """, (*params, field_id, user_id,))
+    record = cursor.fetchone()
+    return record[0] if record is not None else None
+
+
+def insert_field(cursor: Cursor, user_id: int, name: str, region: Polygon | str) -> dict[str, Any] | None:
+    cursor.execute(
+        f"""
         INSERT INTO field(user_id, name, region)
-        VALUES (%s, %s, %s)
+        VALUES (%s, %s, {geometry_value()})
         RETURNING id
         """,
-        (user_id, name, region,)
+        (user_id, name, geometry_param(region),)
     )
     field_id = cursor.fetchone()[0]
     straubing_position = "POINT(12.5828575 48.8846284)"
     cursor.execute(
-        """
+        f"""
         UPDATE field
         SET straubing_distance = ST_Distance(
             (SELECT region FROM field WHERE id = %s),
@@ -47,7 +70,7 @@ def insert_field(cursor: Cursor, user_id: int, name: str, region: str) -> dict[s
         ) / 1000,
         area = ST_Area(region::geography) / 10000
         WHERE id = %s
-        RETURNING id, user_id, name, ST_AsGeoJSON(region), straubing_distance, area
+        RETURNING id, user_id, name, {geometry_column("region")}, straubing_distance, area
         """,
         (field_id, straubing_position, field_id,)
     )
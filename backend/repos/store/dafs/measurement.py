@@ -1,4 +1,5 @@
 from typing import Any
+from psycopg2.extras import execute_values
 from repos.store.storage import Cursor
 
 
@@ -17,14 +18,17 @@ def __parse_record(record: tuple) -> dict[str, Any] | None:
     }
 
 
+__data_cols = [
+    "longitude", "latitude",
+    "nitrate", "phosphor", "potassium",
+    "ndvi", "charge", "stadium", "soil_condition",
+    "sample_image"
+]
+
+
 def __extract_nonempty(data: dict[str, Any]) -> tuple[list[str], list[Any]]:
     cols, vals = [], []
-    for col in [
-        "longitude", "latitude",
-        "nitrate", "phosphor", "potassium",
-        "ndvi", "charge", "stadium", "soil_condition",
-        "sample_image"
-    ]:
+    for col in __data_cols:
         if col in data and data[col] is not None:
             cols.append(col)
             vals.append(data[col])
@@ -53,6 +57,41 @@ def insert_measurement(
     return inserted_measurement
 
 
+def insert_measurements(
+    cursor: Cursor,
+    user_id: int, field_id: int, season_id: str,
+    data: list[dict[str, Any]], split_key: str | None = None,
+) -> list[dict[str, Any]]:
+    """
+    `split_key` links the rows to the split they are placed by
+    """
+    cols = [
+        col for col in __data_cols
+        if any(col in d and d[col] is not None for d in data)
+    ]
+    if len(cols) == 0:
+        return []
+    insert_cols = ", ".join(cols)
+    records = [
+        (user_id, field_id, season_id, split_key, *[d.get(col) for col in cols])
+        for d in data
+    ]
+    inserted_records = execute_values(
+        cursor,
+        f"""
+        INSERT INTO measurement(user_id, field_id, season_id, split_key, {insert_cols})
+        VALUES %s
+        RETURNING *
+        """,
+        records, page_size=len(records), fetch=True
+    )
+    # The serial ids follow the order of the given rows, which RETURNING does not guarantee
+    return sorted(
+        [__parse_record(record) for record in inserted_records],
+        key=lambda measurement: measurement["id"]
+    )
+
+
 def update_measurement(
     cursor: Cursor,
     user_id: int, measurement_id: int,
@@ -80,11 +119,16 @@ def select_measurement(cursor: Cursor, user_id: int, measurement_id: int) -> dic
 
 def select_measurements(
     cursor: Cursor,
-    user_id: int, field_id: int, season_id: str
+    user_id: int, field_id: int, season_id: str, split_key: str | None = None
 ) -> list[dict[str, Any]] | None:
+    """
+    `split_key` only selects the measurements placed by that split
+    """
+    split_clause = " AND split_key = %s ORDER BY id" if split_key is not None else ""
+    split_param = (split_key,) if split_key is not None else ()
     cursor.execute(
-        "SELECT * FROM measurement WHERE user_id = %s AND field_id = %s AND season_id = %s",
-        (user_id, field_id, season_id,)
+        f"SELECT * FROM measurement WHERE user_id = %s AND field_id = %s AND season_id = %s{split_clause}",
+        (user_id, field_id, season_id, *split_param,)
     )
     return [__parse_record(record) for record in cursor.fetchall()]
 
@@ -104,3 +148,22 @@ def select_sample_images(
             (user_id, field_id,)
         )
     return [record[0] for record in cursor.fetchall()]
+
+
+def delete_other_split_measurements(
+    cursor: Cursor,
+    user_id: int, field_id: int, season_id: str, split_key: str
+) -> list[str]:
+    """
+    Deletes the measurements of the season not placed by the split `split_key`,
+    their subfields cascading, returns their sample images
+    """
+    cursor.execute(
+        """
+        DELETE FROM measurement
+        WHERE user_id = %s AND field_id = %s AND season_id = %s AND split_key IS DISTINCT FROM %s
+        RETURNING sample_image
+        """,
+        (user_id, field_id, season_id, split_key,)
+    )
+    return [record[0] for record in cursor.fetchall() if record[0] is not None]
@@ -0,0 +1,52 @@
+from datetime import date
+from repos.store.storage import Cursor
+
+
+def select_covering_parcel(
+    cursor: Cursor, geometry_hash: str, start: date, end: date
+) -> int | None:
+    """
+    Id of a parcel of the geometry whose window covers `start` to `end`,
+    locked until the end of the transaction
+    """
+    cursor.execute(
+        """
+        SELECT parcel_id FROM parcel
+        WHERE geometry_hash = %s AND planting <= %s AND harvest >= %s
+        ORDER BY harvest DESC
+        LIMIT 1
+        FOR UPDATE
+        """,
+        (geometry_hash, start, end,)
+    )
+    record = cursor.fetchone()
+    return record[0] if record is not None else None
+
+
+def insert_parcel(
+    cursor: Cursor, parcel_id: int, geometry_hash: str, planting: date, harvest: date
+) -> None:
+    cursor.execute(
+        """
+        INSERT INTO parcel(parcel_id, geometry_hash, planting, harvest, ref_count)
+        VALUES (%s, %s, %s, %s, 1)
+        """,
+        (parcel_id, geometry_hash, planting, harvest,)
+    )
+
+
+def update_parcel_references(cursor: Cursor, parcel_id: int, delta: int) -> int | None:
+    """
+    Adds `delta` to the reference count of the parcel, returns the new count
+    or None if the parcel is not registered
+    """
+    cursor.execute(
+        "UPDATE parcel SET ref_count = ref_count + %s WHERE parcel_id = %s RETURNING ref_count",
+        (delta, parcel_id,)
+    )
+    record = cursor.fetchone()
+    return record[0] if record is not None else None
+
+
+def delete_parcel(cursor: Cursor, parcel_id: int) -> None:
+    cursor.execute("DELETE FROM parcel WHERE parcel_id = %s", (parcel_id,))
@@ -21,6 +21,7 @@ def __parse_record(record: tuple) -> dict[str, Any] | None:
             "harvest_date", "harvest_weight",
             "falling_number", "moisture", "protein_content",
             "parcel_id", "ndvi_raster", "ndvi_date",
+            "split_key",
         ])
     }
 
@@ -36,6 +37,7 @@ def __extract_nonempty(data: dict[str, Any]) -> tuple[list[str], list[Any]]:
         "harvest_date", "harvest_weight",
         "falling_number", "moisture", "protein_content",
         "parcel_id", "ndvi_raster", "ndvi_date",
+        "split_key",
     ]:
         if col in data and data[col] is not None:
             cols.append(col)
@@ -54,20 +56,29 @@ def __extract_nonempty(data: dict[str, Any]) -> tuple[list[str], list[Any]]:
 def update_season(
     cursor: Cursor,
     user_id: int, field_id: int, season_id: str,
-    data: dict[str, Any]
+    data: dict[str, Any],
+    expected: dict[str, Any] | None = None
 ) -> dict[str, Any] | None:
+    """
+    `expected` optionally maps columns to the values they must still hold,
+    otherwise the season is left untouched and None is returned
+    """
     cols, vals = __extract_nonempty(data)
     updated_season = None
     if len(cols) > 0:
         update_cols = " = %s, ".join(cols) + " = %s"
+        expected = expected if expected is not None else {}
+        expected_cols = "".join(
+            f" AND {col} IS NOT DISTINCT FROM %s" for col in expected.keys()
+        )
         cursor.execute(
             f"""
             UPDATE season
             SET {update_cols}
-            WHERE user_id = %s AND field_id = %s AND season_id = %s
+            WHERE user_id = %s AND field_id = %s AND season_id = %s{expected_cols}
             RETURNING *
             """,
-            (*vals, user_id, field_id, season_id,)
+            (*vals, user_id, field_id, season_id, *expected.values(),)
         )
         updated_season = __parse_record(cursor.fetchone())
     return updated_season
@@ -109,14 +120,41 @@ def delete_season(cursor: Cursor, user_id: int, field_id: int, season_id: str) -
     )
 
 
-def select_season(cursor: Cursor, user_id: int, field_id: int, season_id: str) -> dict[str, Any] | None:
+def select_season(
+    cursor: Cursor, user_id: int, field_id: int, season_id: str, lock: bool = False
+) -> dict[str, Any] | None:
+    """
+    `lock` holds the season row until the end of the transaction
+    """
+    lock_clause = " FOR UPDATE" if lock else ""
     cursor.execute(
-        "SELECT * FROM season WHERE user_id = %s AND field_id = %s AND season_id = %s",
+        f"SELECT * FROM season WHERE user_id = %s AND field_id = %s AND season_id = %s{lock_clause}",
         (user_id, field_id, season_id,)
     )
     return __parse_record(cursor.fetchone())
 
 
+def select_refreshable_seasons(cursor: Cursor, since: str) -> list[tuple[int, int, str]]:
+    """
+    (user_id, field_id, season_id) of the seasons dated from `since` on whose
+    raster is downloaded and which have no measurements yet
+    """
+    cursor.execute(
+        """
+        SELECT user_id, field_id, season_id FROM season
+        WHERE season_id >= %s AND parcel_id IS NOT NULL AND ndvi_raster IS NOT NULL
+        AND NOT EXISTS (
+            SELECT 1 FROM measurement
+            WHERE measurement.field_id = season.field_id
+            AND measurement.season_id = season.season_id
+            AND measurement.user_id = season.user_id
+        )
+        """,
+        (since,)
+    )
+    return cursor.fetchall()
+
+
 def list_season_ids(cursor: Cursor, user_id: int, field_id: int) -> list[str]:
     cursor.execute(
         "SELECT season_id FROM season WHERE user_id = %s AND field_id = %s",
@@ -139,4 +177,12 @@ def select_ndvi_rasters(
             "SELECT ndvi_raster, parcel_id FROM season WHERE user_id = %s AND field_id = %s AND season_id = %s",
             (user_id, field_id, season_id,)
         )
-    return cursor.fetchall()
\ No newline at end of file
+    return cursor.fetchall()
+
+
+def count_ndvi_raster_references(cursor: Cursor, ndvi_raster: str) -> int:
+    cursor.execute(
+        "SELECT count(*) FROM season WHERE ndvi_raster = %s",
+        (ndvi_raster,)
+    )
+    return cursor.fetchone()[0]
@@ -1,22 +1,46 @@
 from typing import Any
-from json import loads as json_parse
+from shapely.geometry import Polygon
+from psycopg2.extras import execute_values
 from repos.store.storage import Cursor
+from repos.store.geometry import geometry_column, geometry_value, geometry_param, coverage_simplified, geojson_coordinates, decode_coordinates
+
+
+def __parse_records(records: list[tuple]) -> list[dict[str, Any]]:
+    # Geometries of the whole batch are decoded at once
+    coordinates = decode_coordinates([record[4] for record in records])
+    return [
+        {
+            "id": id,
+            "field_id": field_id,
+            "season_id": season_id,
+            "measurement_id": measurement_id,
+            "coordinates": subfield_coordinates,
+            "area": area,
+            "ndvi": ndvi,
+            "ndvi_min": ndvi_min,
+            "ndvi_max": ndvi_max,
+            "ndvi_std": ndvi_std,
+            "pixel_count": pixel_count,
+            "recommended_fertilizer_amount": recommended_fertilizer_amount
+        }
+        for (
+            id, field_id, season_id, measurement_id, _, area, ndvi, ndvi_min, ndvi_max, ndvi_std, pixel_count, recommended_fertilizer_amount
+        ), subfield_coordinates in zip(records, coordinates)
+    ]
 
 
 def __parse_record(record: tuple) -> dict[str, Any] | None:
     if record is None:
         return None
-    id, field_id, season_id, measurement_id, geojson, area, ndvi, recommended_fertilizer_amount = record
-    return {
-        "id": id,
-        "field_id": field_id,
-        "season_id": season_id,
-        "measurement_id": measurement_id,
-        "coordinates": json_parse(geojson)["coordinates"],
-        "area": area,
-        "ndvi": ndvi,
-        "recommended_fertilizer_amount": recommended_fertilizer_amount
-    }
+    return __parse_records([record])[0]
+
+
+# NDVI statistics of the subfield's pixels, only the mean (ndvi) is required
+__statistics = ["ndvi", "ndvi_min", "ndvi_max", "ndvi_std", "pixel_count"]
+
+
+def __extract_statistics(statistics: dict[str, Any]) -> list[Any]:
+    return [statistics.get(col) for col in __statistics]
 
 
 def __extract_nonempty(data: dict[str, Any]) -> tuple[list[str], list[Any]]:
@@ -45,39 +69,114 @@ def update_subfield(
 def insert_subfield(
     cursor: Cursor,
     user_id: int, field_id: int, season_id: str, measurement_id: int,
-    region: str, ndvi: float,
+    region: Polygon | str, statistics: dict[str, Any],
 ) -> dict[str, Any] | None:
     cursor.execute(
-        """
-        INSERT INTO subfield(user_id, field_id, season_id, measurement_id, region, ndvi)
-        VALUES (%s, %s, %s, %s, %s, %s)
+        f"""
+        INSERT INTO subfield(user_id, field_id, season_id, measurement_id, region, ndvi, ndvi_min, ndvi_max, ndvi_std, pixel_count)
+        VALUES (%s, %s, %s, %s, {geometry_value()}, %s, %s, %s, %s, %s)
         RETURNING id
         """,
-        (user_id, field_id, season_id, measurement_id, region, ndvi,)
+        (user_id, field_id, season_id, measurement_id, geometry_param(region), *__extract_statistics(statistics),)
     )
     subfield_id = cursor.fetchone()[0]
     cursor.execute(
-        """
+        f"""
         UPDATE subfield
         SET area = ST_Area(region::geography) / 10000
         WHERE id = %s
-        RETURNING id, field_id, season_id, measurement_id, ST_AsGeoJSON(region), area, ndvi, recommended_fertilizer_amount
+        RETURNING id, field_id, season_id, measurement_id, {geometry_column("region")}, area, ndvi, ndvi_min, ndvi_max, ndvi_std, pixel_count, recommended_fertilizer_amount
         """,
         (subfield_id, )
     )
     return __parse_record(cursor.fetchone())
 
 
+def insert_subfields(
+    cursor: Cursor,
+    user_id: int, field_id: int, season_id: str,
+    subfields: list[tuple[int, Polygon | str, dict[str, Any]]], split_key: str | None = None,
+) -> list[dict[str, Any]]:
+    """
+    `split_key` links the rows to the split they are computed by
+    """
+    if len(subfields) == 0:
+        return []
+    records = [
+        (user_id, field_id, season_id, measurement_id, geometry_param(region), *__extract_statistics(statistics), split_key)
+        for measurement_id, region, statistics in subfields
+    ]
+    inserted_records = execute_values(
+        cursor,
+        f"""
+        INSERT INTO subfield(user_id, field_id, season_id, measurement_id, region, area, ndvi, ndvi_min, ndvi_max, ndvi_std, pixel_count, split_key)
+        SELECT user_id, field_id, season_id, measurement_id, region, ST_Area(region::geography) / 10000, ndvi, ndvi_min, ndvi_max, ndvi_std, pixel_count, split_key
+        FROM (
+            SELECT user_id, field_id, season_id, measurement_id, {geometry_value("region")} AS region,
+                   ndvi::double precision, ndvi_min::double precision, ndvi_max::double precision,
+                   ndvi_std::double precision, pixel_count::integer, split_key::text
+            FROM (VALUES %s) AS v(user_id, field_id, season_id, measurement_id, region, ndvi, ndvi_min, ndvi_max, ndvi_std, pixel_count, split_key)
+        ) AS v
+        RETURNING id, field_id, season_id, measurement_id, {geometry_column("region")}, area, ndvi, ndvi_min, ndvi_max, ndvi_std, pixel_count, recommended_fertilizer_amount
+        """,
+        records, page_size=len(records), fetch=True
+    )
+    return __parse_records(inserted_records)
+
+
 def select_subfields(
     cursor: Cursor,
-    user_id: int, field_id: int, season_id: str
+    user_id: int, field_id: int, season_id: str, split_key: str | None = None
 ) -> list[dict[str, Any]] | None:
+    """
+    `split_key` only selects the subfields computed by that split
+    """
+    split_clause = " AND split_key = %s ORDER BY id" if split_key is not None else ""
+    split_param = (split_key,) if split_key is not None else ()
     cursor.execute(
-        """
-        SELECT id, field_id, season_id, measurement_id, ST_AsGeoJSON(region), area, ndvi, recommended_fertilizer_amount
+        f"""
+        SELECT id, field_id, season_id, measurement_id, {geometry_column("region")}, area, ndvi, ndvi_min, ndvi_max, ndvi_std, pixel_count, recommended_fertilizer_amount
         FROM subfield
-        WHERE user_id = %s AND field_id = %s AND season_id = %s
+        WHERE user_id = %s AND field_id = %s AND season_id = %s{split_clause}
+        """,
+        (user_id, field_id, season_id, *split_param,)
+    )
+    return __parse_records(cursor.fetchall())
+
+
+def select_subfields_json(
+    cursor: Cursor,
+    user_id: int, field_id: int, season_id: str,
+    tolerance: float | None = None
+) -> str:
+    # The response document is assembled by PostgreSQL and passed through as text.
+    # The subfields of the season are simplified together as one coverage
+    region, region_params = coverage_simplified("region", tolerance)
+    coordinates, params = geojson_coordinates("region", tolerance, simplified=True)
+    cursor.execute(
+        f"""
+        SELECT coalesce(json_agg(json_build_object(
+            'id', id,
+            'field_id', field_id,
+            'season_id', season_id,
+            'measurement_id', measurement_id,
+            'coordinates', {coordinates},
+            'area', area,
+            'ndvi', ndvi,
+            'ndvi_min', ndvi_min,
+            'ndvi_max', ndvi_max,
+            'ndvi_std', ndvi_std,
+            'pixel_count', pixel_count,
+            'recommended_fertilizer_amount', recommended_fertilizer_amount
+        )), '[]')::text
+        FROM (
+            SELECT
+                id, field_id, season_id, measurement_id, {region} AS region, area,
+                ndvi, ndvi_min, ndvi_max, ndvi_std, pixel_count, recommended_fertilizer_amount
+            FROM subfield
+            WHERE user_id = %s AND field_id = %s AND season_id = %s
+        ) AS subfield
         """,
-        (user_id, field_id, season_id,)
+        (*params, *region_params, user_id, field_id, season_id,)
     )
-    return [__parse_record(record) for record in cursor.fetchall()]
+    return cursor.fetchone()[0]
@@ -0,0 +1,64 @@
+from repos.store.storage import Cursor
+
+
+# Tile layer -> (table, geometry expression in EPSG:4326, attribute columns, has season)
+__layers = {
+    "field": (
+        "field", "region",
+        ["id", "name", "area", "straubing_distance"],
+        False
+    ),
+    "subfield": (
+        "subfield", "region",
+        ["id", "field_id", "season_id", "measurement_id", "area", "ndvi", "ndvi_min", "ndvi_max", "ndvi_std", "pixel_count", "recommended_fertilizer_amount"],
+        True
+    ),
+    "measurement": (
+        "measurement", "ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)",
+        ["id", "field_id", "season_id", "nitrate", "phosphor", "potassium", "ndvi", "charge", "stadium", "soil_condition"],
+        True
+    ),
+}
+# Tile coordinate space and the margin rendered around it, in tile units
+__extent = 4096
+__buffer = 256
+TILE_LAYERS = list(__layers.keys())
+
+
+def select_tile(
+    cursor: Cursor,
+    user_id: int, layer: str, z: int, x: int, y: int,
+    field_id: int | None = None, season_id: str | None = None
+) -> bytes:
+    table, geometry, cols, has_season = __layers[layer]
+    conditions, vals = ["user_id = %s"], [user_id]
+    if field_id is not None:
+        conditions.append("id = %s" if table == "field" else "field_id = %s")
+        vals.append(field_id)
+    if has_season and season_id is not None:
+        conditions.append("season_id = %s")
+        vals.append(season_id)
+    filter_conditions = " AND ".join(conditions)
+    attribute_cols = ", ".join(cols)
+    # The bounding box filter runs in EPSG:4326 to be served by the geometry index
+    cursor.execute(
+        f"""
+        WITH bounds AS (
+            SELECT ST_TileEnvelope(%s, %s, %s) AS tile,
+            ST_Transform(ST_TileEnvelope(%s, %s, %s, margin => %s), 4326) AS region
+        ), features AS (
+            SELECT ST_AsMVTGeom(ST_Transform({geometry}, 3857), bounds.tile, %s, %s) AS geom, {attribute_cols}
+            FROM {table}, bounds
+            WHERE {filter_conditions} AND {geometry} && bounds.region
+        )
+        SELECT ST_AsMVT(features, %s, %s, 'geom') FROM features WHERE geom IS NOT NULL
+        """,
+        (
+            z, x, y, z, x, y, __buffer / __extent,
+            __extent, __buffer,
+            *vals,
+            layer, __extent,
+        )
+    )
+    record = cursor.fetchone()
+    return bytes(record[0]) if record is not None and record[0] is not None else b""
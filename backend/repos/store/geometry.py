@@ -0,0 +1,96 @@
+import math
+from typing import Any
+from json import loads as json_parse
+import shapely
+from shapely.geometry.base import BaseGeometry
+from psycopg2 import Binary
+from config import STORAGE
+
+
+def __is_binary() -> bool:
+    # Geometries travel between PostGIS and the server either as text (GeoJSON
+    # on read, WKT on write) or as binary (WKB on read and write)
+    return STORAGE.geometry_transport == "binary"
+
+
+def geometry_column(column: str) -> str:
+    """
+    SQL expression selecting the geometry `column` in the configured transport
+    """
+    return f"ST_AsBinary({column})" if __is_binary() else f"ST_AsGeoJSON({column})"
+
+
+def geometry_value(expression: str = "%s") -> str:
+    """
+    SQL expression building a geometry from `expression`, by default the
+    placeholder of a parameter produced by `geometry_param`
+    """
+    return f"ST_GeomFromWKB({expression}, 4326)" if __is_binary() else f"ST_GeomFromText({expression}, 4326)"
+
+
+def geometry_param(geometry: BaseGeometry | str) -> Any:
+    """
+    Query parameter of a Shapely geometry or WKT string in the configured transport
+    """
+    if __is_binary():
+        if isinstance(geometry, str):
+            geometry = shapely.from_wkt(geometry)
+        return Binary(shapely.to_wkb(geometry))
+    return geometry if isinstance(geometry, str) else geometry.wkt
+
+
+def coverage_simplified(column: str, tolerance: float | None = None) -> tuple[str, tuple]:
+    """
+    SQL window expression (with its parameters) of `column` simplified as one
+    coverage over all selected rows, so that edges shared by adjacent polygons
+    are simplified once and no gap or overlap opens between them. Without a
+    `tolerance`, `column` as is
+    """
+    if tolerance is None:
+        return column, ()
+    return f"ST_CoverageSimplify({column}, %s) OVER ()", (tolerance,)
+
+
+def geojson_coordinates(
+    column: str, tolerance: float | None = None, simplified: bool = False
+) -> tuple[str, tuple]:
+    """
+    SQL expression (with its parameters) of the GeoJSON coordinates of `column`.
+    Given a `tolerance` in degrees, the geometry is simplified preserving its
+    topology, unless already `simplified`, and its coordinates are rounded a
+    decimal digit below the tolerance. Rounding is applied per coordinate, so
+    vertices shared by adjacent polygons stay shared
+    """
+    if tolerance is None:
+        return f"ST_AsGeoJSON({column})::json -> 'coordinates'", ()
+    digits = min(9, max(0, math.ceil(-math.log10(tolerance)) + 1))
+    if simplified:
+        return f"ST_AsGeoJSON({column}, %s)::json -> 'coordinates'", (digits,)
+    return (
+        f"ST_AsGeoJSON(ST_SimplifyPreserveTopology({column}, %s), %s)::json -> 'coordinates'",
+        (tolerance, digits,)
+    )
+
+
+def decode_coordinates(values: list[Any]) -> list[list[list[list[float]]]]:
+    """
+    Decodes a batch of selected polygon values into GeoJSON coordinates
+    """
+    if not __is_binary():
+        return [json_parse(value)["coordinates"] for value in values]
+    if len(values) == 0:
+        return []
+    geometries = shapely.from_wkb([bytes(value) for value in values])
+    # All polygons are flattened into one coordinate array, sliced back per ring
+    _, coords, (ring_offsets, polygon_offsets) = shapely.to_ragged_array(geometries)
+    coords, ring_offsets, polygon_offsets = (
+        coords.tolist(), ring_offsets.tolist(), polygon_offsets.tolist()
+    )
+    rings = [
+        coords[ring_offsets[i]:ring_offsets[i + 1]]
+        for i in range(len(ring_offsets) - 1)
+    ]
+    return [
+        rings[polygon_offsets[i]:polygon_offsets[i + 1]]
+        for i in range(len(polygon_offsets) - 1)
+    ]
@@ -0,0 +1,112 @@
+from psycopg2._psycopg import cursor as Cursor
+
+
+# Arbitrary key of the advisory lock serializing concurrent migration runs
+__lock_id = 2204
+# Ordered list of (version, description, commands). Never edit an applied
+# migration, always append a new version instead
+__migrations: list[tuple[int, str, list[str]]] = [
+    (
+        1,
+        "index geometry columns and dafs predicates",
+        [
+            "CREATE INDEX IF NOT EXISTS field_region_idx ON field USING GIST (region)",
+            "CREATE INDEX IF NOT EXISTS subfield_region_idx ON subfield USING GIST (region)",
+            # Serves the (user_id, field_id, season_id) lookups of the dafs as well as
+            # the cascading deletes from season (field_id, season_id) and field (field_id)
+            """
+            CREATE INDEX IF NOT EXISTS measurement_field_season_user_idx
+            ON measurement (field_id, season_id, user_id)
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS subfield_field_season_user_idx
+            ON subfield (field_id, season_id, user_id)
+            """,
+            # Serves the cascading delete from measurement
+            "CREATE INDEX IF NOT EXISTS subfield_measurement_idx ON subfield (measurement_id)",
+        ]
+    ),
+    (
+        2,
+        "store the zonal NDVI statistics of subfields",
+        [
+            """
+            ALTER TABLE subfield
+            ADD COLUMN IF NOT EXISTS ndvi_min double precision,
+            ADD COLUMN IF NOT EXISTS ndvi_max double precision,
+            ADD COLUMN IF NOT EXISTS ndvi_std double precision,
+            ADD COLUMN IF NOT EXISTS pixel_count integer
+            """,
+        ]
+    ),
+    (
+        3,
+        "store the content address of the persisted split of seasons",
+        [
+            "ALTER TABLE season ADD COLUMN IF NOT EXISTS split_key text",
+        ]
+    ),
+    (
+        4,
+        "register provider parcels by field geometry with reference counts",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS parcel (
+                parcel_id integer PRIMARY KEY,
+                geometry_hash text not null,
+                planting date not null,
+                harvest date not null,
+                ref_count integer not null,
+                created_at timestamp not null default now()
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS parcel_geometry_hash_idx ON parcel (geometry_hash)",
+            # Serves the lookups of the seasons sharing a raster file
+            "CREATE INDEX IF NOT EXISTS season_ndvi_raster_idx ON season (ndvi_raster)",
+        ]
+    ),
+    (
+        5,
+        "link measurements and subfields to the split they were inserted by",
+        [
+            "ALTER TABLE measurement ADD COLUMN IF NOT EXISTS split_key text",
+            "ALTER TABLE subfield ADD COLUMN IF NOT EXISTS split_key text",
+            # Serve the lookups of the stored rows of a split
+            "CREATE INDEX IF NOT EXISTS measurement_split_key_idx ON measurement (split_key)",
+            "CREATE INDEX IF NOT EXISTS subfield_split_key_idx ON subfield (split_key)",
+        ]
+    ),
+]
+
+
+def schema_version(cursor: Cursor) -> int:
+    cursor.execute("SELECT coalesce(max(version), 0) FROM schema_version")
+    return cursor.fetchone()[0]
+
+
+def migrate(cursor: Cursor) -> None:
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version integer PRIMARY KEY,
+            description text not null,
+            applied_at timestamp not null default now()
+        )
+        """
+    )
+    # Held until the surrounding transaction ends, so that only one server
+    # instance applies the pending migrations
+    cursor.execute("SELECT pg_advisory_xact_lock(%s)", (__lock_id,))
+    # Building indexes on large tables may exceed the per-checkout statement timeout
+    cursor.execute("SET LOCAL statement_timeout = 0")
+    current_version = schema_version(cursor)
+    for version, description, cmds in __migrations:
+        if version <= current_version:
+            continue
+        for cmd in cmds:
+            cursor.execute(cmd)
+        cursor.execute(
+            "INSERT INTO schema_version(version, description) VALUES (%s, %s)",
+            (version, description,)
+        )
+        print(f"[Storage] Schema migrated to version {version}: {description}")
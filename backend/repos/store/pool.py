@@ -0,0 +1,187 @@
+import time
+from collections import deque
+from threading import Condition
+from psycopg2 import connect, extensions
+from psycopg2.pool import PoolError
+from libs.metric.recorder import Recorder
+
+
+class PoolTimeout(PoolError):
+    pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of PostgreSQL connections.
+    - `getconn` waits in FIFO order for a free connection, at most `checkout_timeout` seconds
+    - Connections older than `max_lifetime` seconds are recycled
+    - Every checkout opens the transaction with `SET LOCAL statement_timeout`, which also
+      serves as pre-ping: a connection failing it is replaced by a fresh one
+    - Checkout wait time, hold duration and in-use count are recorded
+    """
+
+    def __init__(
+        self,
+        minconn: int, maxconn: int,
+        checkout_timeout: float, max_lifetime: float, statement_timeout: int,
+        **db_params
+    ) -> None:
+        self.__db_params = db_params
+        self.__maxconn = maxconn
+        self.__checkout_timeout = checkout_timeout
+        self.__max_lifetime = max_lifetime
+        self.__statement_timeout = statement_timeout
+        self.__condition = Condition()
+        self.__closed = False
+        # Idle connections as (connection, creation time), most recently returned last
+        self.__idle: deque = deque()
+        self.__waiters: deque = deque()
+        self.__in_use = 0
+        self.__checkout_times: dict[int, tuple[float, float]] = {}
+        self.wait_time = Recorder()
+        self.hold_time = Recorder()
+        for _ in range(minconn):
+            self.__idle.append((connect(**self.__db_params), time.monotonic()))
+
+    def getconn(self, statement_timeout: int | None = None) -> extensions.connection:
+        start_time = time.perf_counter()
+        deadline = start_time + self.__checkout_timeout
+        ticket = object()
+        with self.__condition:
+            self.__waiters.append(ticket)
+            try:
+                while True:
+                    if self.__closed:
+                        raise PoolError("connection pool is closed")
+                    if self.__waiters[0] is ticket and (
+                        len(self.__idle) > 0
+                        or len(self.__idle) + self.__in_use < self.__maxconn
+                    ):
+                        break
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        raise PoolTimeout(
+                            "no connection available within %.1f seconds" % self.__checkout_timeout
+                        )
+                    self.__condition.wait(remaining)
+            finally:
+                self.__waiters.remove(ticket)
+                self.__condition.notify_all()
+            entry = self.__idle.pop() if len(self.__idle) > 0 else None
+            self.__in_use += 1
+        try:
+            conn, created_time = self.__prepare(entry, statement_timeout)
+        except Exception:
+            with self.__condition:
+                self.__in_use -= 1
+                self.__condition.notify_all()
+            raise
+        checkout_time = time.perf_counter()
+        self.wait_time.record(checkout_time - start_time)
+        with self.__condition:
+            self.__checkout_times[id(conn)] = (checkout_time, created_time)
+        return conn
+
+    def putconn(self, conn: extensions.connection, close: bool = False) -> None:
+        with self.__condition:
+            checkout_time, created_time = self.__checkout_times.pop(
+                id(conn), (time.perf_counter(), 0)
+            )
+        self.hold_time.record(time.perf_counter() - checkout_time)
+        discard = close or conn.closed
+        if not discard:
+            status = conn.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                discard = True
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except Exception:
+                    discard = True
+        with self.__condition:
+            self.__in_use -= 1
+            if discard or self.__closed:
+                self.__close(conn)
+            else:
+                self.__idle.append((conn, created_time))
+            self.__condition.notify_all()
+
+    def prune(self) -> None:
+        """
+        Closes the idle connections exceeding their lifetime or failing a ping
+        """
+        with self.__condition:
+            entries = list(self.__idle)
+            self.__idle.clear()
+            self.__in_use += len(entries)
+        kept = []
+        for conn, created_time in entries:
+            if time.monotonic() - created_time > self.__max_lifetime or not self.__ping(conn):
+                self.__close(conn)
+            else:
+                kept.append((conn, created_time))
+        with self.__condition:
+            self.__in_use -= len(entries)
+            self.__idle.extendleft(reversed(kept))
+            self.__condition.notify_all()
+
+    def closeall(self) -> None:
+        with self.__condition:
+            self.__closed = True
+            for conn, _ in self.__idle:
+                self.__close(conn)
+            self.__idle.clear()
+            self.__condition.notify_all()
+
+    def metrics(self) -> dict[str, int | dict[str, float | int]]:
+        with self.__condition:
+            in_use, idle, waiting = self.__in_use, len(self.__idle), len(self.__waiters)
+        return {
+            "in_use": in_use,
+            "idle": idle,
+            "waiting": waiting,
+            "max": self.__maxconn,
+            "wait_time": self.wait_time.summary(),
+            "hold_time": self.hold_time.summary(),
+        }
+
+    def __prepare(
+        self, entry: tuple[extensions.connection, float] | None, statement_timeout: int | None
+    ) -> tuple[extensions.connection, float]:
+        statement_timeout = statement_timeout if statement_timeout is not None else self.__statement_timeout
+        if entry is not None:
+            conn, created_time = entry
+            if (
+                time.monotonic() - created_time <= self.__max_lifetime
+                and self.__begin(conn, statement_timeout)
+            ):
+                return conn, created_time
+            self.__close(conn)
+        conn = connect(**self.__db_params)
+        if not self.__begin(conn, statement_timeout):
+            self.__close(conn)
+            raise PoolError("new connection failed to start a transaction")
+        return conn, time.monotonic()
+
+    def __begin(self, conn: extensions.connection, statement_timeout: int) -> bool:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SET LOCAL statement_timeout = %s", (statement_timeout,))
+            return True
+        except Exception:
+            return False
+
+    def __ping(self, conn: extensions.connection) -> bool:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def __close(self, conn: extensions.connection) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
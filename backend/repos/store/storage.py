@@ -3,15 +3,20 @@
 # pg_ctl status -D <data-folder>
 import time
 import schedule
+from contextvars import ContextVar
 from threading import Thread, Event
-from psycopg2 import pool, sql, connect
+from psycopg2 import sql, connect
 from psycopg2._psycopg import cursor as Cursor
+from repos.store.migration import migrate
+from repos.store.pool import ConnectionPool
 from config import STORAGE, APP
 
 
 __event = None
 __thread = None
-_dbpool = None
+_dbpool: ConnectionPool | None = None
+# Connection of the outermost DbCursor open in the current context
+_active_connection: ContextVar = ContextVar("active_connection", default=None)
 
 
 def __init_connection():
@@ -27,8 +32,13 @@ def __init_connection():
                 "host": STORAGE.host,
                 "port": STORAGE.port,
             }
-            _dbpool = pool.ThreadedConnectionPool(
-                minconn=1, maxconn=64, **db_params
+            _dbpool = ConnectionPool(
+                minconn=STORAGE.minconn,
+                maxconn=STORAGE.maxconn,
+                checkout_timeout=STORAGE.checkout_timeout,
+                max_lifetime=STORAGE.max_lifetime,
+                statement_timeout=STORAGE.statement_timeout,
+                **db_params
             )
             __init_tables()
             break
@@ -65,13 +75,19 @@ def __check_connection():
     global _dbpool
     if _dbpool is None:
         __init_connection()
-    elif __get_connection() is None:
-        __init_connection()
+    else:
+        _dbpool.prune()
+
+
+def __report_metrics():
+    if _dbpool is not None:
+        print("[Storage] Connection pool:", get_metrics())
 
 
 def __run_job():
     __check_connection()
     schedule.every(30).minutes.do(__check_connection)
+    schedule.every(10).minutes.do(__report_metrics)
     while __event.is_set():
         schedule.run_pending()
         time.sleep(4)
@@ -214,6 +230,7 @@ def __init_tables() -> None:
             create_table_subfield_cmd,
         ]:
             cursor.execute(cmd)
+        migrate(cursor)
         if APP.is_testing:
             cursor.execute(
                 """
@@ -242,17 +259,38 @@ def term():
         __thread.join()
 
 
+def get_metrics() -> dict[str, int | dict[str, float | int]]:
+    return _dbpool.metrics() if _dbpool is not None else {}
+
+
 class DbCursor:
+    """
+    Checks out a pooled connection and commits its transaction on exit.
+    A DbCursor opened while another one is active in the same context (thread)
+    joins the outer transaction within a savepoint instead of checking out a
+    second connection, so that nested logic calls hold a single connection
+    """
+
     def __init__(self) -> None:
         self.error = None
         self.__conn = None
         self.__cursor = None
+        self.__savepoint = None
+        self.__context_token = None
 
     def __enter__(self) -> Cursor:
         global _dbpool
         try:
-            self.__conn = _dbpool.getconn()
-            self.__cursor = self.__conn.cursor()
+            outer_conn = _active_connection.get()
+            if outer_conn is not None:
+                self.__conn = outer_conn
+                self.__cursor = self.__conn.cursor()
+                self.__savepoint = "dbcursor_%d" % id(self)
+                self.__cursor.execute(f"SAVEPOINT {self.__savepoint}")
+            else:
+                self.__conn = _dbpool.getconn()
+                self.__context_token = _active_connection.set(self.__conn)
+                self.__cursor = self.__conn.cursor()
             return self.__cursor
         except Exception as error:
             self.error = error
@@ -262,14 +300,21 @@ class DbCursor:
         try:
             if error_type is not None:
                 self.error = error
+                if self.__savepoint is not None and self.__cursor is not None:
+                    self.__cursor.execute(f"ROLLBACK TO SAVEPOINT {self.__savepoint}")
+            elif self.__savepoint is not None:
+                self.__cursor.execute(f"RELEASE SAVEPOINT {self.__savepoint}")
             else:
                 self.__conn.commit()
         except Exception as error:
             print("[Storage]", error)
             self.error = error
-            self.__conn.rollback()
+            if self.__savepoint is None:
+                self.__conn.rollback()
         finally:
             if self.__cursor is not None:
                 self.__cursor.close()
+            if self.__context_token is not None:
+                _active_connection.reset(self.__context_token)
                 _dbpool.putconn(self.__conn)
         return True
@@ -309,6 +309,15 @@ export default function MeasurementProvider(props: { children: ReactNode }) {
         updateMeasurement(updatedMeasurement);
         break;
       }
+      case "job": {
+        const { status, error } = payload;
+        if (status === "failed")
+          notify({
+            message: `Failed to determine the measurement positions: ${error}`,
+            isError: true,
+          });
+        break;
+      }
       case "update_position": {
         const { measurement } = payload;
         const updatedMeasurement = parseMeasurement(measurement);
@@ -7,6 +7,10 @@ export type SubField = {
   coordinates: Coordinates;
   area: number;
   ndvi: number;
+  ndviMin?: number;
+  ndviMax?: number;
+  ndviStd?: number;
+  pixelCount?: number;
   recommendedFertilizerAmount: number;
 }
 
@@ -17,6 +21,10 @@ export const parseSubField = (subfield: any) => {
     coordinates,
     area,
     ndvi,
+    ndvi_min: ndviMin,
+    ndvi_max: ndviMax,
+    ndvi_std: ndviStd,
+    pixel_count: pixelCount,
     recommended_fertilizer_amount: recommendedFertilizerAmount,
   } = subfield;
   return {
@@ -25,6 +33,10 @@ export const parseSubField = (subfield: any) => {
     coordinates: parseCoordinates(coordinates),
     area,
     ndvi,
+    ndviMin: ndviMin ?? undefined,
+    ndviMax: ndviMax ?? undefined,
+    ndviStd: ndviStd ?? undefined,
+    pixelCount: pixelCount ?? undefined,
     recommendedFertilizerAmount,
   } as SubField;
 };
\ No newline at end of file